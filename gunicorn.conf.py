@@ -0,0 +1,83 @@
+"""
+ค่าของ gunicorn (โหลดอัตโนมัติเมื่อรัน ``gunicorn`` ที่ root ของโปรเจกต์ หรือ ``gunicorn -c gunicorn.conf.py``)
+
+GUNICORN_PROFILE          sync | gthread (ค่าเริ่มต้น) | asgi
+  sync     worker ละหนึ่ง request - ง่ายที่สุด แต่ worker ว่างรอ I/O (ฐานข้อมูล, อัปโหลดรูป) ทั้งหมด
+  gthread  worker ละ GUNICORN_THREADS thread - รับ request พร้อมกันได้มากขึ้นด้วยหน่วยความจำเท่าเดิม
+  asgi     uvicorn worker ผ่าน petstore_project/asgi.py + หน้า catalog แบบ async (ASYNC_CATALOG_VIEWS=1)
+WEB_CONCURRENCY           จำนวน worker process (ค่าเริ่มต้น 2 x CPU + 1)
+GUNICORN_THREADS          thread ต่อ worker ของ gthread (ค่าเริ่มต้น 4)
+GUNICORN_PRELOAD          1 = import Django ครั้งเดียวใน master แล้ว fork (ค่าเริ่มต้น 1)
+GUNICORN_MAX_REQUESTS     รีสตาร์ต worker หลังรับครบกี่ request (0 = ไม่รีสตาร์ต, ค่าเริ่มต้น 1000)
+GUNICORN_MAX_REQUESTS_JITTER  สุ่มบวกเพิ่มต่อ worker ไม่ให้รีสตาร์ตพร้อมกัน (ค่าเริ่มต้น 100)
+GUNICORN_TIMEOUT          วินาทีก่อนฆ่า worker ที่ค้าง (ค่าเริ่มต้น 30)
+PORT                      port ที่ฟัง (Render ตั้งให้, ค่าเริ่มต้น 8000)
+CATALOG_CACHE_BACKEND     ต้องเป็น file หรือ db เมื่อมีหลาย worker (locmem จะมีคำเตือนตอนเริ่ม)
+"""
+import multiprocessing
+import os
+import sys
+
+PROFILES = {
+    # profile: (worker_class, application)
+    'sync': ('sync', 'petstore_project.wsgi:application'),
+    'gthread': ('gthread', 'petstore_project.wsgi:application'),
+    'asgi': ('uvicorn.workers.UvicornWorker', 'petstore_project.asgi:application'),
+}
+
+profile = os.environ.get('GUNICORN_PROFILE', 'gthread')
+if profile not in PROFILES:
+    raise RuntimeError(f'GUNICORN_PROFILE ต้องเป็นหนึ่งใน {", ".join(PROFILES)} (ได้ {profile!r})')
+
+worker_class, wsgi_app = PROFILES[profile]
+if profile == 'asgi':
+    # ภายใต้ ASGI โค้ด sync ของแต่ละ request รันใน thread ของตัวเอง connection ที่ถือข้าม request
+    # จึงค้างตาม thread ไปเรื่อยๆ (ดูเอกสาร Django เรื่อง ASGI) ปิดทุก request แทน หรือใช้ DB_POOL
+    os.environ.setdefault('DB_CONN_MAX_AGE', '0')
+    # หน้า catalog แบบ async (ดู settings.ASYNC_CATALOG_VIEWS)
+    os.environ.setdefault('ASYNC_CATALOG_VIEWS', '1')
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4)) if profile == 'gthread' else 1
+
+# import แอปใน master ครั้งเดียว worker ที่ fork ออกมาใช้หน่วยความจำร่วมกัน (copy-on-write) และเริ่มเร็ว
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+# รีสตาร์ต worker เป็นระยะ จำกัดหน่วยความจำที่โตขึ้นเรื่อยๆ (cache ใน process, fragmentation)
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = 30
+keepalive = 5
+
+# heartbeat ของ worker เขียนลง tmpfs แทนดิสก์ของ container (ดิสก์ช้าทำให้ worker ถูกฆ่าเพราะดูเหมือนค้าง)
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG') or None
+errorlog = '-'
+
+
+_catalog_cache_backend = os.environ.get('CATALOG_CACHE_BACKEND', 'locmem')
+
+
+def on_starting(server):
+    # locmem: การล้าง cache ของ catalog มีผลเฉพาะ worker ที่เขียนข้อมูล worker อื่นเสิร์ฟหน้า/ETag เก่า
+    if workers > 1 and _catalog_cache_backend == 'locmem':
+        server.log.warning(
+            'CATALOG_CACHE_BACKEND=locmem กับ %d worker: cache ของ catalog ไม่ถูกล้างข้าม worker '
+            '(ข้อมูลเก่าได้นานถึง CATALOG_CACHE_TIMEOUT) ตั้ง CATALOG_CACHE_BACKEND=file หรือ db', workers
+        )
+
+
+def pre_fork(server, worker):
+    # preload: connection ที่ master เปิดไว้ตอนโหลดแอปห้ามติดไปกับ worker (socket เดียวกันหลาย process)
+    if server.cfg.preload_app:
+        from django.db import connections
+        connections.close_all()
+        # DB_POOL: close_all คืน connection เข้า pool ของ master จึงต้องปิด pool ด้วย
+        if 'petstore_project.postgresql_pool.base' in sys.modules:
+            from petstore_project.postgresql_pool.base import close_pools
+            close_pools()
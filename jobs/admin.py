@@ -0,0 +1,19 @@
+from django.contrib import admin
+from django.utils import timezone
+from .models import Job
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'max_attempts', 'run_at', 'locked_by', 'finished_at')
+    list_filter = ('status', 'name')
+    search_fields = ('name', 'unique_key', 'last_error')
+    readonly_fields = ('created_at', 'updated_at', 'finished_at', 'locked_by', 'locked_until')
+    actions = ['retry_jobs']
+    
+    @admin.action(description='ลองใหม่ (งานที่ล้มเหลว)')
+    def retry_jobs(self, request, queryset):
+        updated = queryset.filter(status=Job.FAILED).update(
+            status=Job.QUEUED, attempts=0, run_at=timezone.now(), finished_at=None
+        )
+        self.message_user(request, f'ใส่กลับเข้าคิว {updated} งาน')
+
+admin.site.register(Job, JobAdmin)
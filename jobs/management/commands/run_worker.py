@@ -0,0 +1,126 @@
+import json
+import multiprocessing
+import queue
+import signal
+import threading
+from collections import Counter
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+from jobs.services import prune_jobs, run_worker
+from pets import cache as catalog_cache
+
+POOLS = ('thread', 'process')
+
+
+def _process_main(options, results):
+    """worker ใน process ลูก: หยุดอย่างนุ่มนวลเมื่อได้ SIGTERM/SIGINT (ทำงานที่ค้างอยู่ให้เสร็จก่อน)"""
+    import django
+    django.setup()
+    stop = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *args: stop.set())
+    results.put(dict(run_worker(stop, **options)))
+
+
+class Command(BaseCommand):
+    help = ('worker ประมวลผลงานเบื้องหลังในคิว (jobs.Job) ด้วย thread หรือ process หลายตัว '
+            'งานที่ล้มเหลวถูกลองใหม่แบบ backoff และงานของ worker ที่หายไปถูกรับใหม่เมื่อ lock หมดอายุ')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=1, help='จำนวน worker (thread/process)')
+        parser.add_argument('--pool', choices=POOLS, default='thread',
+                            help='thread เหมาะกับงานที่รอ I/O ส่วน process เหมาะกับงานที่ใช้ CPU (เช่นย่อรูป)')
+        parser.add_argument('--batch-size', type=int, default=10, help='จำนวนงานที่รับต่อครั้ง')
+        parser.add_argument('--visibility-timeout', type=int,
+                            help='วินาทีที่ worker ถือ lock งาน (ค่าเริ่มต้น: settings.JOBS_VISIBILITY_TIMEOUT)')
+        parser.add_argument('--interval', type=float, default=1.0, help='ระยะเวลารอ (วินาที) เมื่อคิวว่าง')
+        parser.add_argument('--burst', action='store_true', help='ทำงานจนคิวว่างแล้วจบ')
+        parser.add_argument('--prune-days', type=int,
+                            help='ลบงานที่สำเร็จแล้วเก่ากว่าจำนวนวันนี้ก่อนเริ่ม (ค่าเริ่มต้น: ไม่ลบ)')
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--concurrency และ --batch-size ต้องมีค่าอย่างน้อย 1')
+        if options['prune_days'] is not None and options['prune_days'] < 0:
+            raise CommandError('--prune-days ต้องไม่ติดลบ')
+
+        if catalog_cache.is_process_local():
+            # งาน (ย่อรูป, index ค้นหา) ล้าง cache ของ catalog ใน process นี้เท่านั้น
+            self.stderr.write(self.style.WARNING(
+                'CATALOG_CACHE_BACKEND=locmem: web worker จะไม่เห็นการล้าง cache จากงานใน worker นี้ '
+                'ตั้ง CATALOG_CACHE_BACKEND=file หรือ db'
+            ))
+
+        report = {}
+        if options['prune_days'] is not None:
+            report['pruned'] = prune_jobs(timezone.now() - timedelta(days=options['prune_days']))
+
+        worker_options = {
+            'batch_size': options['batch_size'],
+            'visibility_timeout': options['visibility_timeout'],
+            'interval': options['interval'],
+            'burst': options['burst'],
+        }
+        if options['pool'] == 'thread':
+            totals = self.run_threads(options['concurrency'], worker_options)
+        else:
+            totals = self.run_processes(options['concurrency'], worker_options)
+        report.update(totals)
+        return json.dumps(report, sort_keys=True)
+
+    @staticmethod
+    def _on_shutdown(handler):
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                signal.signal(signum, handler)
+
+    def run_threads(self, concurrency, worker_options):
+        stop = threading.Event()
+        totals = Counter()
+        lock = threading.Lock()
+
+        def work():
+            result = run_worker(stop, **worker_options)
+            with lock:
+                totals.update(result)
+
+        self._on_shutdown(lambda *args: stop.set())
+        threads = [threading.Thread(target=work, name=f'job-worker-{i}') for i in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            # join แบบมี timeout เพื่อให้ signal handler ของ main thread ทำงานได้
+            while thread.is_alive():
+                thread.join(0.5)
+        return dict(totals)
+
+    def run_processes(self, concurrency, worker_options):
+        # fork ไม่ต้อง import app ใหม่ (ถ้ามี) แต่ต้องไม่แชร์ connection ของ process แม่
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('fork' if 'fork' in methods else 'spawn')
+        connections.close_all()
+        results = context.Queue()
+        processes = [
+            context.Process(target=_process_main, args=(worker_options, results), name=f'job-worker-{i}')
+            for i in range(concurrency)
+        ]
+        for process in processes:
+            process.start()
+        self._on_shutdown(lambda *args: [process.terminate() for process in processes if process.is_alive()])
+
+        totals = Counter()
+        collected = 0
+        while collected < len(processes):
+            try:
+                totals.update(results.get(timeout=0.5))
+                collected += 1
+            except queue.Empty:
+                # process ลูกที่ตายโดยไม่ส่งผลกลับมา
+                if not any(process.is_alive() for process in processes):
+                    break
+        for process in processes:
+            process.join()
+        return dict(totals)
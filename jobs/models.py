@@ -0,0 +1,53 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """งานเบื้องหลังในคิว (ประมวลผลโดย ``manage.py run_worker``)
+
+    worker ที่รับงานไปจะถือ lock ถึง locked_until (visibility timeout) ถ้า worker ตายระหว่างทำ
+    งานจะถูกรับใหม่เมื่อ lock หมดอายุ งานที่ล้มเหลวจะถูกลองใหม่ (backoff) จนครบ max_attempts
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'รอดำเนินการ'),
+        (RUNNING, 'กำลังทำงาน'),
+        (DONE, 'สำเร็จ'),
+        (FAILED, 'ล้มเหลว'),
+    ]
+    
+    name = models.CharField(max_length=100)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    # งานที่รออยู่ซึ่งมี unique_key เดียวกันมีได้เพียงงานเดียว (enqueue ซ้ำถูกข้าม)
+    unique_key = models.CharField(max_length=100, null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"#{self.pk} {self.name} ({self.status})"
+    
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # worker รับงานที่ถึงเวลาแล้วตามลำดับ
+            models.Index(fields=['run_at', 'id'], condition=models.Q(status='queued'), name='job_queued_idx'),
+            # งานที่ lock หมดอายุ (worker หายไประหว่างทำ)
+            models.Index(fields=['locked_until'], condition=models.Q(status='running'), name='job_running_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['unique_key'], condition=models.Q(status='queued'), name='job_unique_queued_key'
+            ),
+        ]
@@ -0,0 +1,240 @@
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+import uuid
+from collections import Counter
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import (
+    DatabaseError, IntegrityError, OperationalError, close_old_connections, connection, connections, transaction,
+)
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import Job
+
+logger = logging.getLogger('petstore.jobs')
+
+# ---------------------------------------------------------------------------
+# ลงทะเบียน task
+# ---------------------------------------------------------------------------
+
+registry = {}
+
+
+class Task:
+    """ฟังก์ชันที่ worker เรียกได้ (args/kwargs ต้องเป็น JSON)"""
+
+    def __init__(self, func, name, max_attempts=None, backoff=None):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts or settings.JOBS_MAX_ATTEMPTS
+        self.backoff = backoff if backoff is not None else settings.JOBS_RETRY_BACKOFF
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, **kwargs):
+        """ใส่งานลงคิวแทนการเรียกตรงๆ"""
+        return enqueue(self, args, kwargs)
+
+    def retry_delay(self, attempts):
+        """exponential backoff พร้อม jitter ไม่ให้งานที่ล้มพร้อมกันกลับมาพร้อมกัน"""
+        seconds = min(self.backoff * 2 ** max(attempts - 1, 0), settings.JOBS_MAX_BACKOFF)
+        return timedelta(seconds=seconds * random.uniform(1, 1.1))
+
+
+def task(func=None, *, name=None, max_attempts=None, backoff=None):
+    """decorator ลงทะเบียน task ใน ``<app>/tasks.py`` (ชื่อเริ่มต้นคือ <app>.<ชื่อฟังก์ชัน>)"""
+    def register(func):
+        task_name = name or f'{func.__module__.split(".")[0]}.{func.__name__}'
+        registry[task_name] = Task(func, task_name, max_attempts, backoff)
+        return registry[task_name]
+    return register(func) if func is not None else register
+
+
+def enqueue(task, args=(), kwargs=None, delay=None, run_at=None, unique_key=None):
+    """ใส่งานลงคิว (INSERT เดียวใน transaction ปัจจุบัน - worker เห็นงานหลัง commit เท่านั้น)
+
+    unique_key: ถ้ามีงานที่รออยู่ด้วย key เดียวกันแล้วจะไม่เพิ่มซ้ำ (job ที่คืนมาจะไม่มี pk)
+    """
+    if isinstance(task, str):
+        task = registry[task]
+    if run_at is None:
+        run_at = timezone.now() + (delay or timedelta())
+    job = Job(
+        name=task.name, args=list(args), kwargs=kwargs or {}, run_at=run_at,
+        unique_key=unique_key, max_attempts=task.max_attempts
+    )
+    if unique_key is None:
+        job.save()
+    else:
+        # partial unique constraint บนงานที่รออยู่ - ชนกันก็ข้ามไปโดยไม่ต้อง SELECT ก่อน
+        Job.objects.bulk_create([job], ignore_conflicts=True)
+    return job
+
+
+# ---------------------------------------------------------------------------
+# worker
+# ---------------------------------------------------------------------------
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+
+
+def _retry_locked(operation, attempts=5):
+    """SQLite: คำสั่งเดียวที่ชนกับ worker อื่นที่กำลังเขียน (database is locked) ลองใหม่สั้นๆ"""
+    for attempt in range(attempts):
+        try:
+            return operation()
+        except OperationalError:
+            if attempt == attempts - 1:
+                raise
+            time.sleep(0.05 * (attempt + 1))
+
+
+def _available(now):
+    # งานที่ถึงเวลา หรือ worker ที่รับไปหายไปจน lock หมดอายุ
+    return Q(status=Job.QUEUED, run_at__lte=now) | Q(status=Job.RUNNING, locked_until__lt=now)
+
+
+def claim_jobs(limit=1, visibility_timeout=None, worker=None):
+    """รับงานที่พร้อมทำไม่เกิน limit งาน คืนค่ารายการ Job ที่ถือ lock แล้ว
+
+    PostgreSQL ใช้ SELECT ... FOR UPDATE SKIP LOCKED (worker ไม่รอกัน) ส่วน SQLite ไม่มี row lock
+    จึงใช้ UPDATE แบบมีเงื่อนไข (ตรวจว่ายังว่างอยู่) ในคำสั่งเดียว worker ที่แย่งกันได้งานไม่ซ้ำกัน
+    """
+    return _retry_locked(lambda: _claim(limit, visibility_timeout, worker))
+
+
+def _claim(limit, visibility_timeout, worker):
+    now = timezone.now()
+    timeout = visibility_timeout or settings.JOBS_VISIBILITY_TIMEOUT
+    token = f'{worker or worker_name()}/{uuid.uuid4().hex[:8]}'
+    # SQLite: ไม่เปิด transaction ค้างระหว่างอ่านกับเขียน (การ upgrade lock ชนกันได้ database is locked)
+    atomic = transaction.atomic if connection.features.has_select_for_update else nullcontext
+    while True:
+        with atomic():
+            ids = list(
+                Job.objects.filter(_available(now)).order_by('run_at', 'id')
+                .select_for_update(skip_locked=True).values_list('pk', flat=True)[:limit]
+            )
+            if not ids:
+                return []
+            claimed = Job.objects.filter(_available(now), pk__in=ids).update(
+                status=Job.RUNNING, locked_by=token, locked_until=now + timedelta(seconds=timeout),
+                attempts=F('attempts') + 1, updated_at=now
+            )
+        if claimed:
+            return list(Job.objects.filter(status=Job.RUNNING, locked_by=token).order_by('run_at', 'id'))
+        # worker อื่นรับงานชุดนี้ไปก่อน (SQLite) - อ่านใหม่ ไม่ใช่คิวว่าง
+
+
+def _owned(job):
+    return Job.objects.filter(pk=job.pk, status=Job.RUNNING, locked_by=job.locked_by)
+
+
+def _finish(job, now, changes):
+    # savepoint เฉพาะเมื่ออยู่ใน transaction: IntegrityError ต้องไม่ทำให้ transaction ภายนอกใช้ต่อไม่ได้
+    # (autocommit ไม่เปิด transaction เพิ่ม - SQLite หลาย thread ชนกันง่ายขึ้น)
+    with transaction.atomic() if connection.in_atomic_block else nullcontext():
+        return _owned(job).update(locked_until=None, updated_at=now, **changes)
+
+
+def execute_job(job, visibility_timeout=None):
+    """ทำงานหนึ่งงานที่ claim มาแล้ว คืนค่า 'done' / 'retry' / 'failed' / 'lost'"""
+    now = timezone.now()
+    timeout = visibility_timeout or settings.JOBS_VISIBILITY_TIMEOUT
+    # ต่ออายุ lock ก่อนเริ่ม (งานท้าย batch อาจรอนาน) ถ้า lock หลุดไปแล้วแปลว่า worker อื่นรับไปแทน
+    if not _retry_locked(lambda: _owned(job).update(locked_until=now + timedelta(seconds=timeout), updated_at=now)):
+        return 'lost'
+
+    task = registry.get(job.name)
+    error = None
+    if task is None:
+        error = f'ไม่พบ task ชื่อ {job.name}'
+    elif job.attempts > job.max_attempts:
+        # worker หายไประหว่างทำงานนี้ครบจำนวนครั้งแล้ว
+        error = 'เกินจำนวนครั้งที่ลองได้ (visibility timeout)'
+    else:
+        try:
+            task(*job.args, **job.kwargs)
+        except Exception:
+            error = traceback.format_exc()
+            logger.warning('job #%s %s failed (attempt %s/%s)', job.pk, job.name, job.attempts, job.max_attempts,
+                           exc_info=True)
+
+    now = timezone.now()
+    if error is None:
+        outcome, changes = 'done', {'status': Job.DONE, 'finished_at': now, 'last_error': ''}
+    elif task is not None and job.attempts < job.max_attempts:
+        outcome, changes = 'retry', {
+            'status': Job.QUEUED, 'run_at': now + task.retry_delay(job.attempts), 'last_error': error
+        }
+    else:
+        outcome, changes = 'failed', {'status': Job.FAILED, 'finished_at': now, 'last_error': error}
+    try:
+        finished = _retry_locked(lambda: _finish(job, now, changes))
+    except IntegrityError:
+        # กลับเข้าคิวไม่ได้: ระหว่างทำงานมีงาน unique_key เดียวกันถูก enqueue แล้ว (job_unique_queued_key)
+        # งานนั้นจะทำแทน - ปิดงานนี้เป็น failed แทนการค้างสถานะ running จน lock หมดอายุ
+        outcome, changes = 'failed', {
+            'status': Job.FAILED, 'finished_at': now,
+            'last_error': f'{error}\nไม่ลองใหม่: มีงาน unique_key {job.unique_key} รออยู่ในคิวแล้ว',
+        }
+        finished = _retry_locked(lambda: _owned(job).update(locked_until=None, updated_at=now, **changes))
+    if not finished:
+        # ทำนานเกิน visibility timeout และ worker อื่นรับงานไปแล้ว - ปล่อยให้ผลของ worker นั้นเป็นหลัก
+        logger.warning('job #%s %s lost its lock before finishing', job.pk, job.name)
+        return 'lost'
+    return outcome
+
+
+def work_off(batch_size=10, visibility_timeout=None, max_jobs=None, worker=None):
+    """ทำงานที่ถึงเวลาแล้วจนคิวว่าง (หรือครบ max_jobs) คืนค่าจำนวนงานตามผลลัพธ์"""
+    totals = Counter()
+    while max_jobs is None or sum(totals.values()) < max_jobs:
+        limit = batch_size if max_jobs is None else min(batch_size, max_jobs - sum(totals.values()))
+        jobs = claim_jobs(limit, visibility_timeout, worker)
+        if not jobs:
+            break
+        for job in jobs:
+            totals[execute_job(job, visibility_timeout)] += 1
+    return totals
+
+
+def run_worker(stop, batch_size=10, visibility_timeout=None, interval=1.0, burst=False):
+    """วนรับงานจนกว่า stop (threading.Event) ถูก set หรือคิวว่างในโหมด burst"""
+    totals = Counter()
+    worker = worker_name()
+    try:
+        while not stop.is_set():
+            close_old_connections()
+            try:
+                processed = work_off(batch_size, visibility_timeout, max_jobs=batch_size, worker=worker)
+            except DatabaseError:
+                # ฐานข้อมูลขัดข้องชั่วคราว - งานที่ค้างจะถูกรับใหม่เมื่อ lock หมดอายุ
+                logger.exception('job worker %s database error', worker)
+                connections.close_all()
+                stop.wait(interval)
+                continue
+            totals.update(processed)
+            if not processed:
+                if burst:
+                    break
+                stop.wait(interval)
+    finally:
+        # connection ของ thread นี้
+        connections.close_all()
+    return totals
+
+
+def prune_jobs(before):
+    """ลบงานที่เสร็จแล้วก่อนเวลา before (งานที่ล้มเหลวเก็บไว้ตรวจสอบ) คืนค่าจำนวนที่ลบ"""
+    return Job.objects.filter(status=Job.DONE, finished_at__lt=before).delete()[0]
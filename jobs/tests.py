@@ -0,0 +1,125 @@
+import json
+import threading
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from .models import Job
+from .services import claim_jobs, enqueue, execute_job, task, work_off
+
+calls = []
+calls_lock = threading.Lock()
+
+
+@task(name='tests.record')
+def record(value):
+    with calls_lock:
+        calls.append(value)
+
+
+@task(name='tests.flaky', max_attempts=2, backoff=30)
+def flaky():
+    raise RuntimeError('boom')
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueued_job_runs_once(self):
+        job = record.delay('a')
+        self.assertEqual(calls, [])
+        self.assertEqual(work_off(), {'done': 1})
+        self.assertEqual(calls, ['a'])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.DONE, 1))
+        self.assertEqual(work_off(), {})
+
+    def test_delayed_job_waits_until_due(self):
+        enqueue(record, ['later'], delay=timedelta(minutes=5))
+        self.assertEqual(work_off(), {})
+        Job.objects.update(run_at=timezone.now())
+        self.assertEqual(work_off(), {'done': 1})
+
+    def test_failures_retry_with_backoff_then_fail(self):
+        job = flaky.delay()
+        started = timezone.now()
+        with self.assertLogs('petstore.jobs', 'WARNING'):
+            self.assertEqual(work_off(), {'retry': 1})
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertGreaterEqual(job.run_at, started + timedelta(seconds=30))
+        self.assertIn('RuntimeError: boom', job.last_error)
+
+        self.assertEqual(work_off(), {})
+        Job.objects.update(run_at=timezone.now())
+        with self.assertLogs('petstore.jobs', 'WARNING'):
+            self.assertEqual(work_off(), {'failed': 1})
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+
+    def test_unknown_task_fails_without_retry(self):
+        Job.objects.create(name='tests.missing')
+        self.assertEqual(work_off(), {'failed': 1})
+
+    def test_unique_key_keeps_one_queued_job(self):
+        enqueue(record, ['x'], unique_key='same')
+        enqueue(record, ['y'], unique_key='same')
+        self.assertEqual(Job.objects.count(), 1)
+
+        # งานที่กำลังทำอยู่ไม่กันงานใหม่ (เหตุการณ์ที่เกิดระหว่างทำงานจะไม่หาย)
+        claimed = claim_jobs()
+        enqueue(record, ['z'], unique_key='same')
+        self.assertEqual(Job.objects.filter(status=Job.QUEUED).count(), 1)
+        execute_job(claimed[0])
+        self.assertEqual(work_off(), {'done': 1})
+        self.assertEqual(calls, ['x', 'z'])
+
+    def test_failed_job_with_same_key_queued_is_not_requeued(self):
+        enqueue(flaky, unique_key='same')
+        running = claim_jobs()[0]
+        enqueue(flaky, unique_key='same')
+
+        # กลับเข้าคิวไม่ได้ (job_unique_queued_key) - งานที่รออยู่ทำแทน ไม่ค้างสถานะ running
+        with self.assertLogs('petstore.jobs', 'WARNING'):
+            self.assertEqual(execute_job(running), 'failed')
+        running.refresh_from_db()
+        self.assertEqual((running.status, running.locked_until), (Job.FAILED, None))
+        self.assertIn('รออยู่ในคิวแล้ว', running.last_error)
+        self.assertEqual(Job.objects.filter(status=Job.QUEUED).exclude(pk=running.pk).count(), 1)
+
+    def test_expired_lock_is_reclaimed(self):
+        record.delay('crash')
+        crashed = claim_jobs(worker='crashed')[0]
+        self.assertEqual(claim_jobs(), [])
+
+        Job.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        reclaimed = claim_jobs(worker='healthy')
+        self.assertEqual([job.pk for job in reclaimed], [crashed.pk])
+        self.assertEqual(reclaimed[0].attempts, 2)
+        # worker เดิมกลับมาหลัง lock หมดอายุ ต้องไม่ทำงานซ้ำ
+        self.assertEqual(execute_job(crashed), 'lost')
+        self.assertEqual(execute_job(reclaimed[0]), 'done')
+        self.assertEqual(calls, ['crash'])
+
+
+class RunWorkerCommandTests(TransactionTestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_thread_pool_runs_every_job_exactly_once(self):
+        for i in range(30):
+            record.delay(i)
+        out = StringIO()
+        call_command('run_worker', concurrency=3, batch_size=4, burst=True, prune_days=0, stdout=out, stderr=StringIO())
+        self.assertEqual(json.loads(out.getvalue()), {'done': 30, 'pruned': 0})
+        self.assertEqual(sorted(calls), list(range(30)))
+        self.assertEqual(Job.objects.filter(status=Job.DONE).count(), 30)
+
+    def test_warns_when_catalog_cache_is_process_local(self):
+        err = StringIO()
+        call_command('run_worker', burst=True, stdout=StringIO(), stderr=err)
+        self.assertIn('CATALOG_CACHE_BACKEND=locmem', err.getvalue())
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Order
+from .models import Cart, CartItem, Order
 
 class OrderAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'pet', 'quantity', 'total_price', 'status', 'delivery_method', 'pickup_date', 'recipient_name', 'order_date')
@@ -29,4 +29,19 @@ class OrderAdmin(admin.ModelAdmin):
         return f"฿{obj.total_price:,.2f}"
     total_price_display.short_description = 'Total Price'
 
-admin.site.register(Order, OrderAdmin)
\ No newline at end of file
+admin.site.register(Order, OrderAdmin)
+
+class CartItemInline(admin.TabularInline):
+    model = CartItem
+    extra = 0
+    raw_id_fields = ('pet',)
+    readonly_fields = ('added_at',)
+
+class CartAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'created_at', 'updated_at')
+    search_fields = ('user__username', 'user__email')
+    raw_id_fields = ('user',)
+    readonly_fields = ('created_at', 'updated_at')
+    inlines = [CartItemInline]
+
+admin.site.register(Cart, CartAdmin)
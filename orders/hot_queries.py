@@ -0,0 +1,35 @@
+from petstore_project.hot_queries import first_page, hot_query
+from users.models import CustomUser
+from .serializers import OrderListRowSerializer
+from .services import scoped_orders
+from .views import OrderViewSet, dashboard_orders, visible_orders
+
+# ค่า id ตัวอย่าง - query plan ไม่ขึ้นกับค่าจริง
+SAMPLE_ID = 1
+
+
+@hot_query('orders.user_orders')
+def user_orders():
+    customer = CustomUser(pk=SAMPLE_ID, role='customer')
+    return first_page(OrderListRowSerializer.project(visible_orders(customer)), OrderViewSet)
+
+
+@hot_query('orders.user_stats')
+def user_stats():
+    return scoped_orders(user=CustomUser(pk=SAMPLE_ID, role='customer'))
+
+
+@hot_query('orders.seller_orders_page')
+def seller_orders_page():
+    seller = CustomUser(pk=SAMPLE_ID, role='seller')
+    return first_page(OrderListRowSerializer.project(visible_orders(seller)), OrderViewSet)
+
+
+@hot_query('orders.seller_dashboard')
+def seller_dashboard():
+    return first_page(dashboard_orders({}), OrderViewSet)
+
+
+@hot_query('orders.seller_dashboard_by_status')
+def seller_dashboard_by_status():
+    return first_page(dashboard_orders({'status': 'pending'}), OrderViewSet)
@@ -0,0 +1,198 @@
+import json
+import math
+import random
+import statistics
+import subprocess
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from orders.seeding import SEED_PREFIX, seed_dataset
+from pets.models import Pet
+from users.models import CustomUser
+
+
+def percentile(values, pct):
+    """percentile แบบ nearest-rank"""
+    ordered = sorted(values)
+    index = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+@contextmanager
+def isolated_database(use_current_db=False):
+    """รัน benchmark ในฐานข้อมูลทดสอบที่สร้างใหม่แล้วลบทิ้ง (หรือฐานข้อมูลปัจจุบันถ้า use_current_db)"""
+    # เพิ่ม 'testserver' ใน ALLOWED_HOSTS ให้ test client (ข้ามถ้าอยู่ใน test runner อยู่แล้ว)
+    try:
+        setup_test_environment()
+        own_environment = True
+    except RuntimeError:
+        own_environment = False
+    old_name = None
+    if not use_current_db:
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        if old_name is not None:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        if own_environment:
+            teardown_test_environment()
+
+
+def write_report(report, path=None):
+    """JSON ที่เรียง key แล้ว (diff ระหว่าง commit ได้) - เขียนลงไฟล์ถ้าระบุ path ไม่เช่นนั้นคืนค่าเป็น string"""
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if path:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+        return None
+    return output
+
+
+class Command(BaseCommand):
+    help = ('สร้างข้อมูลจำลองแล้ววัด latency (p50/p95/p99), throughput และจำนวน query '
+            'ของ endpoint หลัก ผลลัพธ์เป็น JSON สำหรับเทียบระหว่าง commit')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--categories', type=int, default=5)
+        parser.add_argument('--pets', type=int, default=200)
+        parser.add_argument('--orders', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--requests', type=int, default=30, help='จำนวน request ที่วัดต่อ endpoint')
+        parser.add_argument('--warmup', type=int, default=3, help='จำนวน request อุ่นเครื่องที่ไม่นับผล')
+        parser.add_argument('--cart-size', type=int, default=5, help='จำนวนรายการในตะกร้าตอน checkout')
+        parser.add_argument('--only', nargs='*', help='วัดเฉพาะ endpoint ที่ระบุชื่อ')
+        parser.add_argument('--output', help='เขียนผล JSON ลงไฟล์ (ค่าเริ่มต้นพิมพ์ออก stdout)')
+        parser.add_argument(
+            '--use-current-db', action='store_true',
+            help='ใช้ฐานข้อมูลปัจจุบันแทนการสร้างฐานข้อมูลทดสอบแยก (ข้อมูลจำลองจะถูกเพิ่มลงไปจริง)'
+        )
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests ต้องมีค่าอย่างน้อย 1')
+
+        with isolated_database(options['use_current_db']):
+            report = self.run_bench(options)
+        return write_report(report, options['output'])
+
+    def run_bench(self, options):
+        # ฐานข้อมูลปัจจุบันอาจมีข้อมูลจาก seed_petstore หรือ bench รอบก่อนแล้ว - ใช้ prefix ใหม่ทุกรอบ
+        # (ยังขึ้นต้นด้วย SEED_PREFIX จึงลบได้ด้วย seed_petstore --clear-only)
+        prefix = f'{SEED_PREFIX}bench{uuid.uuid4().hex[:8]}_' if options['use_current_db'] else SEED_PREFIX
+        started = time.perf_counter()
+        dataset = seed_dataset(
+            users=options['users'], categories=options['categories'], pets=options['pets'],
+            orders=options['orders'], seed=options['seed'], prefix=prefix
+        )
+        seed_seconds = time.perf_counter() - started
+
+        seller = CustomUser.objects.filter(role='seller', username__startswith=prefix).order_by('id').first()
+        customer = CustomUser.objects.filter(role='customer', username__startswith=prefix).order_by('id').first()
+        # เลือกเฉพาะตัวที่สต็อกพอสำหรับ checkout ทุกรอบ
+        pet_ids = list(Pet.objects.filter(is_available=True, stock_quantity__gte=100).values_list('id', flat=True))
+        rng = random.Random(options['seed'])
+
+        def checkout_payload():
+            cart = [{'petId': pet_id, 'quantity': 1}
+                    for pet_id in rng.sample(pet_ids, min(options['cart_size'], len(pet_ids)))]
+            return {'cart': json.dumps(cart), 'delivery_method': 'pickup', 'recipient_name': 'Bench'}
+
+        # (ชื่อ, method, url, ผู้ใช้, วิธี login, ฟังก์ชันสร้าง POST data)
+        scenarios = [
+            ('api_pets', 'get', '/api/pets/pets/', None, None, None),
+            ('api_orders', 'get', '/api/orders/orders/', seller, 'jwt', None),
+            ('api_order_stats', 'get', '/api/orders/stats/', seller, 'jwt', None),
+            ('pet_list', 'get', reverse('pet_list'), None, None, None),
+            ('seller_dashboard', 'get', reverse('seller_dashboard'), seller, 'session', None),
+            ('cart_checkout', 'post', reverse('create_order_from_cart'), customer, 'session', checkout_payload),
+        ]
+        if options['only']:
+            scenarios = [s for s in scenarios if s[0] in options['only']]
+
+        results = {}
+        for name, method, url, user, auth, payload in scenarios:
+            client = Client()
+            headers = {}
+            if auth == 'session':
+                client.force_login(user)
+            elif auth == 'jwt':
+                headers['HTTP_AUTHORIZATION'] = f'Bearer {RefreshToken.for_user(user).access_token}'
+            results[name] = self.measure(
+                lambda: getattr(client, method)(url, payload() if payload else None, **headers),
+                options['requests'], options['warmup']
+            )
+            results[name]['url'] = url
+
+        return {
+            'meta': {
+                'commit': _git_commit(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'dataset': dataset,
+                'seed': options['seed'],
+                'seed_prefix': prefix,
+                'seed_seconds': round(seed_seconds, 3),
+                'requests_per_endpoint': options['requests'],
+                'warmup': options['warmup'],
+            },
+            'results': results,
+        }
+
+    @staticmethod
+    def measure(send, requests, warmup):
+        for _ in range(warmup):
+            send()
+
+        latencies = []
+        query_counts = []
+        status_codes = Counter()
+        started = time.perf_counter()
+        for _ in range(requests):
+            with CaptureQueriesContext(connection) as queries:
+                request_started = time.perf_counter()
+                response = send()
+                latencies.append((time.perf_counter() - request_started) * 1000)
+            query_counts.append(len(queries))
+            status_codes[str(response.status_code)] += 1
+        elapsed = time.perf_counter() - started
+
+        return {
+            'requests': requests,
+            'status_codes': dict(status_codes),
+            'latency_ms': {
+                'mean': round(statistics.fmean(latencies), 3),
+                'p50': round(percentile(latencies, 50), 3),
+                'p95': round(percentile(latencies, 95), 3),
+                'p99': round(percentile(latencies, 99), 3),
+                'max': round(max(latencies), 3),
+            },
+            'throughput_rps': round(requests / elapsed, 1) if elapsed else None,
+            'queries': {
+                'min': min(query_counts),
+                'max': max(query_counts),
+                'mean': round(statistics.fmean(query_counts), 2),
+            },
+        }
@@ -0,0 +1,143 @@
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_finished, request_started
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.backends.signals import connection_created
+
+from orders.seeding import seed_dataset
+from petstore_project.database import POOL_ENGINE
+from pets.models import Pet
+from pets.serializers import PetListRowSerializer
+from .bench import _git_commit, isolated_database, percentile, write_report
+
+MODES = ('connect', 'persistent', 'pooled')
+
+
+class Command(BaseCommand):
+    help = ('เทียบ throughput ของการเปิด connection ใหม่ทุก request (CONN_MAX_AGE=0), persistent connection '
+            'และ connection pool (PostgreSQL) ด้วย thread หลายตัวที่จำลอง request (signal + query หน้า catalog)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4, help='จำนวน thread ที่ยิง request พร้อมกัน')
+        parser.add_argument('--requests', type=int, default=200, help='จำนวน request ต่อ thread')
+        parser.add_argument('--modes', nargs='*', choices=MODES, default=list(MODES))
+        parser.add_argument('--pool-size', type=int, help='max_size ของ pool (ค่าเริ่มต้น: เท่ากับ --threads)')
+        parser.add_argument('--pets', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='เขียนผล JSON ลงไฟล์ (ค่าเริ่มต้นพิมพ์ออก stdout)')
+        parser.add_argument('--use-current-db', action='store_true',
+                            help='ใช้ฐานข้อมูลปัจจุบัน (ข้อมูลจำลองจะถูกเพิ่มลงไปจริง)')
+
+    def handle(self, *args, **options):
+        if options['threads'] < 1 or options['requests'] < 1:
+            raise CommandError('--threads และ --requests ต้องมีค่าอย่างน้อย 1')
+
+        with isolated_database(options['use_current_db']):
+            dataset = seed_dataset(users=10, pets=options['pets'], orders=0, seed=options['seed'])
+            in_memory = connection.vendor == 'sqlite' and connection.is_in_memory_db()
+            results = {}
+            for mode in options['modes']:
+                results[mode] = self.run_mode(mode, options)
+
+        baseline = results.get('connect', {}).get('throughput_rps')
+        for result in results.values():
+            if baseline and result.get('throughput_rps'):
+                result['speedup_vs_connect'] = round(result['throughput_rps'] / baseline, 2)
+        meta = {
+            'commit': _git_commit(),
+            'database': connection.vendor,
+            'dataset': dataset,
+            'threads': options['threads'],
+            'requests_per_thread': options['requests'],
+        }
+        if in_memory:
+            meta['note'] = 'SQLite in-memory ไม่ปิด connection จริง ใช้ --use-current-db กับไฟล์หรือ PostgreSQL เพื่อเทียบ'
+        return write_report({'meta': meta, 'results': results}, options['output'])
+
+    def run_mode(self, mode, options):
+        settings_dict = connections.settings[DEFAULT_DB_ALIAS]
+        if mode == 'pooled' and connection.vendor != 'postgresql':
+            return {'skipped': 'connection pool ใช้ได้กับ PostgreSQL เท่านั้น'}
+
+        saved = {key: settings_dict[key] for key in ('ENGINE', 'CONN_MAX_AGE', 'OPTIONS')}
+        if mode == 'connect':
+            settings_dict['CONN_MAX_AGE'] = 0
+        elif mode == 'persistent':
+            settings_dict['CONN_MAX_AGE'] = None
+        else:
+            settings_dict.update({
+                'ENGINE': POOL_ENGINE, 'CONN_MAX_AGE': 0,
+                'OPTIONS': {**saved['OPTIONS'], 'pool': {'max_size': options['pool_size'] or options['threads']}},
+            })
+
+        latencies = []
+        opened = []
+        pool_stats = {}
+        lock = threading.Lock()
+        errors = []
+
+        def count_connection(sender, connection, **kwargs):
+            with lock:
+                opened.append(connection.alias)
+
+        def client():
+            local = []
+            try:
+                for _ in range(options['requests']):
+                    started = time.perf_counter()
+                    self.simulate_request()
+                    local.append((time.perf_counter() - started) * 1000)
+            except Exception as e:
+                errors.append(repr(e))
+            finally:
+                pool = getattr(connections[DEFAULT_DB_ALIAS], 'pool', None)
+                connections.close_all()
+                with lock:
+                    latencies.extend(local)
+                    if pool is not None:
+                        pool_stats.update(pool.stats)
+
+        connection_created.connect(count_connection)
+        threads = [threading.Thread(target=client) for _ in range(options['threads'])]
+        started = time.perf_counter()
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            elapsed = time.perf_counter() - started
+            connection_created.disconnect(count_connection)
+            settings_dict.update(saved)
+            if mode == 'pooled':
+                from petstore_project.postgresql_pool.base import close_pools
+                close_pools(settings_dict)
+
+        if errors:
+            raise CommandError(f'{mode}: {errors[0]}')
+        return {
+            'requests': len(latencies),
+            # pooled: connection_created เกิดทุกครั้งที่ยืม จึงนับ connection จริงจาก pool แทน
+            'connections_opened': pool_stats.get('opened', 0) if mode == 'pooled' else len(opened),
+            'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else None,
+            'latency_ms': {
+                'mean': round(statistics.fmean(latencies), 3),
+                'p50': round(percentile(latencies, 50), 3),
+                'p95': round(percentile(latencies, 95), 3),
+                'p99': round(percentile(latencies, 99), 3),
+            },
+        }
+
+    @staticmethod
+    def simulate_request():
+        """request หนึ่งครั้ง: signal เริ่ม/จบ request (ที่ Django ใช้จัดการ connection) + query หน้า catalog"""
+        request_started.send(sender=Command)
+        try:
+            queryset = Pet.objects.filter(is_available=True)
+            queryset.count()
+            list(PetListRowSerializer.project(queryset.order_by('-created_at', 'id'))[:20])
+        finally:
+            request_finished.send(sender=Command)
@@ -0,0 +1,77 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+
+from orders.models import Order
+from orders.seeding import seed_dataset
+from orders.serializers import OrderListRowSerializer, OrderSerializer
+from pets.models import Pet
+from pets.serializers import PetListRowSerializer, PetListSerializer
+from .bench import isolated_database, write_report
+
+
+class Command(BaseCommand):
+    help = ('เทียบเวลาต่อแถวของ serializer สำหรับ list (ModelSerializer เดิม กับ serializer แบบ .values()) '
+            'ทั้งเวลาโหลด+serialize และเฉพาะ serialize ผลลัพธ์เป็น JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help='จำนวนแถวที่ serialize ต่อรอบ')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='เขียนผล JSON ลงไฟล์ (ค่าเริ่มต้นพิมพ์ออก stdout)')
+        parser.add_argument('--use-current-db', action='store_true',
+                            help='ใช้ฐานข้อมูลปัจจุบัน (ข้อมูลจำลองจะถูกเพิ่มลงไปจริง)')
+
+    def handle(self, *args, **options):
+        if options['rows'] < 1 or options['repeat'] < 1:
+            raise CommandError('--rows และ --repeat ต้องมีค่าอย่างน้อย 1')
+
+        with isolated_database(options['use_current_db']):
+            rows = options['rows']
+            seed_dataset(users=max(10, rows // 20), pets=rows, orders=rows, seed=options['seed'])
+            context = {'request': RequestFactory().get('/')}
+            cases = {
+                'pets': (
+                    lambda: Pet.objects.select_related('category').order_by('-created_at', 'id'),
+                    PetListSerializer,
+                    lambda: PetListRowSerializer.project(Pet.objects.order_by('-created_at', 'id')),
+                    PetListRowSerializer,
+                ),
+                'orders': (
+                    lambda: Order.objects.select_related('user', 'pet', 'pet__category').order_by('-order_date', 'id'),
+                    OrderSerializer,
+                    lambda: OrderListRowSerializer.project(Order.objects.order_by('-order_date', 'id')),
+                    OrderListRowSerializer,
+                ),
+            }
+            results = {}
+            for name, (model_qs, model_serializer, row_qs, row_serializer) in cases.items():
+                model = self.measure(model_qs, model_serializer, rows, options['repeat'], context)
+                lean = self.measure(row_qs, row_serializer, rows, options['repeat'], context)
+                results[name] = {
+                    'model_serializer': model,
+                    'row_serializer': lean,
+                    'speedup_total': round(model['total_us_per_row'] / lean['total_us_per_row'], 2),
+                    'speedup_serialize': round(model['serialize_us_per_row'] / lean['serialize_us_per_row'], 2),
+                }
+
+        return write_report({'rows': rows, 'repeat': options['repeat'], 'results': results}, options['output'])
+
+    @staticmethod
+    def measure(make_queryset, serializer_class, rows, repeat, context):
+        """เวลาเป็นไมโครวินาทีต่อแถว (median ของทุกรอบ)"""
+        totals, serialize_times = [], []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            objects = list(make_queryset()[:rows])
+            loaded = time.perf_counter()
+            serializer_class(objects, many=True, context=context).data
+            finished = time.perf_counter()
+            totals.append((finished - started) / len(objects) * 1e6)
+            serialize_times.append((finished - loaded) / len(objects) * 1e6)
+        return {
+            'total_us_per_row': round(statistics.median(totals), 2),
+            'serialize_us_per_row': round(statistics.median(serialize_times), 2),
+        }
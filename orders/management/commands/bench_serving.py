@@ -0,0 +1,229 @@
+import http.client
+import os
+import random
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from .bench import _git_commit, percentile, write_report
+
+# ชื่อ: (GUNICORN_PROFILE, ASYNC_CATALOG_VIEWS) - asgi ใช้ view แบบ sync เดิม, asgi_async ใช้ view แบบ async
+PROFILES = {
+    'sync': ('sync', '0'),
+    'gthread': ('gthread', '0'),
+    'asgi': ('asgi', '0'),
+    'asgi_async': ('asgi', '1'),
+}
+# endpoint ของ catalog ที่ลูกค้าเปิดบ่อย ({pet_id} สุ่มจากสัตว์เลี้ยงที่พร้อมขาย)
+ENDPOINTS = (
+    '/',
+    '/pets/',
+    '/pets/{pet_id}/',
+    '/api/pets/pets/',
+    '/api/pets/pets/available_pets/',
+    '/api/pets/pets/{pet_id}/check_stock/',
+)
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = ('เปิด gunicorn ตาม gunicorn.conf.py ทีละ profile (sync, gthread, asgi, asgi_async) บนสำเนาฐานข้อมูล '
+            'แล้วยิง request พร้อมกันไปที่ endpoint ของ catalog รายงาน requests/sec และ latency ของแต่ละ profile')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', nargs='*', choices=PROFILES, default=list(PROFILES))
+        parser.add_argument('--workers', type=int, default=2, help='WEB_CONCURRENCY ของ gunicorn')
+        parser.add_argument('--threads', type=int, default=4, help='GUNICORN_THREADS ของ profile gthread')
+        parser.add_argument('--concurrency', type=int, default=16, help='จำนวน client ที่ยิงพร้อมกัน')
+        parser.add_argument('--duration', type=float, default=10, help='วินาทีที่วัดต่อ profile')
+        parser.add_argument('--warmup', type=float, default=2, help='วินาทีที่ยิงก่อนเริ่มวัด (ไม่นับผล)')
+        parser.add_argument('--pets', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='เขียนผล JSON ลงไฟล์ (ค่าเริ่มต้นพิมพ์ออก stdout)')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1 or options['concurrency'] < 1 or options['duration'] <= 0:
+            raise CommandError('--workers, --concurrency และ --duration ต้องมากกว่า 0')
+
+        with tempfile.TemporaryDirectory(prefix='petstore-serving-') as directory:
+            template = os.path.join(directory, 'template.sqlite3')
+            pet_ids = self.prepare(template, options)
+            results = {}
+            for profile in options['profiles']:
+                path = os.path.join(directory, f'{profile}.sqlite3')
+                shutil.copyfile(template, path)
+                results[profile] = self.run_profile(profile, path, pet_ids, directory, options)
+
+        baseline = results.get('sync', {}).get('throughput_rps')
+        for result in results.values():
+            if baseline and result['throughput_rps']:
+                result['speedup_vs_sync'] = round(result['throughput_rps'] / baseline, 2)
+        return write_report({
+            'meta': {
+                'commit': _git_commit(),
+                'workers': options['workers'],
+                'gthread_threads': options['threads'],
+                'concurrency': options['concurrency'],
+                'duration_seconds': options['duration'],
+                'pets': options['pets'],
+                'endpoints': list(ENDPOINTS),
+                # client เป็น thread ของ Python ใน process เดียว ตัวเลขเทียบกันระหว่าง profile ได้
+                # แต่ไม่ใช่เพดานจริงของ server (ใช้ wrk/locust จากอีกเครื่องสำหรับตัวเลขสัมบูรณ์)
+                'note': 'SQLite file, catalog cache ต่อ worker (locmem)',
+            },
+            'results': results,
+        }, options['output'])
+
+    def _environ(self, path, **extra):
+        return {**os.environ, 'DATABASE_URL': f'sqlite:///{path}', **extra}
+
+    def prepare(self, path, options):
+        for args in (
+            ('migrate', '--verbosity', '0'),
+            ('seed_petstore', '--users', '10', '--categories', '5', '--pets', str(options['pets']),
+             '--orders', '0', '--seed', str(options['seed'])),
+        ):
+            process = subprocess.run(
+                [sys.executable, str(settings.BASE_DIR / 'manage.py'), *args],
+                env=self._environ(path), capture_output=True, text=True
+            )
+            if process.returncode:
+                raise CommandError(process.stderr.strip().splitlines()[-1] if process.stderr.strip() else 'seed ล้มเหลว')
+        with sqlite3.connect(path) as db:
+            pet_ids = [
+                row[0] for row in db.execute('SELECT id FROM pets_pet WHERE is_available = 1 AND stock_quantity > 0')
+            ]
+        db.close()
+        if not pet_ids:
+            raise CommandError('ไม่มีสัตว์เลี้ยงที่พร้อมขายในข้อมูลจำลอง')
+        return pet_ids
+
+    def start_server(self, profile, path, port, log, options):
+        gunicorn_profile, async_views = PROFILES[profile]
+        env = self._environ(
+            path,
+            GUNICORN_PROFILE=gunicorn_profile,
+            ASYNC_CATALOG_VIEWS=async_views,
+            WEB_CONCURRENCY=str(options['workers']),
+            GUNICORN_THREADS=str(options['threads']),
+        )
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--config', str(settings.BASE_DIR / 'gunicorn.conf.py'),
+             '--bind', f'127.0.0.1:{port}'],
+            cwd=settings.BASE_DIR, env=env, stdout=log, stderr=subprocess.STDOUT
+        )
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                break
+            try:
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+                conn.request('GET', '/api/pets/pets/')
+                if conn.getresponse().status == 200:
+                    conn.close()
+                    return server
+                conn.close()
+            except OSError:
+                pass
+            time.sleep(0.2)
+        self.stop_server(server)
+        log.seek(0)
+        lines = log.read().strip().splitlines()
+        raise CommandError(f'{profile}: gunicorn ไม่พร้อมรับ request' + (f' ({lines[-1]})' if lines else ''))
+
+    @staticmethod
+    def stop_server(server):
+        if server.poll() is None:
+            server.terminate()
+            try:
+                server.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                server.kill()
+                server.wait()
+
+    def run_profile(self, profile, path, pet_ids, directory, options):
+        port = _free_port()
+        with open(os.path.join(directory, f'{profile}.log'), 'w+') as log:
+            server = self.start_server(profile, path, port, log, options)
+            try:
+                if options['warmup'] > 0:
+                    self.load(port, pet_ids, options['warmup'], options)
+                samples, errors, elapsed = self.load(port, pet_ids, options['duration'], options)
+            finally:
+                self.stop_server(server)
+
+        latencies = [latency for _, latency in samples]
+        endpoints = {}
+        for endpoint in ENDPOINTS:
+            values = [latency for name, latency in samples if name == endpoint]
+            if values:
+                endpoints[endpoint] = {
+                    'requests': len(values),
+                    'p50_ms': round(percentile(values, 50), 3),
+                    'p95_ms': round(percentile(values, 95), 3),
+                }
+        return {
+            'requests': len(samples),
+            'errors': len(errors),
+            'first_error': errors[0] if errors else None,
+            'throughput_rps': round(len(samples) / elapsed, 1) if samples else None,
+            'latency_ms': {
+                'p50': round(percentile(latencies, 50), 3),
+                'p95': round(percentile(latencies, 95), 3),
+                'p99': round(percentile(latencies, 99), 3),
+            } if latencies else None,
+            'endpoints': endpoints,
+        }
+
+    def load(self, port, pet_ids, duration, options):
+        """client options['concurrency'] ตัวยิง request วนตาม ENDPOINTS (keep-alive ถ้า server รองรับ) จนครบ duration"""
+        samples, errors = [], []
+        lock = threading.Lock()
+        deadline = time.perf_counter() + duration
+
+        def client(index):
+            rng = random.Random(options['seed'] + index)
+            local, local_errors = [], []
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            position = index
+            while time.perf_counter() < deadline:
+                endpoint = ENDPOINTS[position % len(ENDPOINTS)]
+                position += 1
+                started = time.perf_counter()
+                try:
+                    conn.request('GET', endpoint.format(pet_id=rng.choice(pet_ids)))
+                    response = conn.getresponse()
+                    response.read()
+                except (OSError, http.client.HTTPException) as e:
+                    local_errors.append(f'{endpoint}: {e!r}')
+                    conn.close()
+                    continue
+                if response.status != 200:
+                    local_errors.append(f'{endpoint}: HTTP {response.status}')
+                    continue
+                local.append((endpoint, (time.perf_counter() - started) * 1000))
+            conn.close()
+            with lock:
+                samples.extend(local)
+                errors.extend(local_errors)
+
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(options['concurrency'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return samples, errors, time.perf_counter() - started
@@ -0,0 +1,171 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError
+
+from orders.seeding import SEED_PREFIX
+from orders.services import CheckoutError, checkout_cart
+from pets.models import Pet
+from pets.serializers import PetListRowSerializer
+from users.models import CustomUser
+from .bench import _git_commit, percentile, write_report
+
+# (SQLITE_TUNING, คำอธิบาย) - ค่าเริ่มต้นของ Django/SQLite คือ rollback journal และ BEGIN แบบ deferred
+PROFILES = {
+    'default': ('0', 'journal_mode=DELETE, synchronous=FULL, BEGIN (deferred)'),
+    'tuned': ('1', 'settings.SQLITE_PRAGMAS + BEGIN IMMEDIATE'),
+}
+
+
+class Command(BaseCommand):
+    help = ('วัดการเขียนพร้อมกันหลาย process บน SQLite ไฟล์เดียว (เหมือน gunicorn หลาย worker) '
+            'แต่ละ process อ่านหน้า catalog แล้ว checkout ตะกร้า เทียบค่าเริ่มต้นกับ SQLITE_TUNING '
+            'นับ checkout ที่สำเร็จ, error "database is locked" และ throughput')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--iterations', type=int, default=100, help='จำนวน checkout ต่อ process')
+        parser.add_argument('--pets', type=int, default=50)
+        parser.add_argument('--profiles', nargs='*', choices=list(PROFILES), default=list(PROFILES))
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='เขียนผล JSON ลงไฟล์ (ค่าเริ่มต้นพิมพ์ออก stdout)')
+        # process ลูกที่ยิงงานจริง (เรียกโดยคำสั่งนี้เอง)
+        parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+        parser.add_argument('--start-at', type=float, help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options['processes'] < 1 or options['iterations'] < 1:
+            raise CommandError('--processes และ --iterations ต้องมีค่าอย่างน้อย 1')
+        if options['worker']:
+            return json.dumps(self.run_worker(options))
+
+        with tempfile.TemporaryDirectory(prefix='petstore-bench-') as directory:
+            template = os.path.join(directory, 'template.sqlite3')
+            self.prepare(template, options)
+            results = {}
+            for profile in options['profiles']:
+                path = os.path.join(directory, f'{profile}.sqlite3')
+                shutil.copyfile(template, path)
+                results[profile] = self.run_profile(profile, path, options)
+
+        if 'default' in results and 'tuned' in results:
+            before, after = results['default'], results['tuned']
+            results['improvement'] = {
+                'locked_errors': before['locked_errors'] - after['locked_errors'],
+                'throughput_ratio': (
+                    round(after['throughput_ops'] / before['throughput_ops'], 2) if before['throughput_ops'] else None
+                ),
+            }
+        return write_report({
+            'meta': {
+                'commit': _git_commit(),
+                'processes': options['processes'],
+                'iterations_per_process': options['iterations'],
+                'pets': options['pets'],
+                'profiles': {name: PROFILES[name][1] for name in options['profiles']},
+            },
+            'results': results,
+        }, options['output'])
+
+    @staticmethod
+    def _manage(path, tuning, *args, **kwargs):
+        env = {**os.environ, 'DATABASE_URL': f'sqlite:///{path}', 'SQLITE_TUNING': tuning}
+        return subprocess.Popen(
+            [sys.executable, str(settings.BASE_DIR / 'manage.py'), *args],
+            env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, **kwargs
+        )
+
+    def _check(self, process):
+        stdout, stderr = process.communicate()
+        if process.returncode:
+            raise CommandError(stderr.strip().splitlines()[-1] if stderr.strip() else 'process ลูกล้มเหลว')
+        return stdout
+
+    def prepare(self, path, options):
+        for args in (
+            ('migrate', '--verbosity', '0'),
+            ('seed_petstore', '--users', '20', '--categories', '3', '--pets', str(options['pets']),
+             '--orders', '0', '--seed', str(options['seed'])),
+        ):
+            self._check(self._manage(path, '0', *args))
+        # สต็อกเหลือเฟือ วัดเฉพาะการแย่ง lock ไม่ใช่สต็อกหมด
+        with sqlite3.connect(path) as db:
+            db.execute('UPDATE pets_pet SET stock_quantity = 1000000, is_available = 1')
+        db.close()
+
+    def run_profile(self, profile, path, options):
+        tuning = PROFILES[profile][0]
+        # เริ่มพร้อมกันหลัง process ลูกทุกตัวโหลด Django เสร็จ
+        start_at = time.time() + 2 + 0.3 * options['processes']
+        processes = [
+            self._manage(
+                path, tuning, 'bench_sqlite_writes', '--worker', '--start-at', str(start_at),
+                '--iterations', str(options['iterations']), '--seed', str(options['seed'] + i)
+            )
+            for i in range(options['processes'])
+        ]
+        workers = [json.loads(self._check(process)) for process in processes]
+
+        latencies = [latency for worker in workers for latency in worker['latencies_ms']]
+        completed = sum(worker['completed'] for worker in workers)
+        elapsed = max(worker['elapsed'] for worker in workers)
+        with sqlite3.connect(path) as db:
+            orders = db.execute('SELECT COUNT(*) FROM orders_order').fetchone()[0]
+            journal_mode = db.execute('PRAGMA journal_mode').fetchone()[0]
+        db.close()
+        return {
+            'journal_mode': journal_mode,
+            'completed': completed,
+            'locked_errors': sum(worker['locked_errors'] for worker in workers),
+            'other_errors': sum(worker['other_errors'] for worker in workers),
+            # คำสั่งซื้อของทุก checkout ที่สำเร็จต้องอยู่ในฐานข้อมูลครบ (ไม่มี commit ที่หายไป)
+            'orders_created': sum(worker['orders'] for worker in workers),
+            'orders_in_db': orders,
+            'throughput_ops': round(completed / elapsed, 1) if elapsed else None,
+            'latency_ms': {
+                'p50': round(percentile(latencies, 50), 3),
+                'p95': round(percentile(latencies, 95), 3),
+                'p99': round(percentile(latencies, 99), 3),
+                'max': round(max(latencies), 3),
+            } if latencies else None,
+        }
+
+    def run_worker(self, options):
+        rng = random.Random(options['seed'])
+        customers = list(CustomUser.objects.filter(role='customer', username__startswith=SEED_PREFIX))
+        pet_ids = list(Pet.objects.values_list('id', flat=True))
+        result = {'completed': 0, 'orders': 0, 'locked_errors': 0, 'other_errors': 0, 'latencies_ms': []}
+
+        if options['start_at']:
+            time.sleep(max(0, options['start_at'] - time.time()))
+        started = time.perf_counter()
+        for _ in range(options['iterations']):
+            request_started = time.perf_counter()
+            try:
+                # อ่านหน้า catalog แล้ว checkout เหมือน request จริงของลูกค้า
+                queryset = Pet.objects.filter(is_available=True)
+                queryset.count()
+                list(PetListRowSerializer.project(queryset.order_by('-created_at', 'id'))[:20])
+                cart = [{'petId': pet_id, 'quantity': 1} for pet_id in rng.sample(pet_ids, min(3, len(pet_ids)))]
+                orders, _ = checkout_cart(rng.choice(customers), cart, recipient_name='Bench')
+            except OperationalError as e:
+                result['locked_errors' if 'locked' in str(e) else 'other_errors'] += 1
+                continue
+            except CheckoutError:
+                result['other_errors'] += 1
+                continue
+            result['completed'] += 1
+            result['orders'] += len(orders)
+            result['latencies_ms'].append(round((time.perf_counter() - request_started) * 1000, 3))
+        result['elapsed'] = time.perf_counter() - started
+        return result
@@ -0,0 +1,53 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from orders.seeding import SEED_PREFIX, clear_seed_data, seed_dataset
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = ('สร้างข้อมูลจำลองปริมาณมาก (ผู้ใช้, หมวดหมู่, สัตว์เลี้ยง, คำสั่งซื้อ) แบบ deterministic ตาม --seed '
+            f'ข้อมูลทั้งหมดมี prefix "{SEED_PREFIX}" และลบได้ด้วย --clear')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--sellers', type=int, help='จำนวนผู้ขาย (ค่าเริ่มต้น 10%% ของผู้ใช้)')
+        parser.add_argument('--categories', type=int, default=10)
+        parser.add_argument('--pets', type=int, default=5000)
+        parser.add_argument('--orders', type=int, default=100000)
+        parser.add_argument('--days', type=int, default=365, help='ช่วงวันที่ย้อนหลังของคำสั่งซื้อ')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--clear', action='store_true', help='ลบข้อมูลจำลองเดิมก่อนสร้างใหม่')
+        parser.add_argument('--clear-only', action='store_true', help='ลบข้อมูลจำลองเดิมแล้วจบ')
+
+    def handle(self, *args, **options):
+        for name in ('users', 'categories', 'pets', 'batch_size', 'days'):
+            if options[name] < 1:
+                raise CommandError(f'--{name.replace("_", "-")} ต้องมีค่าอย่างน้อย 1')
+        if options['orders'] < 0:
+            raise CommandError('--orders ต้องไม่ติดลบ')
+        if options['sellers'] is not None and not 1 <= options['sellers'] <= options['users']:
+            raise CommandError('--sellers ต้องอยู่ระหว่าง 1 ถึงจำนวนผู้ใช้')
+
+        report = {}
+        started = time.perf_counter()
+        if options['clear'] or options['clear_only']:
+            report['cleared_orders'] = clear_seed_data()
+            report['clear_seconds'] = round(time.perf_counter() - started, 3)
+            if options['clear_only']:
+                return json.dumps(report)
+        elif CustomUser.objects.filter(username__startswith=SEED_PREFIX).exists():
+            raise CommandError('มีข้อมูลจำลองอยู่แล้ว ใช้ --clear เพื่อลบแล้วสร้างใหม่')
+
+        started = time.perf_counter()
+        report['created'] = seed_dataset(
+            users=options['users'], sellers=options['sellers'], categories=options['categories'],
+            pets=options['pets'], orders=options['orders'], days=options['days'],
+            seed=options['seed'], batch_size=options['batch_size']
+        )
+        elapsed = time.perf_counter() - started
+        report['seed_seconds'] = round(elapsed, 3)
+        report['orders_per_second'] = round(options['orders'] / elapsed) if elapsed else None
+        return json.dumps(report)
@@ -0,0 +1,39 @@
+import json
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from orders.models import Order
+from pets.models import Pet
+
+
+class Command(BaseCommand):
+    help = ('คัดลอกฐานข้อมูลหลักทั้งไฟล์ไปยัง read replica ด้วย SQLite backup API '
+            'ใช้จำลอง replication เมื่อทดสอบ replica ในเครื่องด้วย SQLite สองไฟล์ '
+            '(ฐานข้อมูลอื่นใช้ replication ของฐานข้อมูลเอง)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='replica', help='alias ของ replica ที่จะเขียนทับ')
+
+    def handle(self, *args, **options):
+        alias = options['database']
+        if alias not in settings.DATABASE_REPLICAS:
+            raise CommandError(f'{alias} ไม่อยู่ใน settings.DATABASE_REPLICAS (ตั้ง DATABASE_REPLICA_URL)')
+        source, target = connections[DEFAULT_DB_ALIAS], connections[alias]
+        if source.vendor != 'sqlite' or target.vendor != 'sqlite':
+            raise CommandError('sync_replica ใช้ได้กับ SQLite เท่านั้น')
+
+        target.close()
+        source.ensure_connection()
+        destination = sqlite3.connect(target.settings_dict['NAME'])
+        try:
+            source.connection.backup(destination)
+        finally:
+            destination.close()
+        return json.dumps({
+            'database': alias,
+            'pets': Pet.objects.using(alias).count(),
+            'orders': Order.objects.using(alias).count(),
+        })
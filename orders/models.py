@@ -1,7 +1,8 @@
 from django.db import models
 from django.core.exceptions import ValidationError
 from users.models import CustomUser
-from pets.models import Pet
+from pets.models import Pet, StockMovement
+from petstore_project.database import write_atomic
 
 class Order(models.Model):
     STATUS_CHOICES = [
@@ -72,24 +73,34 @@ class Order(models.Model):
         
         is_new = self.pk is None
         
-        # บันทึกคำสั่งซื้อ
-        super().save(*args, **kwargs)
-        
-        # ลดสต็อกเมื่อสร้างคำสั่งซื้อใหม่
-        if is_new:
-            self.pet.reduce_stock(self.quantity)
+        try:
+            with write_atomic():
+                # บันทึกคำสั่งซื้อ
+                super().save(*args, **kwargs)
+                
+                # ลดสต็อกเมื่อสร้างคำสั่งซื้อใหม่ (conditional UPDATE กันขายเกินสต็อก) ลงบัญชีคู่กับคำสั่งซื้อนี้
+                if is_new and not self.pet.reduce_stock(self.quantity, kind=StockMovement.SALE, order=self):
+                    raise ValidationError(
+                        f"สต็อก {self.pet.name} ไม่พอ! มีเพียง {self.pet.stock_quantity} ตัว"
+                    )
+        except ValidationError:
+            if is_new:
+                # rollback แล้ว คำสั่งซื้อนี้ไม่มีในฐานข้อมูล
+                self.pk = None
+                self._state.adding = True
+            raise
     
     def delete(self, *args, **kwargs):
         """คืนสต็อกเมื่อลบคำสั่งซื้อ"""
         if self.status == 'pending':
-            self.pet.increase_stock(self.quantity)
+            self.pet.increase_stock(self.quantity, kind=StockMovement.CANCEL, order=self)
         super().delete(*args, **kwargs)
     
     def cancel_order(self):
         """ยกเลิกคำสั่งซื้อและคืนสต็อก"""
         if self.status == 'pending':
             self.status = 'cancelled'
-            self.pet.increase_stock(self.quantity)
+            self.pet.increase_stock(self.quantity, kind=StockMovement.CANCEL, order=self)
             self.save()
             return True
         return False
@@ -112,16 +123,14 @@ class Order(models.Model):
         # ตรวจสอบสต็อกถ้าจำนวนเพิ่มขึ้น
         if new_quantity > old_quantity:
             additional_quantity = new_quantity - old_quantity
-            if self.pet.stock_quantity < additional_quantity:
+            # ลดสต็อกเพิ่ม (atomic - ล้มเหลวถ้าสต็อกไม่พอ)
+            if not self.pet.reduce_stock(additional_quantity, kind=StockMovement.ORDER_CHANGE, order=self):
                 return False, f"สต็อกไม่พอ! มีเพียง {self.pet.stock_quantity} ตัว"
-            
-            # ลดสต็อกเพิ่ม
-            self.pet.reduce_stock(additional_quantity)
         
         # คืนสต็อกถ้าจำนวนลดลง
         elif new_quantity < old_quantity:
             returned_quantity = old_quantity - new_quantity
-            self.pet.increase_stock(returned_quantity)
+            self.pet.increase_stock(returned_quantity, kind=StockMovement.ORDER_CHANGE, order=self)
         
         # อัพเดทจำนวน
         self.quantity = new_quantity
@@ -156,4 +165,46 @@ class Order(models.Model):
     class Meta:
         ordering = ['-order_date']
         verbose_name = 'คำสั่งซื้อ'
-        verbose_name_plural = 'คำสั่งซื้อ'
\ No newline at end of file
+        verbose_name_plural = 'คำสั่งซื้อ'
+        indexes = [
+            # สถิติ/รายการคำสั่งซื้อของลูกค้าแยกตามสถานะ
+            models.Index(fields=['user', 'status'], name='order_user_status_idx'),
+            # order_list / profile ของลูกค้า (เรียงตามวันที่)
+            models.Index(fields=['user', '-order_date'], name='order_user_date_idx'),
+            # seller dashboard กรองตามสถานะ (เรียง -order_date, id ใน index ไม่ต้อง sort)
+            models.Index(fields=['status', '-order_date', 'id'], name='order_status_date_idx'),
+            # keyset pagination และ seller dashboard (-order_date, id)
+            models.Index(fields=['-order_date', 'id'], name='order_date_idx'),
+        ]
+
+class Cart(models.Model):
+    """ตะกร้าสินค้าฝั่ง server (หนึ่งใบต่อผู้ใช้ ใช้ร่วมกันได้ทุกอุปกรณ์)"""
+    user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, related_name='cart')
+    created_at = models.DateTimeField(auto_now_add=True)
+    # เปลี่ยนทุกครั้งที่รายการในตะกร้าเปลี่ยน (ใช้เป็นส่วนหนึ่งของ cache key ยอดรวม)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Cart #{self.id} - {self.user.email}"
+    
+    class Meta:
+        verbose_name = 'ตะกร้าสินค้า'
+        verbose_name_plural = 'ตะกร้าสินค้า'
+
+
+class CartItem(models.Model):
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
+    pet = models.ForeignKey(Pet, on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField(default=1)
+    added_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.pet_id} x {self.quantity}"
+    
+    class Meta:
+        ordering = ['added_at', 'id']
+        verbose_name = 'รายการในตะกร้า'
+        verbose_name_plural = 'รายการในตะกร้า'
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'pet'], name='cartitem_cart_pet_unique'),
+        ]
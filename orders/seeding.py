@@ -0,0 +1,222 @@
+"""
+สร้างข้อมูลจำลองปริมาณมาก (ใช้โดย ``manage.py seed_petstore`` และ ``manage.py bench``)
+
+ผลลัพธ์ขึ้นกับ seed เท่านั้น (deterministic) ผู้ใช้/หมวดหมู่/สัตว์เลี้ยงสร้างด้วย bulk_create
+ส่วนคำสั่งซื้อซึ่งมีจำนวนมากที่สุดใช้ executemany ตรงๆ เป็น batch เพื่อไม่ต้องสร้าง model instance
+ทีละแถว และกำหนด order_date ย้อนหลังได้ (auto_now_add จะทับค่าถ้าใช้ bulk_create)
+"""
+import random
+from datetime import timedelta, timezone as dt_timezone
+from decimal import Decimal
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.db import connections, router, transaction
+from django.db.models import Q
+from django.utils import timezone
+from pets import search
+from pets.cache import get_cache as get_catalog_cache
+from pets.models import Pet, Category, StockMovement
+from users.models import CustomUser
+from .models import Order
+from .services import invalidate_order_stats
+
+SEED_PREFIX = 'seed_'
+
+# สัดส่วนที่ใกล้เคียงข้อมูลจริง
+STATUS_WEIGHTS = {'completed': 70, 'pending': 20, 'cancelled': 10}
+DELIVERY_WEIGHTS = {'pickup': 65, 'delivery': 35}
+QUANTITY_WEIGHTS = {1: 80, 2: 15, 3: 5}
+# สัตว์เลี้ยงส่วนใหญ่มีสต็อก บางส่วนใกล้หมดหรือหมดแล้ว
+STOCK_PROFILE_WEIGHTS = {'in_stock': 80, 'low_stock': 15, 'out_of_stock': 5}
+
+CATEGORY_NAMES = ['สุนัข', 'แมว', 'นก', 'ปลา', 'กระต่าย', 'แฮมสเตอร์', 'เต่า', 'งู', 'กิ้งก่า', 'ชูการ์ไกลเดอร์']
+PET_NAMES = ['Buddy', 'Luna', 'Max', 'Bella', 'Charlie', 'Milo', 'Coco', 'Mochi', 'ส้มโอ', 'ข้าวปั้น', 'ทองหยิบ', 'มะลิ']
+PET_TRAITS = ['ขี้เล่น', 'เชื่อง', 'ฉลาด', 'ขี้อ้อน', 'แข็งแรง', 'friendly', 'calm', 'playful']
+
+
+def _choices(rng, weights, k):
+    population = list(weights)
+    return rng.choices(population, cum_weights=list(accumulate(weights.values())), k=k)
+
+
+def _seed_users(rng, users, sellers, batch_size, prefix):
+    password = make_password('password')
+    CustomUser.objects.bulk_create([
+        CustomUser(
+            username=f'{prefix}user_{i}',
+            email=f'{prefix}user_{i}@example.com',
+            first_name=rng.choice(PET_NAMES),
+            password=password,
+            role='seller' if i < sellers else 'customer',
+        )
+        for i in range(users)
+    ], batch_size=batch_size)
+    rows = CustomUser.objects.filter(username__startswith=prefix).order_by('id').values_list('id', 'role')
+    seller_ids = [user_id for user_id, role in rows if role == 'seller']
+    customer_ids = [user_id for user_id, role in rows if role == 'customer']
+    return seller_ids, customer_ids or seller_ids
+
+
+def _seed_categories(categories, batch_size, prefix):
+    Category.objects.bulk_create([
+        Category(
+            name=f'{prefix}{CATEGORY_NAMES[i % len(CATEGORY_NAMES)]} {i}',
+            description=f'หมวดหมู่ทดสอบ {i}'
+        )
+        for i in range(categories)
+    ], batch_size=batch_size)
+    return list(Category.objects.filter(name__startswith=prefix).order_by('id').values_list('id', flat=True))
+
+
+def _seed_pets(rng, pets, category_ids, seller_ids, batch_size, prefix):
+    profiles = _choices(rng, STOCK_PROFILE_WEIGHTS, pets)
+    batch = []
+    for i, profile in enumerate(profiles):
+        threshold = rng.randint(1, 10)
+        if profile == 'in_stock':
+            stock = rng.randint(threshold + 1, 5000)
+        elif profile == 'low_stock':
+            stock = rng.randint(1, threshold)
+        else:
+            stock = 0
+        batch.append(Pet(
+            name=f'{rng.choice(PET_NAMES)} {i}',
+            description=f'{prefix}pet {i} นิสัย{rng.choice(PET_TRAITS)} {rng.choice(PET_TRAITS)}',
+            category_id=rng.choice(category_ids),
+            price=Decimal(rng.randrange(500, 5000000)) / 100,
+            gender=rng.choice('MF'),
+            is_available=rng.random() > 0.05,
+            stock_quantity=stock,
+            min_stock_threshold=threshold,
+            created_by_id=rng.choice(seller_ids),
+        ))
+        if len(batch) >= batch_size:
+            Pet.objects.bulk_create(batch)
+            batch = []
+    Pet.objects.bulk_create(batch)
+    rows = list(
+        Pet.objects.filter(created_by__username__startswith=prefix)
+        .order_by('id').values_list('id', 'price', 'stock_quantity')
+    )
+    # bulk_create ไม่ผ่าน Pet.save() จึงต้องเปิดสมุดบัญชีสต็อกเอง
+    StockMovement.objects.bulk_create([
+        StockMovement(pet_id=pet_id, kind=StockMovement.INITIAL, quantity=stock)
+        for pet_id, _, stock in rows
+    ], batch_size=batch_size)
+    return [(pet_id, price) for pet_id, price, _ in rows]
+
+
+def _sqlite_bulk_load(connection):
+    """ขยาย page cache ของ SQLite ระหว่าง insert จำนวนมาก (index ไม่ต้อง spill ลงดิสก์กลาง transaction)"""
+    if connection.vendor != 'sqlite':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA cache_size')
+        previous = cursor.fetchone()[0]
+        cursor.execute('PRAGMA cache_size = -262144')
+    return previous
+
+
+def _seed_orders(rng, orders, pet_rows, customer_ids, days, batch_size):
+    connection = connections[router.db_for_write(Order)]
+    ops = connection.ops
+    columns = ['user_id', 'pet_id', 'quantity', 'total_price', 'status', 'delivery_method',
+               'pickup_date', 'recipient_name', 'order_date', 'updated_at']
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        ops.quote_name(Order._meta.db_table),
+        ', '.join(ops.quote_name(column) for column in columns),
+        ', '.join(['%s'] * len(columns))
+    )
+    # แปลงค่าที่ซ้ำได้ล่วงหน้า แทนการเรียก ops.adapt_*() ทุกแถว
+    quantity_options = list(QUANTITY_WEIGHTS)
+    pet_totals = [
+        (pet_id, {q: ops.adapt_decimalfield_value(price * q, 10, 2) for q in quantity_options})
+        for pet_id, price in pet_rows
+    ]
+    now = timezone.now().replace(microsecond=0)
+    if connection.features.supports_timezones:
+        adapt_datetime = None
+    else:
+        # แบบเดียวกับ adapt_datetimefield_value ของ SQLite/MySQL: เก็บเป็นเวลา UTC แบบ naive
+        if timezone.is_aware(now):
+            now = timezone.make_naive(now, dt_timezone.utc)
+        adapt_datetime = str
+    span = days * 86400
+
+    with connection.cursor() as cursor:
+        for offset in range(0, orders, batch_size):
+            size = min(batch_size, orders - offset)
+            statuses = _choices(rng, STATUS_WEIGHTS, size)
+            methods = _choices(rng, DELIVERY_WEIGHTS, size)
+            quantities = _choices(rng, QUANTITY_WEIGHTS, size)
+            pets = rng.choices(pet_totals, k=size)
+            users = rng.choices(customer_ids, k=size)
+            # แต่ละ batch ได้ช่วงวันที่ของตัวเองแล้วเรียงจากเก่าไปใหม่ ให้ id มากกว่ามีวันที่ใหม่กว่าเหมือนข้อมูลจริง
+            newest_age = span * (orders - offset - size) // orders
+            window = max(1, span * size // orders)
+            ages = sorted((newest_age + rng.randrange(window) for _ in range(size)), reverse=True)
+            rows = []
+            for i in range(size):
+                pet_id, totals = pets[i]
+                order_date = now - timedelta(seconds=ages[i])
+                pickup_date = None
+                if methods[i] == 'pickup':
+                    pickup_date = str(order_date.date() + timedelta(days=ages[i] % 8))
+                stamp = adapt_datetime(order_date) if adapt_datetime else order_date
+                rows.append((
+                    users[i], pet_id, quantities[i], totals[quantities[i]],
+                    statuses[i], methods[i], pickup_date, f'ลูกค้า {offset + i}', stamp, stamp,
+                ))
+            cursor.executemany(sql, rows)
+
+
+def clear_seed_data():
+    """ลบข้อมูลที่สร้างโดย seed ก่อนหน้า คืนค่าจำนวนคำสั่งซื้อที่ลบ"""
+    seed_users = CustomUser.objects.filter(username__startswith=SEED_PREFIX)
+    seed_orders = Order.objects.filter(Q(user__in=seed_users) | Q(pet__created_by__in=seed_users))
+    connection = connections[router.db_for_write(Order)]
+    with transaction.atomic():
+        # ลบคำสั่งซื้อด้วย DELETE เดียว (ไม่ผ่าน collector/signal ซึ่งช้ามากเมื่อมีหลักล้านแถว)
+        ids_sql, params = seed_orders.values('id').query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {connection.ops.quote_name(Order._meta.db_table)} WHERE id IN ({ids_sql})', params
+            )
+            deleted = cursor.rowcount
+        seed_users.delete()
+        Category.objects.filter(name__startswith=SEED_PREFIX).delete()
+        transaction.on_commit(invalidate_order_stats)
+    return deleted
+
+
+def seed_dataset(users=50, categories=5, pets=200, orders=1000, seed=0, sellers=None,
+                 days=365, batch_size=5000, prefix=SEED_PREFIX):
+    """สร้างข้อมูลจำลองทั้งหมดใน transaction เดียว คืนค่า dict จำนวนที่สร้าง
+
+    sellers คือจำนวนผู้ขาย (ค่าเริ่มต้น 10% ของผู้ใช้) และ days คือช่วงวันที่ย้อนหลังของคำสั่งซื้อ
+    prefix ของชื่อผู้ใช้/หมวดหมู่ต้องขึ้นต้นด้วย SEED_PREFIX (clear_seed_data ลบได้) และไม่ซ้ำกับข้อมูลที่มีอยู่
+    """
+    if not prefix.startswith(SEED_PREFIX):
+        raise ValueError(f'prefix ต้องขึ้นต้นด้วย {SEED_PREFIX!r}')
+    rng = random.Random(seed)
+    sellers = max(1, users // 10 if sellers is None else sellers)
+
+    connection = connections[router.db_for_write(Order)]
+    previous_cache_size = _sqlite_bulk_load(connection)
+    try:
+        with transaction.atomic():
+            seller_ids, customer_ids = _seed_users(rng, users, sellers, batch_size, prefix)
+            category_ids = _seed_categories(categories, batch_size, prefix)
+            pet_rows = _seed_pets(rng, pets, category_ids, seller_ids, batch_size, prefix)
+            _seed_orders(rng, orders, pet_rows, customer_ids, days, batch_size)
+            # bulk insert ไม่ส่ง signal จึงต้องสร้าง search index และล้าง cache เอง
+            search.rebuild_index()
+            transaction.on_commit(invalidate_order_stats)
+    finally:
+        if previous_cache_size is not None:
+            with connection.cursor() as cursor:
+                cursor.execute(f'PRAGMA cache_size = {int(previous_cache_size)}')
+    get_catalog_cache().clear()
+
+    return {'users': users, 'sellers': len(seller_ids), 'categories': categories, 'pets': pets, 'orders': orders}
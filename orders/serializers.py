@@ -1,6 +1,9 @@
 from rest_framework import serializers
 from .models import Order
-from pets.serializers import PetListSerializer
+from pets.images import variant_urls
+from pets.models import stock_annotations
+from pets.serializers import PetListSerializer, image_fields
+from users.models import CustomUser
 from users.serializers import UserSerializer
 
 class OrderSerializer(serializers.ModelSerializer):
@@ -70,4 +73,70 @@ class OrderSerializer(serializers.ModelSerializer):
         quantity = validated_data['quantity']
         validated_data['total_price'] = pet.price * quantity
         
-        return super().create(validated_data)
\ No newline at end of file
+        return super().create(validated_data)
+
+class OrderListRowSerializer(serializers.BaseSerializer):
+    """Read-only serializer สำหรับ list actions ที่อ่านจาก ``.values()`` (JOIN pet/category/user ใน query เดียว)
+
+    ผลลัพธ์มีรูปแบบเดียวกับ OrderSerializer แต่ไม่สร้าง model instance และ nested serializer ทีละแถว
+    สถานะสต็อกของสัตว์เลี้ยงคำนวณใน SQL
+    """
+    values = (
+        'id', 'user_id', 'pet_id', 'quantity', 'total_price', 'status', 'delivery_method',
+        'pickup_date', 'recipient_name', 'order_date', 'updated_at',
+        'pet__name', 'pet__price', 'pet__image', 'pet__image_url', 'pet__image_variants', 'pet__category__name',
+        'pet__is_available', 'pet__gender', 'pet__stock_quantity', 'pet_stock_status', 'pet_is_low_stock',
+        'user__username', 'user__email', 'user__first_name', 'user__last_name', 'user__phone',
+        'user__role', 'user__is_staff',
+    )
+    datetime_field = serializers.DateTimeField()
+    date_field = serializers.DateField()
+    role_names = dict(CustomUser.ROLE_CHOICES)
+
+    @classmethod
+    def project(cls, queryset):
+        annotations = {f'pet_{name}': expression for name, expression in stock_annotations('pet__').items()}
+        return queryset.annotate(**annotations).values(*cls.values)
+
+    def to_representation(self, row):
+        image, image_display = image_fields(row['pet__image'], row['pet__image_url'], self.context.get('request'))
+        pickup_date = row['pickup_date']
+        return {
+            'id': row['id'],
+            'pet_details': {
+                'id': row['pet_id'],
+                'name': row['pet__name'],
+                'price': str(row['pet__price']),
+                'image': image,
+                'image_url': row['pet__image_url'],
+                'image_display': image_display,
+                'image_variants': variant_urls(row['pet__image_variants'], image_display),
+                'category_name': row['pet__category__name'],
+                'is_available': row['pet__is_available'],
+                'gender': row['pet__gender'],
+                'stock_quantity': row['pet__stock_quantity'],
+                'stock_status': row['pet_stock_status'],
+                'is_low_stock': row['pet_is_low_stock'],
+            },
+            'user_details': {
+                'id': row['user_id'],
+                'username': row['user__username'],
+                'email': row['user__email'],
+                'first_name': row['user__first_name'],
+                'last_name': row['user__last_name'],
+                'phone': row['user__phone'],
+                'role': row['user__role'],
+                'role_display': self.role_names.get(row['user__role'], 'ลูกค้า'),
+                'is_staff': row['user__is_staff'],
+            },
+            'quantity': row['quantity'],
+            'total_price': str(row['total_price']),
+            'status': row['status'],
+            'delivery_method': row['delivery_method'],
+            'pickup_date': self.date_field.to_representation(pickup_date) if pickup_date else None,
+            'recipient_name': row['recipient_name'],
+            'order_date': self.datetime_field.to_representation(row['order_date']),
+            'updated_at': self.datetime_field.to_representation(row['updated_at']),
+            'user': row['user_id'],
+            'pet': row['pet_id'],
+        }
@@ -0,0 +1,438 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from pets import cache as catalog_cache
+from pets.models import Pet, StockMovement
+from pets.services import apply_stock_changes, enqueue_stock_alerts, record_movements
+from petstore_project import replicas
+from petstore_project.database import write_atomic
+from .models import Cart, CartItem, Order
+
+# โหมดการสั่งซื้อจากตะกร้า
+FILL_PARTIAL = 'partial'                # สร้างเฉพาะรายการที่สั่งได้ ข้ามรายการที่มีปัญหา
+FILL_ALL_OR_NOTHING = 'all_or_nothing'  # ถ้ามีรายการใดสั่งไม่ได้ ยกเลิกทั้งตะกร้า
+FILL_MODES = (FILL_PARTIAL, FILL_ALL_OR_NOTHING)
+
+
+class CheckoutError(Exception):
+    """สั่งซื้อไม่สำเร็จ (ใช้ในโหมด all-or-nothing)"""
+
+    def __init__(self, warnings):
+        self.warnings = warnings
+        super().__init__('; '.join(warnings))
+
+
+def _normalize_cart(cart_data):
+    """รวมจำนวนของสัตว์เลี้ยงตัวเดียวกัน คืนค่า {pet_id: quantity} ตามลำดับในตะกร้า"""
+    lines = {}
+    invalid = 0
+    for item in cart_data:
+        try:
+            pet_id = int(item['petId'])
+            quantity = int(item.get('quantity', 1))
+        except (KeyError, TypeError, ValueError):
+            invalid += 1
+            continue
+        if quantity <= 0:
+            invalid += 1
+            continue
+        lines[pet_id] = lines.get(pet_id, 0) + quantity
+    return lines, invalid
+
+
+def checkout_cart(user, cart_data, delivery_method='pickup', pickup_date=None,
+                  recipient_name='', fill_mode=FILL_PARTIAL):
+    """สร้างคำสั่งซื้อจากตะกร้าใน transaction เดียว
+
+    ใช้จำนวน query คงที่ไม่ขึ้นกับขนาดตะกร้า: โหลดสัตว์เลี้ยงทั้งหมดด้วย in_bulk
+    (select_for_update), ตรวจสอบในหน่วยความจำ, bulk_create คำสั่งซื้อ และหักสต็อก
+    ทุกรายการด้วย UPDATE เดียว คืนค่า (created_orders, warnings)
+    """
+    if fill_mode not in FILL_MODES:
+        raise ValueError(f'Unknown fill mode: {fill_mode}')
+
+    lines, invalid = _normalize_cart(cart_data)
+    warnings = []
+    if invalid:
+        warnings.append('ข้อมูลตะกร้าบางรายการไม่ถูกต้อง')
+    if not lines:
+        return [], warnings
+
+    recipient_name = recipient_name or user.get_full_name() or user.username
+
+    # SQLite ไม่มี row lock (select_for_update ไม่มีผล) จึงจอง write lock ตั้งแต่ BEGIN แทน
+    with write_atomic():
+        pets = Pet.objects.select_for_update().in_bulk(list(lines))
+
+        accepted = {}
+        for pet_id, quantity in lines.items():
+            pet = pets.get(pet_id)
+            if pet is None:
+                warnings.append('ไม่พบสัตว์เลี้ยงบางรายการในระบบ')
+            elif not pet.is_available:
+                warnings.append(f'{pet.name} ไม่พร้อมขายในขณะนี้')
+            elif pet.stock_quantity < quantity:
+                warnings.append(f'{pet.name} สต็อกไม่พอ! มีเพียง {pet.stock_quantity} ตัว')
+            else:
+                accepted[pet_id] = quantity
+
+        if fill_mode == FILL_ALL_OR_NOTHING and len(accepted) != len(lines):
+            raise CheckoutError(warnings)
+        if not accepted:
+            return [], warnings
+
+        # หักสต็อกทุกรายการใน UPDATE เดียว โดยยังคงเงื่อนไข stock_quantity >= quantity ต่อแถว
+        updated = apply_stock_changes(
+            deltas={pet_id: -quantity for pet_id, quantity in accepted.items()},
+            floors=accepted,
+        )
+        if updated != len(accepted):
+            # มีคำสั่งซื้ออื่นหักสต็อกตัดหน้า - rollback ทั้งหมด
+            raise CheckoutError(['สต็อกมีการเปลี่ยนแปลงระหว่างสั่งซื้อ กรุณาลองใหม่อีกครั้ง'])
+        # ตรวจการข้ามเส้นสต็อกต่ำในหน่วยความจำ (INSERT เพิ่มเฉพาะเมื่อมีเหตุการณ์) แจ้งเตือนใน worker
+        enqueue_stock_alerts(
+            (pet_id, pets[pet_id].stock_quantity, pets[pet_id].stock_quantity - quantity,
+             pets[pet_id].min_stock_threshold)
+            for pet_id, quantity in accepted.items()
+        )
+        catalog_cache.invalidate_pets((pet_id, pets[pet_id].category_id) for pet_id in accepted)
+
+        created_orders = Order.objects.bulk_create([
+            Order(
+                user=user,
+                pet=pets[pet_id],
+                quantity=quantity,
+                total_price=pets[pet_id].price * quantity,
+                status='pending',
+                delivery_method=delivery_method,
+                pickup_date=pickup_date or None,
+                recipient_name=recipient_name,
+            )
+            for pet_id, quantity in accepted.items()
+        ])
+        record_movements([
+            StockMovement(pet_id=order.pet_id, kind=StockMovement.SALE, quantity=-order.quantity,
+                          order=order if order.pk else None, created_by=user)
+            for order in created_orders
+        ])
+
+    transaction.on_commit(invalidate_order_stats)
+    return created_orders, warnings
+
+
+# ---------------------------------------------------------------------------
+# สถิติคำสั่งซื้อ
+# ---------------------------------------------------------------------------
+
+ORDER_STATS_VERSION_KEY = 'order_stats:version'
+
+
+def _money_sum(condition=None):
+    return Coalesce(
+        Sum('total_price', filter=condition),
+        Value(0),
+        output_field=DecimalField(max_digits=14, decimal_places=2)
+    )
+
+
+def _stats_aggregates():
+    aggregates = {
+        'total_orders': Count('id'),
+        'pending_orders': Count('id', filter=Q(status='pending')),
+        'completed_orders': Count('id', filter=Q(status='completed')),
+        'cancelled_orders': Count('id', filter=Q(status='cancelled')),
+        'total_revenue': _money_sum(~Q(status='cancelled')),
+        'completed_revenue': _money_sum(Q(status='completed')),
+    }
+    for method, _label in Order.DELIVERY_METHOD_CHOICES:
+        aggregates[f'{method}_orders'] = Count('id', filter=Q(delivery_method=method))
+        aggregates[f'{method}_revenue'] = _money_sum(
+            Q(delivery_method=method) & ~Q(status='cancelled')
+        )
+    return aggregates
+
+
+def _stats_version():
+    return cache.get_or_set(ORDER_STATS_VERSION_KEY, 1, None)
+
+
+def _stats_cache_key(user=None, seller=None):
+    version = _stats_version()
+    user_id = user.pk if user is not None else '-'
+    seller_id = seller.pk if seller is not None else '-'
+    return f'order_stats:v{version}:user={user_id}:seller={seller_id}'
+
+
+def invalidate_order_stats():
+    """ล้าง cache สถิติทุก scope (เพิ่ม version แทนการไล่ลบทีละ key)"""
+    try:
+        cache.incr(ORDER_STATS_VERSION_KEY)
+    except ValueError:
+        cache.set(ORDER_STATS_VERSION_KEY, 1, None)
+
+
+def scoped_orders(user=None, seller=None):
+    """คำสั่งซื้อตาม scope ของสถิติ (ดู get_order_stats)"""
+    queryset = Order.objects.all()
+    if user is not None:
+        queryset = queryset.filter(user=user)
+    if seller is not None:
+        queryset = queryset.filter(pet__created_by=seller)
+    return queryset
+
+
+def get_order_stats(user=None, seller=None, use_cache=True):
+    """สถิติคำสั่งซื้อทั้งหมดใน aggregate query เดียว
+
+    user: เฉพาะคำสั่งซื้อของลูกค้าคนนี้, seller: เฉพาะคำสั่งซื้อของสัตว์เลี้ยงที่ผู้ขายคนนี้ลงขาย
+    ผลลัพธ์ถูก cache ตาม scope เป็นเวลา ORDER_STATS_CACHE_TIMEOUT วินาที
+    และถูกล้างทุกครั้งที่มีการบันทึก/ลบคำสั่งซื้อ
+    """
+    timeout = getattr(settings, 'ORDER_STATS_CACHE_TIMEOUT', 30)
+    cache_key = None
+    if use_cache and timeout:
+        cache_key = _stats_cache_key(user, seller)
+        stats = cache.get(cache_key)
+        if stats is not None:
+            return stats
+
+    row = scoped_orders(user, seller).aggregate(**_stats_aggregates())
+    stats = {
+        'total_orders': row['total_orders'],
+        'pending_orders': row['pending_orders'],
+        'completed_orders': row['completed_orders'],
+        'cancelled_orders': row['cancelled_orders'],
+        'total_revenue': row['total_revenue'],
+        'completed_revenue': row['completed_revenue'],
+        'delivery_methods': {
+            method: {
+                'orders': row[f'{method}_orders'],
+                'revenue': row[f'{method}_revenue'],
+            }
+            for method, _label in Order.DELIVERY_METHOD_CHOICES
+        },
+    }
+
+    if cache_key:
+        cache.set(cache_key, stats, replicas.cache_timeout(timeout))
+    return stats
+
+
+def get_order_customers(use_cache=True):
+    """ลูกค้าที่เคยสั่งซื้อ พร้อมจำนวนคำสั่งซื้อและยอดรวม (ตัวเลือก filter ของ seller dashboard)
+
+    เป็น GROUP BY ทั้งตาราง จึง cache ร่วม version กับ get_order_stats (ล้างพร้อมกันเมื่อคำสั่งซื้อเปลี่ยน)
+    """
+    timeout = getattr(settings, 'ORDER_STATS_CACHE_TIMEOUT', 30)
+    cache_key = None
+    if use_cache and timeout:
+        cache_key = f'order_customers:v{_stats_version()}'
+        customers = cache.get(cache_key)
+        if customers is not None:
+            return customers
+
+    customers = list(Order.objects.values(
+        'user__username', 'user__first_name', 'user__last_name'
+    ).annotate(
+        order_count=Count('id'),
+        total_spent=Sum('total_price')
+    ).order_by('user__username'))
+
+    if cache_key:
+        cache.set(cache_key, customers, replicas.cache_timeout(timeout))
+    return customers
+
+
+# ---------------------------------------------------------------------------
+# ตะกร้าสินค้า (server-side)
+# ---------------------------------------------------------------------------
+
+class CartError(Exception):
+    """เพิ่ม/แก้ไขรายการในตะกร้าไม่สำเร็จ"""
+
+
+def get_cart(user, create=True):
+    """ตะกร้าของผู้ใช้ (สร้างใหม่ถ้ายังไม่มีและ create=True)"""
+    if create:
+        return Cart.objects.get_or_create(user=user)[0]
+    return Cart.objects.filter(user=user).first()
+
+
+def _touch_cart(cart):
+    # เปลี่ยน updated_at เพื่อให้ cache ยอดรวมของตะกร้าหมดอายุ
+    cart.updated_at = timezone.now()
+    Cart.objects.filter(pk=cart.pk).update(updated_at=cart.updated_at)
+
+
+def _sellable_pet(pet_id):
+    pet = Pet.objects.only('id', 'name', 'is_available', 'stock_quantity').filter(pk=pet_id).first()
+    if pet is None:
+        raise CartError('ไม่พบสัตว์เลี้ยงนี้ในระบบ')
+    if not pet.is_available_for_sale:
+        raise CartError(f'{pet.name} ไม่พร้อมขายในขณะนี้')
+    return pet
+
+
+def set_cart_quantity(cart, pet_id, quantity):
+    """กำหนดจำนวนของสัตว์เลี้ยงในตะกร้า (0 = ลบออก)"""
+    if quantity <= 0:
+        remove_from_cart(cart, pet_id)
+        return 0
+    pet = _sellable_pet(pet_id)
+    if quantity > pet.stock_quantity:
+        raise CartError(f'ไม่สามารถเพิ่มได้! {pet.name} เหลือเพียง {pet.stock_quantity} ตัว')
+    CartItem.objects.update_or_create(cart=cart, pet=pet, defaults={'quantity': quantity})
+    _touch_cart(cart)
+    return quantity
+
+
+def _increment_cart_item(cart, pet, quantity):
+    # UPDATE เดียวแบบมีเงื่อนไข: เพิ่มจากค่าในแถว (ไม่ใช่ค่าที่อ่านไว้) และเฉพาะเมื่อไม่เกินสต็อก ณ ตอนนั้น
+    return CartItem.objects.filter(
+        cart=cart, pet=pet, quantity__lte=F('pet__stock_quantity') - quantity
+    ).update(quantity=F('quantity') + quantity)
+
+
+def add_to_cart(cart, pet_id, quantity=1):
+    """เพิ่มสัตว์เลี้ยงลงตะกร้า คืนค่าจำนวนรวมของรายการนั้น
+
+    ปลอดภัยเมื่อเพิ่มพร้อมกันหลาย request: แถวเดิมเพิ่มด้วย UPDATE ... SET quantity = quantity + n
+    ที่มีเงื่อนไขสต็อก ถ้าไม่มีแถวถูกเพิ่มจึง INSERT และถ้าชน unique (cart, pet) (แถวมีอยู่แล้วหรืออีก request
+    สร้างไปก่อน) จะกลับไป UPDATE อีกครั้ง
+    """
+    if quantity <= 0:
+        raise CartError('จำนวนต้องมากกว่า 0')
+    pet = _sellable_pet(pet_id)
+    items = CartItem.objects.filter(cart=cart, pet=pet)
+    updated = _increment_cart_item(cart, pet, quantity)
+    if not updated and quantity <= pet.stock_quantity:
+        try:
+            with transaction.atomic():
+                CartItem.objects.create(cart=cart, pet=pet, quantity=quantity)
+            updated = True
+        except IntegrityError:
+            updated = _increment_cart_item(cart, pet, quantity)
+    if not updated:
+        pet.refresh_from_db(fields=['stock_quantity'])
+        current = items.values_list('quantity', flat=True).first() or 0
+        raise CartError(
+            f'ไม่สามารถเพิ่มได้! {pet.name} เหลือเพียง {pet.stock_quantity} ตัว (ในตะกร้ามีแล้ว {current} ตัว)'
+        )
+    _touch_cart(cart)
+    return items.values_list('quantity', flat=True).first()
+
+
+def remove_from_cart(cart, pet_id):
+    if CartItem.objects.filter(cart=cart, pet_id=pet_id).delete()[0]:
+        _touch_cart(cart)
+
+
+def clear_cart(cart, pet_ids=None):
+    """ล้างตะกร้า (หรือเฉพาะรายการใน pet_ids)"""
+    items = CartItem.objects.filter(cart=cart)
+    if pet_ids is not None:
+        items = items.filter(pet_id__in=pet_ids)
+    if items.delete()[0]:
+        _touch_cart(cart)
+
+
+def merge_into_cart(cart, cart_data):
+    """รวมตะกร้ารูปแบบเดิม ([{'petId': .., 'quantity': ..}] จาก localStorage) เข้าตะกร้าฝั่ง server
+
+    ใช้จำนวน query คงที่: โหลดสัตว์เลี้ยงและรายการเดิมอย่างละ query แล้ว bulk_create/bulk_update
+    จำนวนที่เกินสต็อกจะถูกปรับลง คืนค่า list ของคำเตือน
+    """
+    lines, invalid = _normalize_cart(cart_data)
+    warnings = ['ข้อมูลตะกร้าบางรายการไม่ถูกต้อง'] if invalid else []
+    if not lines:
+        return warnings
+
+    pets = Pet.objects.only('id', 'name', 'is_available', 'stock_quantity').in_bulk(list(lines))
+    existing = {item.pet_id: item for item in CartItem.objects.filter(cart=cart, pet_id__in=list(lines))}
+    to_create, to_update = [], []
+    for pet_id, quantity in lines.items():
+        pet = pets.get(pet_id)
+        if pet is None or not pet.is_available_for_sale:
+            warnings.append(f'{pet.name} ไม่พร้อมขายในขณะนี้' if pet else 'ไม่พบสัตว์เลี้ยงบางรายการในระบบ')
+            continue
+        item = existing.get(pet_id)
+        total = (item.quantity if item else 0) + quantity
+        if total > pet.stock_quantity:
+            warnings.append(f'{pet.name} เหลือเพียง {pet.stock_quantity} ตัว ปรับจำนวนในตะกร้าแล้ว')
+            total = pet.stock_quantity
+        if item:
+            item.quantity = total
+            to_update.append(item)
+        else:
+            to_create.append(CartItem(cart=cart, pet_id=pet_id, quantity=total))
+
+    with transaction.atomic():
+        CartItem.objects.bulk_create(to_create)
+        CartItem.objects.bulk_update(to_update, ['quantity'])
+    if to_create or to_update:
+        _touch_cart(cart)
+    return warnings
+
+
+def get_cart_lines(cart):
+    """รายการในตะกร้าพร้อมราคาและสถานะพร้อมขาย (ทุกบรรทัดใน query เดียว)"""
+    lines = []
+    for item in cart.items.select_related('pet', 'pet__category'):
+        pet = item.pet
+        if not pet.is_available_for_sale:
+            warning = f'{pet.name} ไม่พร้อมขายในขณะนี้'
+        elif item.quantity > pet.stock_quantity:
+            warning = f'{pet.name} สต็อกไม่พอ! มีเพียง {pet.stock_quantity} ตัว'
+        else:
+            warning = None
+        lines.append({
+            'pet': pet,
+            'quantity': item.quantity,
+            'total_price': pet.price * item.quantity,
+            'available': warning is None,
+            'warning': warning,
+        })
+    return lines
+
+
+def summarize_cart_lines(lines):
+    return {
+        'line_count': len(lines),
+        'item_count': sum(line['quantity'] for line in lines),
+        'total_price': sum((line['total_price'] for line in lines), Decimal('0.00')),
+    }
+
+
+def get_cart_summary(cart):
+    """จำนวนและยอดรวมของตะกร้า (cache จนกว่าตะกร้าหรือข้อมูลสัตว์เลี้ยงจะเปลี่ยน)"""
+    def load():
+        summary = cart.items.aggregate(
+            line_count=Count('id'),
+            item_count=Coalesce(Sum('quantity'), 0),
+            total_price=Coalesce(
+                Sum(F('quantity') * F('pet__price'), output_field=DecimalField(max_digits=14, decimal_places=2)),
+                Value(0),
+                output_field=DecimalField(max_digits=14, decimal_places=2)
+            ),
+        )
+        summary['total_price'] = Decimal(summary['total_price']).quantize(Decimal('0.01'))
+        return summary
+
+    # updated_at เปลี่ยนเมื่อรายการในตะกร้าเปลี่ยน ส่วนราคา/สต็อกผูกกับ namespace pet.<id> ของสัตว์เลี้ยง
+    # ในตะกร้าเท่านั้น (ไม่ใช่ 'pets' ทั้ง catalog ที่ถูก bump ทุกครั้งที่มีคนสั่งซื้อ)
+    version = (cart.pk, cart.updated_at.isoformat())
+    pet_ids = catalog_cache.get_or_set(
+        [], ('cart_pets',) + version,
+        lambda: list(cart.items.order_by('pet_id').values_list('pet_id', flat=True))
+    )
+    return catalog_cache.get_or_set([f'pet.{pet_id}' for pet_id in pet_ids], ('cart',) + version, load)
+
+
+def cart_checkout_data(lines):
+    """แปลงรายการในตะกร้าเป็นรูปแบบที่ checkout_cart รับ"""
+    return [{'petId': line['pet'].pk, 'quantity': line['quantity']} for line in lines]
@@ -0,0 +1,12 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Order
+from .services import invalidate_order_stats
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def order_changed(sender, **kwargs):
+    """ล้าง cache สถิติเมื่อคำสั่งซื้อเปลี่ยนแปลง (หลัง commit เพื่อไม่ให้ cache ค่าเก่า)"""
+    transaction.on_commit(invalidate_order_stats)
@@ -1,3 +1,805 @@
-from django.test import TestCase
+import json
+import os
+import runpy
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.exceptions import ValidationError
+from django.core.management import call_command, CommandError
+from django.db import OperationalError, connection, connections, transaction
+from django.db.utils import ConnectionHandler
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from pets import cache as catalog_cache, search
+from pets.models import Category, Pet, StockAlertEvent, StockMovement
+from pets.services import reconcile_stock
+from pets.tests import create_pet
+from petstore_project.database import POOL_ENGINE, ConnectionPool, PoolTimeout, database_config, write_atomic
+from petstore_project.replicas import PIN_COOKIE, ReplicaRouter, use_replica
+from users.models import CustomUser
+from .models import CartItem, Order
+from .seeding import seed_dataset
+from .serializers import OrderListRowSerializer, OrderSerializer
+from .services import (
+    checkout_cart, get_order_stats, CheckoutError, FILL_ALL_OR_NOTHING, FILL_PARTIAL,
+    add_to_cart, CartError, get_cart, merge_into_cart
+)
+
+
+class OrderStockTests(TestCase):
+    def setUp(self):
+        self.pet = create_pet(stock_quantity=2)
+        self.customer = CustomUser.objects.create_user(
+            username='customer', email='customer@example.com', password='password'
+        )
+
+    def test_order_save_reduces_stock_once(self):
+        Order.objects.create(user=self.customer, pet=self.pet, quantity=2, total_price=0)
+        self.assertEqual(Pet.objects.get(pk=self.pet.pk).stock_quantity, 0)
+
+    def test_order_save_rolls_back_when_stock_taken(self):
+        stale_pet = Pet.objects.get(pk=self.pet.pk)
+        self.pet.reduce_stock(2)
+        with self.assertRaises(ValidationError):
+            # stale_pet ผ่าน clean() แต่ conditional UPDATE ต้องไม่ผ่าน
+            Order.objects.create(user=self.customer, pet=stale_pet, quantity=1, total_price=0)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(Pet.objects.get(pk=self.pet.pk).stock_quantity, 0)
+
+
+class CheckoutTests(TestCase):
+    def setUp(self):
+        self.pet = create_pet(stock_quantity=5)
+        self.customer = CustomUser.objects.create_user(
+            username='customer', email='customer@example.com', password='password'
+        )
+
+    def make_pets(self, count):
+        return [
+            Pet.objects.create(
+                name=f'Pet {i}', description='', category=self.pet.category, price=10,
+                gender='F', stock_quantity=3, created_by=self.pet.created_by
+            )
+            for i in range(count)
+        ]
+
+    def test_checkout_and_cancel_are_recorded_in_stock_ledger(self):
+        created, _ = checkout_cart(self.customer, [{'petId': self.pet.pk, 'quantity': 2}])
+        order = created[0]
+        order.cancel_order()
+        self.assertEqual(
+            list(order.stock_movements.values_list('kind', 'quantity')),
+            [(StockMovement.SALE, -2), (StockMovement.CANCEL, 2)]
+        )
+        self.assertEqual(reconcile_stock(), [])
+
+    def test_checkout_query_count_is_constant(self):
+        pets = self.make_pets(60)
+        small = [{'petId': p.pk, 'quantity': 1} for p in pets[:5]]
+        large = [{'petId': p.pk, 'quantity': 2} for p in pets[5:]]
+
+        # savepoint, โหลดสัตว์เลี้ยง, หักสต็อก, สร้างคำสั่งซื้อ, ลงสมุดบัญชีสต็อก, release
+        with self.assertNumQueries(6):
+            created, warnings = checkout_cart(self.customer, small)
+        self.assertEqual(len(created), 5)
+        # ทุกตัวข้ามเส้นสต็อกต่ำ: เพิ่ม INSERT เหตุการณ์แจ้งเตือนเพียงคำสั่งเดียว
+        with self.assertNumQueries(7):
+            created, warnings = checkout_cart(self.customer, large)
+        self.assertEqual(len(created), 55)
+        self.assertEqual(warnings, [])
+        self.assertEqual(StockAlertEvent.objects.count(), 55)
+        self.assertEqual(Pet.objects.get(pk=pets[-1].pk).stock_quantity, 1)
+
+    def test_partial_fill_skips_unavailable_lines(self):
+        cart = [{'petId': self.pet.pk, 'quantity': 2}, {'petId': self.pet.pk + 999}]
+        created, warnings = checkout_cart(self.customer, cart, fill_mode=FILL_PARTIAL)
+        self.assertEqual(len(created), 1)
+        self.assertEqual(created[0].total_price, 200)
+        self.assertEqual(len(warnings), 1)
+        self.assertEqual(Pet.objects.get(pk=self.pet.pk).stock_quantity, 3)
+
+    def test_all_or_nothing_rolls_back(self):
+        cart = [{'petId': self.pet.pk, 'quantity': 2}, {'petId': self.pet.pk + 999}]
+        with self.assertRaises(CheckoutError):
+            checkout_cart(self.customer, cart, fill_mode=FILL_ALL_OR_NOTHING)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(Pet.objects.get(pk=self.pet.pk).stock_quantity, 5)
+
+
+class OrderStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.pet = create_pet(stock_quantity=10)
+        self.customer = CustomUser.objects.create_user(
+            username='customer', email='customer@example.com', password='password'
+        )
+        Order.objects.create(user=self.customer, pet=self.pet, quantity=2, total_price=0)
+        Order.objects.create(
+            user=self.customer, pet=self.pet, quantity=1, total_price=0,
+            status='cancelled', delivery_method='delivery'
+        )
+
+    def test_stats_in_single_query(self):
+        with self.assertNumQueries(1):
+            stats = get_order_stats(use_cache=False)
+        self.assertEqual(stats['total_orders'], 2)
+        self.assertEqual(stats['pending_orders'], 1)
+        self.assertEqual(stats['cancelled_orders'], 1)
+        self.assertEqual(stats['total_revenue'], 200)
+        self.assertEqual(stats['delivery_methods']['delivery'], {'orders': 1, 'revenue': 0})
+        self.assertEqual(get_order_stats(seller=self.customer, use_cache=False)['total_orders'], 0)
+
+    def test_stats_cache_is_invalidated_on_order_write(self):
+        get_order_stats(user=self.customer)
+        with self.assertNumQueries(0):
+            get_order_stats(user=self.customer)
+        with self.captureOnCommitCallbacks(execute=True):
+            Order.objects.create(user=self.customer, pet=self.pet, quantity=1, total_price=0)
+        self.assertEqual(get_order_stats(user=self.customer)['total_orders'], 3)
+
+
+class SellerDashboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.pet = create_pet(stock_quantity=100)
+        self.customer = CustomUser.objects.create_user(
+            username='customer', email='customer@example.com', password='password'
+        )
+        self.client.force_login(self.pet.created_by)
+
+    def create_orders(self, count, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(count):
+                Order.objects.create(user=self.customer, pet=self.pet, quantity=1, total_price=0, **kwargs)
+
+    def test_dashboard_query_count_does_not_grow_with_orders(self):
+        self.create_orders(3)
+        self.client.get('/api/orders/seller/dashboard/')
+        with self.assertNumQueries(3):
+            self.client.get('/api/orders/seller/dashboard/')
+        self.create_orders(30)
+        self.client.get('/api/orders/seller/dashboard/')
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/orders/seller/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_count'], 33)
+        self.assertEqual(len(response.context['orders']), 33)
+
+    def test_dashboard_filters(self):
+        self.create_orders(2)
+        self.create_orders(1, delivery_method='delivery', recipient_name='x')
+        response = self.client.get('/api/orders/seller/dashboard/?delivery_method=delivery')
+        self.assertEqual(len(response.context['orders']), 1)
+        self.assertIsNone(response.context['total_count'])
+        response = self.client.get('/api/orders/seller/dashboard/?status=cancelled&date_from=bad')
+        self.assertEqual(len(response.context['orders']), 0)
+        customers = list(response.context['customers'])
+        self.assertEqual(customers[0]['order_count'], 3)
+
+    def test_dashboard_pages_with_cursor_and_keeps_filters(self):
+        self.create_orders(70)
+        self.create_orders(1, status='cancelled')
+        seen = []
+        url = '/api/orders/seller/dashboard/?status=pending'
+        while url:
+            response = self.client.get(url)
+            seen.extend(order.id for order in response.context['orders'])
+            url = response.context['next_page_url']
+            if url:
+                self.assertIn('status=pending', url)
+        self.assertEqual(seen, list(
+            Order.objects.filter(status='pending').order_by('-order_date', 'id').values_list('id', flat=True)
+        ))
+        response = self.client.get('/api/orders/seller/dashboard/?status=pending&cursor=bad')
+        self.assertRedirects(response, '/api/orders/seller/dashboard/?status=pending', fetch_redirect_response=False)
+
+
+class SellerDashboardLargeSeedTests(TestCase):
+    """แผนการ query ของ dashboard บนข้อมูลจำลองขนาดใหญ่ (หน้าลึกต้องไม่ OFFSET/sort และ GROUP BY ต้องถูก cache)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_dataset(users=200, categories=5, pets=100, orders=20000, seed=3)
+        cls.seller = CustomUser.objects.filter(role='seller').first()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.seller)
+
+    def order_page_sql(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, [q['sql'] for q in ctx.captured_queries if 'FROM "orders_order"' in q['sql']]
+
+    def test_deep_pages_seek_by_index(self):
+        url = '/api/orders/seller/dashboard/'
+        self.client.get(url)
+        for _ in range(5):
+            response, queries = self.order_page_sql(url)
+            url = response.context['next_page_url']
+        # หน้าที่ 6: อ่านตาราง orders ครั้งเดียว (ไม่มี COUNT/GROUP BY) ด้วย WHERE order_date < ... LIMIT
+        self.assertEqual(len(queries), 1)
+        sql = queries[0]
+        self.assertIn('LIMIT', sql)
+        self.assertNotIn('OFFSET', sql)
+        self.assertNotIn('GROUP BY', sql)
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            plan = ' | '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('order_date_idx', plan)
+        self.assertIn('<?', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_customer_aggregate_is_cached_until_orders_change(self):
+        self.client.get('/api/orders/seller/dashboard/')
+        _, queries = self.order_page_sql('/api/orders/seller/dashboard/')
+        self.assertFalse([sql for sql in queries if 'GROUP BY' in sql])
+        order = Order.objects.first()
+        order.status = 'completed'
+        with self.captureOnCommitCallbacks(execute=True):
+            order.save()
+        _, queries = self.order_page_sql('/api/orders/seller/dashboard/')
+        self.assertEqual(len([sql for sql in queries if 'GROUP BY' in sql]), 1)
+
+
+class BenchCommandTests(TestCase):
+    def test_bench_reports_every_endpoint(self):
+        out = StringIO()
+        call_command(
+            'bench', use_current_db=True, users=10, categories=2, pets=10, orders=20,
+            requests=2, warmup=0, stdout=out
+        )
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['meta']['dataset']['orders'], 20)
+        self.assertEqual(set(report['results']), {
+            'api_pets', 'api_orders', 'api_order_stats', 'pet_list', 'seller_dashboard', 'cart_checkout'
+        })
+        for name, result in report['results'].items():
+            self.assertEqual(sum(result['status_codes'].values()), 2, name)
+            self.assertLessEqual(result['latency_ms']['p50'], result['latency_ms']['p99'])
+        self.assertEqual(report['results']['api_pets']['status_codes'], {'200': 2})
+        self.assertEqual(Order.objects.count(), 20 + 2 * 5)
+
+    def test_bench_on_seeded_database(self):
+        call_command('seed_petstore', users=10, categories=2, pets=10, orders=20, stdout=StringIO())
+        for _ in range(2):
+            out = StringIO()
+            call_command(
+                'bench', use_current_db=True, users=10, categories=2, pets=10, orders=20,
+                requests=1, warmup=0, only=['api_orders'], stdout=out
+            )
+            report = json.loads(out.getvalue())
+            self.assertEqual(report['results']['api_orders']['status_codes'], {'200': 1})
+        self.assertEqual(CustomUser.objects.count(), 30)
+        # ข้อมูลของ bench ลบได้พร้อมข้อมูลจำลองอื่น
+        call_command('seed_petstore', clear_only=True, stdout=StringIO())
+        self.assertFalse(CustomUser.objects.exists())
+
+    def test_bench_serializers_compares_both_serializers(self):
+        out = StringIO()
+        call_command('bench_serializers', use_current_db=True, rows=20, repeat=1, stdout=out)
+        report = json.loads(out.getvalue())
+        for name in ('pets', 'orders'):
+            self.assertGreater(report['results'][name]['row_serializer']['total_us_per_row'], 0)
+            self.assertIn('speedup_serialize', report['results'][name])
+
+
+class SeedPetstoreTests(TestCase):
+    def seed(self, **options):
+        out = StringIO()
+        call_command('seed_petstore', users=20, categories=3, pets=15, orders=200, stdout=out, **options)
+        return json.loads(out.getvalue())
+
+    def snapshot(self):
+        return list(Order.objects.order_by('id').values_list(
+            'user__username', 'pet__name', 'quantity', 'total_price', 'status', 'delivery_method'
+        ))
+
+    def test_seed_is_deterministic_and_clearable(self):
+        report = self.seed(seed=7)
+        self.assertEqual(report['created']['orders'], 200)
+        self.assertEqual(CustomUser.objects.filter(role='seller').count(), 2)
+        first = self.snapshot()
+        self.assertEqual(len(first), 200)
+        self.assertEqual(set(row[4] for row in first), {'pending', 'completed', 'cancelled'})
+
+        with self.assertRaises(CommandError):
+            self.seed(seed=7)
+        report = self.seed(seed=7, clear=True)
+        self.assertEqual(report['cleared_orders'], 200)
+        self.assertEqual(self.snapshot(), first)
+        self.assertEqual(reconcile_stock(), [])
+
+    def test_orders_are_dated_in_id_order(self):
+        self.seed(days=30)
+        dates = list(Order.objects.order_by('id').values_list('order_date', flat=True))
+        self.assertEqual(dates, sorted(dates))
+        # bulk insert ไม่ผ่าน signal แต่ search index ต้องถูกสร้างใหม่แล้ว
+        pet = Pet.objects.order_by('id').last()
+        self.assertIn(pet.pk, search.search_pet_ids(pet.name))
+
+
+class ServerCartTests(TestCase):
+    def setUp(self):
+        self.pet = create_pet(stock_quantity=3, price=100)
+        self.customer = CustomUser.objects.create_user(
+            username='customer', email='customer@example.com', password='password'
+        )
+        self.client.force_login(self.customer)
+
+    def make_pets(self, count):
+        return [
+            Pet.objects.create(
+                name=f'Pet {i}', description='', category=self.pet.category, price=10,
+                gender='F', stock_quantity=3, created_by=self.pet.created_by
+            )
+            for i in range(count)
+        ]
+
+    def post_json(self, url, data, method='post'):
+        return getattr(self.client, method)(url, json.dumps(data), content_type='application/json')
+
+    def test_add_update_remove(self):
+        response = self.post_json('/api/cart/', {'petId': self.pet.pk, 'quantity': 2})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['item_count'], 2)
+        self.assertEqual(response.json()['total_price'], '200.00')
+
+        response = self.post_json('/api/cart/', {'petId': self.pet.pk, 'quantity': 2})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('เหลือเพียง 3 ตัว', response.json()['error'])
+
+        response = self.post_json(f'/api/cart/items/{self.pet.pk}/', {'quantity': 3}, method='patch')
+        self.assertEqual(response.json()['item_count'], 3)
+        response = self.client.delete(f'/api/cart/items/{self.pet.pk}/')
+        self.assertEqual(response.json()['line_count'], 0)
+
+    def test_cart_page_query_count_is_constant(self):
+        cart = get_cart(self.customer)
+        pets = self.make_pets(12)
+        merge_into_cart(cart, [{'petId': p.pk, 'quantity': 1} for p in pets[:2]])
+        # session + user + cart + รายการทั้งหมด
+        with self.assertNumQueries(4):
+            response = self.client.get('/cart/')
+        self.assertEqual(response.context['cart_count'], 2)
+
+        merge_into_cart(cart, [{'petId': p.pk, 'quantity': 2} for p in pets[2:]])
+        with self.assertNumQueries(4):
+            response = self.client.get('/cart/')
+        self.assertEqual(response.context['cart_count'], 22)
+        self.assertEqual(response.context['total_price'], 220)
+
+    def test_summary_is_cached_until_price_changes(self):
+        catalog_cache.get_cache().clear()
+        self.post_json('/api/cart/', {'petId': self.pet.pk, 'quantity': 2})
+        self.client.get('/api/cart/?summary=1')
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/cart/?summary=1')
+        self.assertEqual(response.json()['total_price'], '200.00')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pet.price = 150
+            self.pet.save()
+        self.assertEqual(self.client.get('/api/cart/?summary=1').json()['total_price'], '300.00')
+
+    def test_summary_survives_changes_to_other_pets(self):
+        catalog_cache.get_cache().clear()
+        other = self.make_pets(1)[0]
+        self.post_json('/api/cart/', {'petId': self.pet.pk, 'quantity': 1})
+        self.client.get('/api/cart/?summary=1')
+        with self.captureOnCommitCallbacks(execute=True):
+            other.price = 99
+            other.save()
+            checkout_cart(self.customer, [{'petId': other.pk, 'quantity': 1}])
+        # สัตว์เลี้ยงตัวอื่นเปลี่ยนราคาและถูกสั่งซื้อ - ตะกร้านี้ยังใช้ cache เดิม
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/cart/?summary=1')
+        self.assertEqual(response.json()['total_price'], '100.00')
+
+    def test_checkout_from_server_cart_keeps_failed_lines(self):
+        sold_out = self.make_pets(1)[0]
+        cart = get_cart(self.customer)
+        merge_into_cart(cart, [{'petId': self.pet.pk, 'quantity': 2}, {'petId': sold_out.pk, 'quantity': 1}])
+        Pet.objects.filter(pk=sold_out.pk).update(stock_quantity=0)
+
+        response = self.client.post('/cart/checkout/', {'delivery_method': 'pickup', 'recipient_name': 'x'})
+        self.assertRedirects(response, '/orders/', fetch_redirect_response=False)
+        self.assertEqual(Order.objects.get().quantity, 2)
+        self.assertEqual(list(cart.items.values_list('pet_id', flat=True)), [sold_out.pk])
+
+    def test_legacy_local_cart_is_merged(self):
+        legacy = json.dumps([{'petId': self.pet.pk, 'quantity': 5}, {'petId': 'x'}])
+        response = self.client.get('/cart/', {'cart': legacy})
+        self.assertRedirects(response, '/cart/', fetch_redirect_response=False)
+        # จำนวนเกินสต็อกถูกปรับลงเหลือเท่าที่มี
+        self.assertEqual(get_cart(self.customer).items.get().quantity, 3)
+
+    def test_anonymous_gets_401(self):
+        self.client.logout()
+        self.assertEqual(self.client.get('/api/cart/').status_code, 401)
+
+
+class ConcurrentCartTests(TransactionTestCase):
+    def add_concurrently(self, cart, pet, adds, threads=2):
+        barrier = threading.Barrier(threads)
+        errors = []
+
+        def add():
+            # ฐานข้อมูลทดสอบ (SQLite in-memory แบบ shared cache) ไม่รอ lock แต่ตอบ "table is locked" ทันที
+            # คำสั่งที่ล้มเหลวไม่มีผล จึงลองใหม่ได้ - ที่ตรวจคือไม่มี increment หายและไม่มี IntegrityError
+            while True:
+                try:
+                    return add_to_cart(cart, pet.pk)
+                except OperationalError:
+                    time.sleep(0.001)
+
+        def worker():
+            try:
+                barrier.wait()
+                for _ in range(adds):
+                    try:
+                        add()
+                    except CartError as e:
+                        errors.append(e)
+            except Exception as e:  # noqa: BLE001 - รายงานใน assert ด้านล่าง
+                errors.append(e)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return errors
+
+    def test_concurrent_adds_keep_every_increment(self):
+        pet = create_pet(stock_quantity=100)
+        cart = get_cart(CustomUser.objects.create_user(username='buyer', password='x'))
+        # ทั้งสอง thread เริ่มจากยังไม่มีรายการ (ชน INSERT) แล้วเพิ่มซ้ำแถวเดียวกัน
+        self.assertEqual(self.add_concurrently(cart, pet, adds=20), [])
+        self.assertEqual(CartItem.objects.get(cart=cart, pet=pet).quantity, 40)
+
+    def test_concurrent_adds_never_exceed_stock(self):
+        pet = create_pet(stock_quantity=5)
+        cart = get_cart(CustomUser.objects.create_user(username='buyer', password='x'))
+        errors = self.add_concurrently(cart, pet, adds=5)
+        self.assertEqual(len(errors), 5)
+        self.assertTrue(all(isinstance(e, CartError) for e in errors))
+        self.assertEqual(CartItem.objects.get(cart=cart, pet=pet).quantity, 5)
+
+
+class LeanOrderSerializerTests(TestCase):
+    def test_row_serializer_matches_model_serializer(self):
+        pet = create_pet(stock_quantity=5)
+        customer = CustomUser.objects.create_user(
+            username='customer', email='customer@example.com', password='password', phone='0800000000'
+        )
+        order = Order.objects.create(
+            user=customer, pet=pet, quantity=2, total_price=0, delivery_method='pickup',
+            pickup_date='2030-01-02', recipient_name='x'
+        )
+        request = RequestFactory().get('/api/orders/orders/')
+        row = OrderListRowSerializer.project(Order.objects.filter(pk=order.pk)).get()
+        lean = OrderListRowSerializer(row, context={'request': request}).data
+        full = OrderSerializer(Order.objects.get(pk=order.pk), context={'request': request}).data
+
+        pet_details = lean.pop('pet_details')
+        self.assertEqual({key: pet_details[key] for key in full['pet_details']}, dict(full.pop('pet_details')))
+        self.assertEqual(pet_details['stock_status'], 'in_stock')
+        self.assertEqual(lean, {key: (dict(value) if key == 'user_details' else value) for key, value in full.items()})
+
+    def test_order_list_uses_single_query(self):
+        pet = create_pet(stock_quantity=50)
+        seller = pet.created_by
+        for _ in range(5):
+            Order.objects.create(user=seller, pet=pet, quantity=1, total_price=0)
+        token = RefreshToken.for_user(seller).access_token
+        # auth (ผู้ใช้) + รายการคำสั่งซื้อ
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/orders/orders/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(len(response.data['results']), 5)
+
+
+class DatabaseConfigTests(SimpleTestCase):
+    default = 'sqlite:////tmp/petstore.sqlite3'
+
+    def test_sqlite_default(self):
+        config = database_config({}, self.default)
+        self.assertEqual(config['ENGINE'], 'django.db.backends.sqlite3')
+        self.assertEqual(config['NAME'], '/tmp/petstore.sqlite3')
+        self.assertEqual(config['CONN_MAX_AGE'], 0)
+
+    def test_postgres_url_uses_persistent_connections(self):
+        config = database_config({'DATABASE_URL': 'postgres://shop:secret@db:5432/petstore'}, self.default)
+        self.assertEqual(config['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual((config['NAME'], config['HOST'], config['PORT']), ('petstore', 'db', 5432))
+        self.assertEqual(config['CONN_MAX_AGE'], 60)
+        self.assertTrue(config['CONN_HEALTH_CHECKS'])
+
+        config = database_config({
+            'DATABASE_URL': 'postgres://shop:secret@db:5432/petstore', 'DB_CONN_MAX_AGE': '0',
+            'DB_CONN_HEALTH_CHECKS': '0', 'DB_SSL_REQUIRE': '1',
+        }, self.default)
+        self.assertEqual(config['CONN_MAX_AGE'], 0)
+        self.assertFalse(config['CONN_HEALTH_CHECKS'])
+        self.assertEqual(config['OPTIONS']['sslmode'], 'require')
+
+    def test_pool_engine(self):
+        config = database_config({
+            'DATABASE_URL': 'postgres://shop:secret@db:5432/petstore', 'DB_POOL': '1', 'DB_POOL_MAX_SIZE': '4',
+        }, self.default)
+        self.assertEqual(config['ENGINE'], POOL_ENGINE)
+        self.assertEqual(config['CONN_MAX_AGE'], 0)
+        self.assertEqual(config['OPTIONS']['pool'], {'max_size': 4, 'timeout': 30.0})
+        # OPTIONS['pool'] เป็นของ backend ไม่ส่งต่อให้ psycopg2.connect()
+        params = ConnectionHandler({'default': config})['default'].get_connection_params()
+        self.assertNotIn('pool', params)
+        self.assertEqual(params['dbname'], 'petstore')
+
+        with self.assertRaises(ValueError):
+            database_config({'DB_POOL': '1'}, self.default)
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def make_pool(self, **kwargs):
+        pool = ConnectionPool(lambda: sqlite3.connect(':memory:', check_same_thread=False), **kwargs)
+        self.addCleanup(pool.close)
+        return pool
+
+    def test_reuses_released_connections(self):
+        pool = self.make_pool(max_size=2)
+        first = pool.acquire()
+        pool.release(first)
+        self.assertIs(pool.acquire(), first)
+        self.assertEqual(pool.stats, {'opened': 1, 'reused': 1})
+
+    def test_waits_for_a_free_slot_then_times_out(self):
+        pool = self.make_pool(max_size=1, timeout=0.05)
+        held = pool.acquire()
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+        threading.Timer(0.05, pool.release, [held]).start()
+        pool.timeout = 5
+        self.assertIs(pool.acquire(), held)
+
+    def test_discards_broken_connections(self):
+        healthy = []
+        pool = self.make_pool(max_size=2, check=lambda conn: conn in healthy, reset=lambda conn: True)
+        first = pool.acquire()
+        pool.release(first)
+        second = pool.acquire()
+        self.assertIsNot(second, first)
+        self.assertEqual(pool.stats['discarded'], 1)
+
+        pool.release(second, discard=True)
+        self.assertEqual(pool.stats['discarded'], 2)
+        # slot ถูกคืนแม้ connection ถูกทิ้ง
+        pool.acquire()
+        pool.acquire()
+
+
+class SqliteTuningTests(TransactionTestCase):
+    def open_connection(self, path):
+        handler = ConnectionHandler({'default': database_config({}, f'sqlite:///{path}')})
+        connection = handler['default']
+        connection.ensure_connection()
+        self.addCleanup(connection.close)
+        return connection
+
+    def pragma(self, connection, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied_to_new_connections(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        connection = self.open_connection(os.path.join(directory, 'tuned.sqlite3'))
+        self.assertEqual(self.pragma(connection, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(connection, 'synchronous'), 1)  # NORMAL
+        self.assertEqual(self.pragma(connection, 'busy_timeout'), 5000)
+
+        with override_settings(SQLITE_PRAGMAS={}):
+            connection = self.open_connection(os.path.join(directory, 'default.sqlite3'))
+        self.assertEqual(self.pragma(connection, 'journal_mode'), 'delete')
+
+    def begin_statements(self, block):
+        with CaptureQueriesContext(connection) as queries:
+            block()
+        return [query['sql'] for query in queries if query['sql'].startswith('BEGIN')]
+
+    def test_write_atomic_begins_immediate(self):
+        names = iter(['Fish', 'Birds', 'Reptiles'])
+
+        def write():
+            with write_atomic():
+                Category.objects.create(name=next(names))
+        self.assertEqual(self.begin_statements(write), ['BEGIN IMMEDIATE'])
+
+        def nested():
+            with transaction.atomic():
+                write()
+        # อยู่ใน transaction อยู่แล้ว เป็นเพียง savepoint
+        self.assertEqual(self.begin_statements(nested), ['BEGIN'])
+        with override_settings(SQLITE_IMMEDIATE_WRITES=False):
+            self.assertEqual(self.begin_statements(write), ['BEGIN'])
+
+    def test_checkout_reserves_write_lock(self):
+        pet = create_pet(stock_quantity=5)
+        customer = CustomUser.objects.create_user(username='buyer', password='x', role='customer')
+        checkout = lambda: checkout_cart(customer, [{'petId': pet.pk, 'quantity': 1}])
+        self.assertEqual(self.begin_statements(checkout), ['BEGIN IMMEDIATE'])
+
+
+class BenchSqliteWritesTests(SimpleTestCase):
+    def test_compares_profiles_across_processes(self):
+        out = StringIO()
+        call_command('bench_sqlite_writes', processes=2, iterations=3, pets=5, stdout=out)
+        results = json.loads(out.getvalue())['results']
+        for profile in ('default', 'tuned'):
+            result = results[profile]
+            self.assertEqual(result['completed'] + result['locked_errors'] + result['other_errors'], 6)
+            self.assertEqual(result['orders_in_db'], result['orders_created'])
+        self.assertEqual(results['tuned']['journal_mode'], 'wal')
+        self.assertEqual(results['tuned']['locked_errors'], 0)
+        self.assertIn('improvement', results)
+
+
+class BenchConnectionsTests(TransactionTestCase):
+    def test_reports_each_mode(self):
+        out = StringIO()
+        call_command('bench_connections', use_current_db=True, threads=2, requests=3, pets=5, stdout=out)
+        report = json.loads(out.getvalue())
+        for mode in ('connect', 'persistent'):
+            self.assertEqual(report['results'][mode]['requests'], 6)
+            self.assertGreaterEqual(report['results'][mode]['connections_opened'], 2)
+        self.assertIn('skipped', report['results']['pooled'])
+
+
+class GunicornConfigTests(SimpleTestCase):
+    def load(self, **environ):
+        with mock.patch.dict(os.environ, environ, clear=True):
+            config = runpy.run_path(str(settings.BASE_DIR / 'gunicorn.conf.py'))
+            return config, dict(os.environ)
+
+    def test_profiles(self):
+        config, _ = self.load(GUNICORN_PROFILE='sync', WEB_CONCURRENCY='3')
+        self.assertEqual((config['worker_class'], config['workers'], config['threads']), ('sync', 3, 1))
+        self.assertEqual(config['wsgi_app'], 'petstore_project.wsgi:application')
+
+        config, _ = self.load(GUNICORN_PROFILE='gthread', GUNICORN_THREADS='8')
+        self.assertEqual((config['worker_class'], config['threads']), ('gthread', 8))
+
+        config, environ = self.load(GUNICORN_PROFILE='asgi')
+        self.assertEqual(config['worker_class'], 'uvicorn.workers.UvicornWorker')
+        self.assertEqual(config['wsgi_app'], 'petstore_project.asgi:application')
+        self.assertEqual(environ['DB_CONN_MAX_AGE'], '0')
+        self.assertEqual(environ['ASYNC_CATALOG_VIEWS'], '1')
+
+    def test_preload_and_recycling_defaults(self):
+        config, _ = self.load()
+        self.assertEqual(config['worker_class'], 'gthread')
+        self.assertTrue(config['preload_app'])
+        self.assertEqual((config['max_requests'], config['max_requests_jitter']), (1000, 100))
+        self.assertEqual(config['bind'], '0.0.0.0:8000')
+
+    def test_unknown_profile(self):
+        with self.assertRaises(RuntimeError):
+            self.load(GUNICORN_PROFILE='eventlet')
+
+    def test_warns_on_process_local_catalog_cache(self):
+        server = mock.Mock()
+        config, _ = self.load(WEB_CONCURRENCY='4')
+        config['on_starting'](server)
+        self.assertIn('CATALOG_CACHE_BACKEND=locmem', server.log.warning.call_args[0][0])
+
+        for environ in ({'WEB_CONCURRENCY': '4', 'CATALOG_CACHE_BACKEND': 'file'}, {'WEB_CONCURRENCY': '1'}):
+            server = mock.Mock()
+            config, _ = self.load(**environ)
+            config['on_starting'](server)
+            server.log.warning.assert_not_called()
+
+
+class BenchServingTests(SimpleTestCase):
+    def test_serves_catalog_under_wsgi_and_asgi(self):
+        out = StringIO()
+        call_command(
+            'bench_serving', profiles=['sync', 'asgi_async'], workers=1, concurrency=2, duration=0.5, warmup=0,
+            pets=5, stdout=out
+        )
+        results = json.loads(out.getvalue())['results']
+        for profile in ('sync', 'asgi_async'):
+            self.assertGreater(results[profile]['requests'], 0)
+            self.assertEqual(results[profile]['errors'], 0, results[profile]['first_error'])
+        self.assertEqual(results['sync']['speedup_vs_sync'], 1.0)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], ORDER_STATS_CACHE_TIMEOUT=0)
+class ReplicaRoutingTests(TransactionTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        replica = database_config({}, f'sqlite:///{os.path.join(directory, "replica.sqlite3")}')
+        connections.settings['replica'] = ConnectionHandler({'default': replica}).settings['default']
+        self.addCleanup(self.remove_replica)
+        catalog_cache.get_cache().clear()
+
+        self.stale = create_pet(name='Replicated')
+        call_command('sync_replica', stdout=StringIO())
+        # เขียนหลัง sync - replica ยังไม่เห็น
+        self.fresh = create_pet(
+            name='Fresh', username='seller2', email='seller2@example.com', category_name='Cats'
+        )
+        self.customer = CustomUser.objects.create_user(username='buyer', password='x', role='customer')
+
+    @staticmethod
+    def remove_replica():
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+
+    def api_pet_names(self, client, **headers):
+        response = client.get('/api/pets/pets/', **headers)
+        return {row['name'] for row in response.json()['results']}
+
+    def jwt(self, user):
+        return {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(user).access_token}'}
+
+    def test_catalog_reads_come_from_replica(self):
+        self.assertEqual(self.api_pet_names(self.client), {'Replicated'})
+        response = self.client.get('/pets/')
+        self.assertContains(response, 'Replicated')
+        self.assertNotContains(response, 'Fresh')
+        self.assertEqual(self.client.get(f'/api/pets/pets/{self.fresh.pk}/check_stock/').status_code, 404)
+        # หน้าอื่นยังอ่านจากฐานข้อมูลหลัก
+        self.assertEqual(self.client.get(f'/api/pets/pets/{self.fresh.pk}/').status_code, 200)
+
+    def test_transactions_and_plain_code_read_primary(self):
+        self.assertTrue(Pet.objects.filter(pk=self.fresh.pk).exists())
+        with use_replica():
+            self.assertFalse(Pet.objects.filter(pk=self.fresh.pk).exists())
+            with transaction.atomic():
+                self.assertTrue(Pet.objects.filter(pk=self.fresh.pk).exists())
+        self.assertFalse(ReplicaRouter().allow_migrate('replica', 'pets'))
+
+    def test_order_pins_user_to_primary(self):
+        headers = self.jwt(self.customer)
+        response = self.client.post(
+            '/api/orders/orders/', {
+                'pet': self.fresh.pk, 'quantity': 1, 'delivery_method': 'pickup',
+                'pickup_date': (timezone.localdate() + timedelta(days=1)).isoformat(), 'recipient_name': 'Buyer',
+            }, **headers
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        # pin ต่อผู้ใช้อยู่ใน cache ที่ใช้ร่วมกันทุก worker ไม่ใช่ cache ในหน่วยความจำของ process (default)
+        cache.clear()
+        self.assertTrue(caches[settings.REPLICA_PIN_CACHE].get(f'replica_pin:{self.customer.pk}'))
+
+        # browser (cookie) และ API client ที่ไม่เก็บ cookie (pin ต่อผู้ใช้) เห็นสิ่งที่เพิ่งเขียน
+        self.assertEqual(self.api_pet_names(self.client), {'Replicated', 'Fresh'})
+        self.assertEqual(self.api_pet_names(Client(), **headers), {'Replicated', 'Fresh'})
+        # ผู้ใช้อื่นยังอ่านจาก replica
+        self.assertEqual(self.api_pet_names(Client()), {'Replicated'})
+
+    def test_reporting_reads_replica(self):
+        seller = self.fresh.created_by
+        Order.objects.create(user=self.customer, pet=self.fresh, quantity=1)
+        stats = lambda: Client().get('/api/orders/orders/stats/', **self.jwt(seller)).json()['total_orders']
+        self.assertEqual(stats(), 0)
+        call_command('sync_replica', stdout=StringIO())
+        self.assertEqual(stats(), 1)
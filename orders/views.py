@@ -1,18 +1,65 @@
-from rest_framework import viewsets, status
+from rest_framework import viewsets, status, serializers
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import NotFound, PermissionDenied
+from rest_framework.request import Request
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.utils.dateparse import parse_date
+from django.core.exceptions import ValidationError as DjangoValidationError
 from .models import Order
-from .serializers import OrderSerializer
+from pets.models import StockMovement
+from .serializers import OrderSerializer, OrderListRowSerializer
+from .services import get_order_customers, get_order_stats
 from users.permissions import IsSellerOrAdminUser
+from petstore_project.pagination import KeysetPagination
+from petstore_project.replicas import replica_reads
+
+# จำนวนคำสั่งซื้อต่อหน้าใน Seller Dashboard
+DASHBOARD_PAGE_SIZE = 50
+
+def visible_orders(user):
+    """คำสั่งซื้อที่ผู้ใช้เห็น - ผู้ขาย/admin เห็นทั้งหมด ลูกค้าเห็นเฉพาะของตัวเอง"""
+    if user.is_admin() or user.is_seller():
+        return Order.objects.all().select_related('user', 'pet')
+    return Order.objects.filter(user=user).select_related('pet')
+
+def dashboard_orders(filters):
+    """คำสั่งซื้อใน Seller Dashboard ตาม filter (ยังไม่แบ่งหน้า)"""
+    # join ข้อมูลผู้ขาย/หมวดหมู่มาใน query เดียว (ไม่ต้อง query ต่อแถวใน template)
+    orders = Order.objects.select_related(
+        'user', 'pet', 'pet__category', 'pet__created_by'
+    )
+    
+    if filters.get('status') in dict(Order.STATUS_CHOICES):
+        orders = orders.filter(status=filters['status'])
+    if filters.get('delivery_method') in dict(Order.DELIVERY_METHOD_CHOICES):
+        orders = orders.filter(delivery_method=filters['delivery_method'])
+    if filters.get('customer'):
+        orders = orders.filter(user__username=filters['customer'])
+    if filters.get('search'):
+        orders = orders.filter(pet__name__icontains=filters['search'])
+    date_from = _parse_filter_date(filters.get('date_from', ''))
+    date_to = _parse_filter_date(filters.get('date_to', ''))
+    if date_from:
+        orders = orders.filter(order_date__date__gte=date_from)
+    if date_to:
+        orders = orders.filter(order_date__date__lte=date_to)
+    return orders
 
 class OrderViewSet(viewsets.ModelViewSet):
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
+    keyset_ordering = ('-order_date', 'id')
+    # actions ที่อ่านแบบ .values() และใช้ serializer แบบเบา
+    row_actions = ('list', 'user_orders', 'seller_orders')
+    
+    def get_serializer_class(self):
+        if self.action in self.row_actions:
+            return OrderListRowSerializer
+        return OrderSerializer
     
     def get_queryset(self):
         user = self.request.user
@@ -20,10 +67,10 @@ class OrderViewSet(viewsets.ModelViewSet):
         if not user.is_authenticated:
             return Order.objects.none()
             
-        if user.is_admin() or user.is_seller():
-            return Order.objects.all().select_related('user', 'pet')
-        else:
-            return Order.objects.filter(user=user).select_related('pet')
+        queryset = visible_orders(user)
+        if self.action in self.row_actions:
+            return OrderListRowSerializer.project(queryset)
+        return queryset
     
     def perform_create(self, serializer):
         """Auto assign user และ validate ข้อมูล + ตรวจสอบสต็อก"""
@@ -48,12 +95,6 @@ class OrderViewSet(viewsets.ModelViewSet):
                     "error": f"สต็อกไม่พอ! มีเพียง {pet.stock_quantity} ตัว"
                 })
             
-            # ลดสต็อก
-            if not pet.reduce_stock(quantity):
-                raise serializers.ValidationError({
-                    "error": "ไม่สามารถหักสต็อกได้"
-                })
-            
             # ตรวจสอบข้อมูลการจัดส่ง
             delivery_method = serializer.validated_data.get('delivery_method', 'pickup')
             recipient_name = serializer.validated_data.get('recipient_name', '')
@@ -62,7 +103,13 @@ class OrderViewSet(viewsets.ModelViewSet):
                 recipient_name = self.request.user.get_full_name() or self.request.user.username
                 serializer.validated_data['recipient_name'] = recipient_name
             
-            serializer.save(user=self.request.user)
+            # Order.save หักสต็อกแบบ atomic - ล้มเหลวถ้ามีคนซื้อตัดหน้า
+            try:
+                serializer.save(user=self.request.user)
+            except DjangoValidationError:
+                raise serializers.ValidationError({
+                    "error": "ไม่สามารถหักสต็อกได้"
+                })
         else:
             raise PermissionDenied("You must be logged in to create an order.")
     
@@ -73,12 +120,13 @@ class OrderViewSet(viewsets.ModelViewSet):
             raise PermissionDenied("You must be logged in to view orders.")
             
         if (request.user.is_admin() or request.user.is_seller()) and 'user_id' in request.GET:
-            orders = Order.objects.filter(user_id=request.GET['user_id']).select_related('pet')
+            orders = OrderListRowSerializer.project(Order.objects.filter(user_id=request.GET['user_id']))
         else:
             orders = self.get_queryset()
         
-        serializer = self.get_serializer(orders, many=True)
-        return Response(serializer.data)
+        page = self.paginate_queryset(orders)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
     
     @action(detail=True, methods=['post'])
     def cancel(self, request, pk=None):
@@ -90,7 +138,7 @@ class OrderViewSet(viewsets.ModelViewSet):
         
         if order.status == 'pending':
             # คืนสต็อกเมื่อยกเลิกคำสั่งซื้อ
-            order.pet.increase_stock(order.quantity)
+            order.pet.increase_stock(order.quantity, kind=StockMovement.CANCEL, order=order, user=request.user)
             
             order.status = 'cancelled'
             order.save()
@@ -118,16 +166,16 @@ class OrderViewSet(viewsets.ModelViewSet):
         
         # คืนสต็อกถ้าเปลี่ยนจาก pending เป็น cancelled
         if old_status == 'pending' and new_status == 'cancelled':
-            order.pet.increase_stock(order.quantity)
+            order.pet.increase_stock(order.quantity, kind=StockMovement.CANCEL, order=order, user=request.user)
         
         # หักสต็อกถ้าเปลี่ยนจาก cancelled เป็น pending (กรณีย้อนกลับ)
         if old_status == 'cancelled' and new_status == 'pending':
-            if order.pet.stock_quantity < order.quantity:
+            if not order.pet.reduce_stock(order.quantity, kind=StockMovement.ORDER_CHANGE, order=order,
+                                          user=request.user):
                 return Response(
                     {"error": f"สต็อกไม่พอ! มีเพียง {order.pet.stock_quantity} ตัว"}, 
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            order.pet.reduce_stock(order.quantity)
         
         order.status = new_status
         order.save()
@@ -141,63 +189,95 @@ class OrderViewSet(viewsets.ModelViewSet):
             raise PermissionDenied("You must be logged in to view orders.")
         
         if request.user.is_seller() or request.user.is_admin():
-            orders = Order.objects.all().select_related('user', 'pet')
-            serializer = self.get_serializer(orders, many=True)
-            return Response(serializer.data)
+            orders = OrderListRowSerializer.project(visible_orders(request.user))
+            page = self.paginate_queryset(orders)
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
         else:
             raise PermissionDenied("Only sellers can access this endpoint.")
     
     @action(detail=False, methods=['get'])
+    @replica_reads
     def stats(self, request):
         """สถิติคำสั่งซื้อ"""
         if not request.user.is_authenticated:
             raise PermissionDenied("You must be logged in to view stats.")
         
+        # ผู้ขาย/admin เห็นสถิติทั้งระบบ (หรือเฉพาะสินค้าของตัวเองด้วย ?scope=seller)
         if request.user.is_admin() or request.user.is_seller():
-            total_orders = Order.objects.count()
-            pending_orders = Order.objects.filter(status='pending').count()
-            completed_orders = Order.objects.filter(status='completed').count()
-            cancelled_orders = Order.objects.filter(status='cancelled').count()
+            if request.GET.get('scope') == 'seller':
+                stats = get_order_stats(seller=request.user)
+            else:
+                stats = get_order_stats()
         else:
-            total_orders = Order.objects.filter(user=request.user).count()
-            pending_orders = Order.objects.filter(user=request.user, status='pending').count()
-            completed_orders = Order.objects.filter(user=request.user, status='completed').count()
-            cancelled_orders = Order.objects.filter(user=request.user, status='cancelled').count()
+            stats = get_order_stats(user=request.user)
         
-        return Response({
-            'total_orders': total_orders,
-            'pending_orders': pending_orders,
-            'completed_orders': completed_orders,
-            'cancelled_orders': cancelled_orders,
-        })
+        return Response(stats)
 
 
 # เพิ่มฟังก์ชันสำหรับ HTML views
+def _parse_filter_date(value):
+    """แปลงวันที่จาก query string (YYYY-MM-DD) คืนค่า None ถ้าไม่ถูกต้อง"""
+    try:
+        return parse_date(value) if value else None
+    except ValueError:
+        return None
+
 @login_required
+@replica_reads
 def seller_dashboard(request):
     """Dashboard สำหรับผู้ขาย - แสดงคำสั่งซื้อทั้งหมด"""
     if not request.user.is_seller():
         messages.error(request, "คุณไม่มีสิทธิ์เข้าถึงหน้านี้")
         return redirect('home')
     
-    all_orders = Order.objects.all().select_related('user', 'pet').order_by('-order_date')
+    filters = {
+        'status': request.GET.get('status', ''),
+        'delivery_method': request.GET.get('delivery_method', ''),
+        'customer': request.GET.get('customer', ''),
+        'search': request.GET.get('search', ''),
+        'date_from': request.GET.get('date_from', ''),
+        'date_to': request.GET.get('date_to', ''),
+    }
+    
+    orders = dashboard_orders(filters)
+    
+    # keyset pagination ลำดับเดียวกับ API (OrderViewSet.keyset_ordering, index order_date_idx)
+    # หน้าลึกแค่ไหนก็เป็น WHERE order_date < ... LIMIT แทน OFFSET และไม่ต้อง COUNT ทั้งตาราง
+    paginator = KeysetPagination()
+    paginator.page_size = DASHBOARD_PAGE_SIZE
+    try:
+        page = paginator.paginate_queryset(orders, Request(request), view=OrderViewSet)
+    except NotFound:
+        # cursor เสีย/หมดอายุ - กลับไปหน้าแรกโดยคง filter เดิม
+        query_params = request.GET.copy()
+        query_params.pop(paginator.cursor_query_param, None)
+        return redirect(f'{request.path}?{query_params.urlencode()}')
+    
+    # รายชื่อลูกค้าสำหรับ filter - grouped aggregate ที่ cache ร่วม version กับสถิติ
+    customers = get_order_customers()
     
-    # สถิติสำหรับผู้ขาย (เห็นทั้งหมด)
-    total_orders = Order.objects.count()
-    pending_orders = Order.objects.filter(status='pending').count()
-    completed_orders = Order.objects.filter(status='completed').count()
-    cancelled_orders = Order.objects.filter(status='cancelled').count()
+    # สถิติสำหรับผู้ขาย (เห็นทั้งหมด) - aggregate query เดียว + cache
+    stats = get_order_stats()
     
     # ส่ง STATUS_CHOICES ไปยัง template
     status_choices = Order.STATUS_CHOICES
     
     return render(request, 'orders/seller_dashboard.html', {
-        'orders': all_orders,
-        'total_orders': total_orders,
-        'pending_orders': pending_orders,
-        'completed_orders': completed_orders,
-        'cancelled_orders': cancelled_orders,
+        'orders': page,
+        'next_page_url': paginator.get_next_link(),
+        'previous_page_url': paginator.get_previous_link(),
+        # จำนวนทั้งหมดมีใน cache ของสถิติ ถ้ามี filter จะไม่นับ (COUNT ทั้งตารางต่อหน้า)
+        'total_count': None if any(filters.values()) else stats['total_orders'],
+        'customers': customers,
+        'filters': filters,
+        'total_orders': stats['total_orders'],
+        'pending_orders': stats['pending_orders'],
+        'completed_orders': stats['completed_orders'],
+        'cancelled_orders': stats['cancelled_orders'],
+        'stats': stats,
         'status_choices': status_choices,
+        'delivery_method_choices': Order.DELIVERY_METHOD_CHOICES,
     })
 
 @login_required
@@ -217,16 +297,16 @@ def update_order_status(request, order_id):
             # จัดการสต็อกเมื่อเปลี่ยนสถานะ
             if old_status == 'pending' and new_status == 'cancelled':
                 # คืนสต็อกเมื่อยกเลิก
-                order.pet.increase_stock(order.quantity)
+                order.pet.increase_stock(order.quantity, kind=StockMovement.CANCEL, order=order, user=request.user)
                 messages.info(request, f'คืนสต็อก {order.quantity} ตัวให้ {order.pet.name}')
             
             elif old_status == 'cancelled' and new_status == 'pending':
                 # หักสต็อกเมื่อย้อนกลับจากการยกเลิก
-                if order.pet.stock_quantity < order.quantity:
+                if not order.pet.reduce_stock(order.quantity, kind=StockMovement.ORDER_CHANGE, order=order,
+                                              user=request.user):
                     messages.error(request, 
                         f'สต็อกไม่พอ! {order.pet.name} มีเพียง {order.pet.stock_quantity} ตัว')
                     return redirect('seller_dashboard')
-                order.pet.reduce_stock(order.quantity)
                 messages.info(request, f'หักสต็อก {order.quantity} ตัวจาก {order.pet.name}')
             
             order.status = new_status
@@ -256,15 +336,16 @@ def update_order(request, order_id):
                 quantity_diff = new_quantity - old_quantity
                 
                 if quantity_diff > 0:  # ถ้าเพิ่มจำนวน
-                    if order.pet.stock_quantity < quantity_diff:
+                    if not order.pet.reduce_stock(quantity_diff, kind=StockMovement.ORDER_CHANGE, order=order,
+                                                  user=request.user):
                         messages.error(request, 
                             f'สต็อกไม่พอ! {order.pet.name} มีเพียง {order.pet.stock_quantity} ตัว')
                         return redirect('seller_dashboard')
-                    order.pet.reduce_stock(quantity_diff)
                     messages.info(request, f'หักสต็อกเพิ่ม {quantity_diff} ตัวจาก {order.pet.name}')
                 
                 elif quantity_diff < 0:  # ถ้าลดจำนวน
-                    order.pet.increase_stock(abs(quantity_diff))
+                    order.pet.increase_stock(abs(quantity_diff), kind=StockMovement.ORDER_CHANGE, order=order,
+                                            user=request.user)
                     messages.info(request, f'คืนสต็อก {abs(quantity_diff)} ตัวให้ {order.pet.name}')
             
             # อัพเดทข้อมูลอื่นๆ
@@ -307,14 +388,15 @@ def update_order_quantity(request, order_id):
                 quantity_diff = new_quantity - old_quantity
                 
                 if quantity_diff > 0:  # เพิ่มจำนวน
-                    if order.pet.stock_quantity < quantity_diff:
+                    if not order.pet.reduce_stock(quantity_diff, kind=StockMovement.ORDER_CHANGE, order=order,
+                                                  user=request.user):
                         messages.error(request, 
                             f'สต็อกไม่พอ! {order.pet.name} มีเพียง {order.pet.stock_quantity} ตัว')
                         return redirect('seller_dashboard')
-                    order.pet.reduce_stock(quantity_diff)
                 
                 elif quantity_diff < 0:  # ลดจำนวน
-                    order.pet.increase_stock(abs(quantity_diff))
+                    order.pet.increase_stock(abs(quantity_diff), kind=StockMovement.ORDER_CHANGE, order=order,
+                                            user=request.user)
             
             order.quantity = new_quantity
             order.save()
@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Category, Pet
+from .models import Category, Pet, StockMovement, StockNotification
+from .search import search_pet_ids
 
 class CategoryAdmin(admin.ModelAdmin):
     list_display = ('name', 'description', 'created_at')
@@ -38,11 +39,11 @@ class PetAdmin(admin.ModelAdmin):
     )
     
     def image_preview(self, obj):
-        """แสดงรูปภาพขนาดเล็กใน list view"""
+        """แสดงรูปภาพขนาดเล็กใน list view (รูปย่อ ถ้าสร้างแล้ว)"""
         if obj.image_display:
             return format_html(
                 '<img src="{}" style="width: 50px; height: 50px; object-fit: cover;" />',
-                obj.image_display
+                obj.image_display_variants['thumb']['jpeg']
             )
         return "ไม่มีรูปภาพ"
     image_preview.short_description = 'รูปภาพ'
@@ -58,10 +59,42 @@ class PetAdmin(admin.ModelAdmin):
         return "ไม่มีรูปภาพ"
     image_preview_large.short_description = 'Preview รูปภาพ'
     
+    def get_search_results(self, request, queryset, search_term):
+        """ใช้ search index แทน icontains (full table scan) บน name/description/category"""
+        if not search_term:
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(id__in=search_pet_ids(search_term)), False
+    
     def save_model(self, request, obj, form, change):
         if not obj.pk:  # ถ้าเป็นการสร้างใหม่
             obj.created_by = request.user
         super().save_model(request, obj, form, change)
 
+class StockMovementAdmin(admin.ModelAdmin):
+    """สมุดบัญชีสต็อกเป็น append-only จึงดูได้อย่างเดียว"""
+    list_display = ('id', 'pet', 'kind', 'quantity', 'order', 'created_by', 'created_at')
+    list_filter = ('kind', 'created_at')
+    search_fields = ('pet__name', 'note')
+    raw_id_fields = ('pet', 'order', 'created_by')
+    list_select_related = ('pet', 'order', 'created_by')
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+class StockNotificationAdmin(admin.ModelAdmin):
+    list_display = ('pet', 'recipient', 'level', 'stock_quantity', 'event_count', 'created_at', 'read_at')
+    list_filter = ('level', 'created_at')
+    search_fields = ('pet__name', 'recipient__username')
+    raw_id_fields = ('pet', 'recipient')
+    list_select_related = ('pet', 'recipient')
+
 admin.site.register(Category, CategoryAdmin)
-admin.site.register(Pet, PetAdmin)
\ No newline at end of file
+admin.site.register(Pet, PetAdmin)
+admin.site.register(StockMovement, StockMovementAdmin)
+admin.site.register(StockNotification, StockNotificationAdmin)
\ No newline at end of file
@@ -0,0 +1,110 @@
+"""
+endpoint อ่านอย่างเดียวของ catalog API แบบ async (check_stock, available_pets) สำหรับ ASGI
+
+เปิดด้วย ASYNC_CATALOG_VIEWS=1 (ค่าเริ่มต้นของ GUNICORN_PROFILE=asgi) แทน action เดียวกันของ PetViewSet
+ที่ URL เดิม DRF 3.14 ยังไม่รองรับ view async จึงเขียนเป็น view ของ Django ที่ตอบ JSON เหมือนกันทุกไบต์
+(ยืนยันตัวตนด้วย JWT, ETag จาก validator ชุดเดียวกัน, keyset pagination เดียวกัน)
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from petstore_project.pagination import KeysetPagination
+from petstore_project.replicas import replica_reads
+from .conditional import aget_validators, api_vary, not_modified, patch_validators
+from .models import Pet
+from .serializers import PetSerializer
+from .views import PetViewSet, in_stock_pets, visible_pets
+
+# basename ของ PetViewSet ใน pets/urls.py (ส่วนหนึ่งของ key ของ validator)
+BASENAME = 'pet'
+
+
+def _json_response(data, status=200):
+    return HttpResponse(JSONRenderer().render(data), status=status, content_type='application/json')
+
+
+def _authenticate(request):
+    result = JWTAuthentication().authenticate(request)
+    return result[0] if result else AnonymousUser()
+
+
+def api_view(view):
+    """หน้าที่ของ APIView ที่ endpoint เหล่านี้ใช้: GET/HEAD เท่านั้น, request.user จาก JWT และ error แบบ DRF"""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            response = _json_response({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+            response['Allow'] = 'GET, HEAD'
+            return response
+        try:
+            request.user = await sync_to_async(_authenticate)(request)
+        except exceptions.AuthenticationFailed as e:
+            detail = e.detail if isinstance(e.detail, (list, dict)) else {'detail': e.detail}
+            response = _json_response(detail, status=401)
+            response['WWW-Authenticate'] = JWTAuthentication().authenticate_header(request)
+            return response
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+@api_view
+@replica_reads
+async def check_stock(request, pk):
+    """ตรวจสอบจำนวนสต็อก (สำหรับลูกค้า) - เหมือน PetViewSet.check_stock"""
+    queryset = visible_pets(request.user).filter(pk=pk)
+    # key เดียวกับ ConditionalGetMixin จึงใช้ validator ชุดเดียวกับ view แบบ sync
+    validators = await aget_validators(
+        [f'pet.{pk}', 'categories'], (BASENAME, 'check_stock', str(queryset.query)), queryset,
+        vary=api_vary(request, JSONRenderer.format)
+    )
+    response = not_modified(request, validators)
+    if response is not None:
+        return response
+    try:
+        pet = await queryset.aget()
+    except Pet.DoesNotExist:
+        return _json_response({'detail': 'Not found.'}, status=404)
+
+    response = _json_response({
+        'pet_id': pet.id,
+        'pet_name': pet.name,
+        'stock_quantity': pet.stock_quantity,
+        'is_available': pet.is_available,
+        'is_out_of_stock': pet.is_out_of_stock,
+        'stock_status': pet.stock_status,
+        'stock_status_display': pet.stock_status_display,
+        'can_purchase': pet.is_available and pet.stock_quantity > 0
+    })
+    patch_validators(response, validators)
+    return response
+
+
+def _page(request, queryset):
+    # CursorPagination และ serializer ของ DRF เป็น sync (อ่านหน้าและ serialize ใน thread เดียว)
+    paginator = KeysetPagination()
+    page = paginator.paginate_queryset(queryset, Request(request), view=PetViewSet)
+    return paginator.get_paginated_response(PetSerializer(page, many=True, context={'request': request}).data).data
+
+
+@api_view
+async def available_pets(request):
+    """สัตว์เลี้ยงที่พร้อมขาย (มีสต็อก) - เหมือน PetViewSet.available_pets"""
+    queryset = in_stock_pets()
+    validators = await aget_validators(
+        ['pets'], (BASENAME, 'available_pets', str(queryset.query)), queryset,
+        vary=api_vary(request, JSONRenderer.format)
+    )
+    response = not_modified(request, validators)
+    if response is not None:
+        return response
+    data = await sync_to_async(_page)(request, queryset.select_related('category', 'created_by'))
+    response = _json_response(data)
+    patch_validators(response, validators)
+    return response
@@ -0,0 +1,162 @@
+"""
+Catalog read cache สำหรับหน้าแสดงสัตว์เลี้ยง (home, pet_list, pet_detail, categories)
+
+ทุก key ผูกกับ "namespace version" เช่น ``pets``, ``category.<id>``, ``pet.<id>``
+เมื่อข้อมูลเปลี่ยน (signal หรือการปรับสต็อก) จะเพิ่ม version ของ namespace ที่เกี่ยวข้อง
+ทำให้ key เก่าทั้งหมดใน namespace นั้นหมดอายุทันทีโดยไม่ต้องไล่ลบทีละ key
+"""
+import hashlib
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.template.loader import render_to_string
+from petstore_project import replicas
+
+CATALOG_CACHE_ALIAS = 'catalog'
+HITS_KEY = 'catalog:stats:hits'
+MISSES_KEY = 'catalog:stats:misses'
+
+
+def get_cache():
+    return caches[CATALOG_CACHE_ALIAS]
+
+
+def is_process_local():
+    """cache อยู่ในหน่วยความจำของ process นี้ (locmem) - process อื่นไม่เห็นการเพิ่ม version"""
+    return isinstance(get_cache(), LocMemCache)
+
+
+def _timeout():
+    return getattr(settings, 'CATALOG_CACHE_TIMEOUT', 300)
+
+
+def _version_key(namespace):
+    return f'catalog:ver:{namespace}'
+
+
+def _incr(key):
+    cache = get_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, None)
+
+
+def make_key(namespaces, *parts):
+    """สร้าง cache key จาก version ปัจจุบันของทุก namespace + ส่วนประกอบอื่นๆ"""
+    cache = get_cache()
+    version_keys = [_version_key(ns) for ns in namespaces]
+    versions = cache.get_many(version_keys)
+    for version_key in version_keys:
+        if version_key not in versions:
+            # ใช้เวลาเป็น version เริ่มต้น กัน key เก่าถูกใช้ซ้ำหลัง version ถูก evict
+            versions[version_key] = time.time_ns()
+            cache.add(version_key, versions[version_key], None)
+    version_part = '.'.join(str(versions[k]) for k in version_keys)
+    digest = hashlib.md5(repr(parts).encode('utf-8')).hexdigest()
+    return f'catalog:{version_part}:{digest}'
+
+
+def _lookup(namespaces, parts):
+    key = make_key(namespaces, *parts)
+    value = get_cache().get(key)
+    _incr(MISSES_KEY if value is None else HITS_KEY)
+    return key, value
+
+
+def _store(key, value):
+    get_cache().set(key, value, replicas.cache_timeout(_timeout()))
+
+
+def get_or_set(namespaces, parts, producer):
+    """คืนค่าจาก cache หรือเรียก producer() แล้วเก็บผลไว้ พร้อมนับ hit/miss"""
+    key, value = _lookup(namespaces, parts)
+    if value is None:
+        value = producer()
+        _store(key, value)
+    return value
+
+
+async def aget_or_set(namespaces, parts, producer):
+    """get_or_set สำหรับ view แบบ async - producer() คืน awaitable (เช่น query ด้วย async ORM)
+
+    backend ของ cache ใน Django 4.2 เป็น sync ทั้งหมด (เมธอด a* ก็แค่ห่อ sync_to_async ทีละคำสั่ง)
+    จึงอ่านและเขียน cache อย่างละหนึ่ง sync_to_async แทน
+    """
+    key, value = await sync_to_async(_lookup)(namespaces, parts)
+    if value is None:
+        value = await producer()
+        await sync_to_async(_store)(key, value)
+    return value
+
+
+def render_fragment(namespaces, parts, template_name, context, request=None):
+    """render template บางส่วนแล้ว cache HTML ที่ได้"""
+    return get_or_set(
+        namespaces,
+        (template_name,) + tuple(parts),
+        lambda: render_to_string(template_name, context, request=request)
+    )
+
+
+async def arender_fragment(namespaces, parts, template_name, context, request=None):
+    """render_fragment สำหรับ view แบบ async (render ใน thread เพราะ template อาจอ่าน relation แบบ lazy)"""
+    return await aget_or_set(
+        namespaces,
+        (template_name,) + tuple(parts),
+        lambda: sync_to_async(render_to_string)(template_name, context, request=request)
+    )
+
+
+def viewer_role(user):
+    """กลุ่มผู้ชม สำหรับแยก fragment ที่แสดงปุ่มต่างกันตามบทบาท"""
+    if not user.is_authenticated:
+        return 'anon'
+    if user.is_seller() or user.is_admin():
+        return 'staff'
+    return 'customer'
+
+
+def bump(*namespaces):
+    for namespace in namespaces:
+        _incr(_version_key(namespace))
+
+
+def invalidate_pet(pet_id, *category_ids):
+    """ล้าง cache ที่เกี่ยวกับสัตว์เลี้ยงตัวนี้ (หลัง commit)"""
+    namespaces = ['pets', f'pet.{pet_id}'] + [f'category.{cid}' for cid in category_ids if cid]
+    transaction.on_commit(lambda: bump(*namespaces))
+
+
+def invalidate_pets(pairs):
+    """ล้าง cache ของสัตว์เลี้ยงหลายตัว - pairs คือ [(pet_id, category_id), ...]"""
+    namespaces = {'pets'}
+    for pet_id, category_id in pairs:
+        namespaces.add(f'pet.{pet_id}')
+        namespaces.add(f'category.{category_id}')
+    transaction.on_commit(lambda: bump(*namespaces))
+
+
+def invalidate_category(category_id):
+    transaction.on_commit(lambda: bump('categories', 'pets', f'category.{category_id}'))
+
+
+def get_stats():
+    cache = get_cache()
+    values = cache.get_many([HITS_KEY, MISSES_KEY])
+    hits = values.get(HITS_KEY, 0)
+    misses = values.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 4) if total else None,
+    }
+
+
+def reset_stats():
+    get_cache().delete_many([HITS_KEY, MISSES_KEY])
@@ -0,0 +1,165 @@
+"""
+Conditional GET (ETag / Last-Modified) สำหรับ catalog ทั้ง API และหน้า HTML
+
+validator คำนวณจาก aggregate query เดียว (จำนวนแถว + max(updated_at)) โดยไม่ serialize/render
+และเก็บไว้ใน catalog cache ภายใต้ namespace เดียวกับข้อมูล จึงหมดอายุพร้อมกันเมื่อข้อมูลเปลี่ยน
+client ที่ polling ซ้ำโดยข้อมูลไม่เปลี่ยนจะได้ 304 ทันที (aggregate เดียวเมื่อ cache หมดอายุ)
+
+ทุกการเปลี่ยนแปลงสต็อก/ข้อมูลตั้ง updated_at ใหม่ ส่วนการลบหรือหลุดจากเงื่อนไขจะเปลี่ยนจำนวนแถว
+"""
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.contrib import messages
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from petstore_project.async_utils import ahas_messages, aload_user
+from . import cache as catalog_cache
+from .models import Category
+
+
+def pet_aggregates():
+    """สำหรับ queryset ของ Pet (รวมชื่อหมวดหมู่ที่แสดงคู่กัน)"""
+    return Count('pk'), Max('updated_at'), Max('category__updated_at')
+
+
+def catalog_aggregates(pet_filter=None):
+    """หมวดหมู่ทั้งหมด (ชื่อแสดงในทุกหน้า) + สัตว์เลี้ยงที่ผ่าน pet_filter บน queryset ของ Category"""
+    return (
+        Count('pk', distinct=True), Max('updated_at'),
+        Count('pet', filter=pet_filter), Max('pet__updated_at', filter=pet_filter),
+    )
+
+
+class Validators:
+    def __init__(self, values, vary=()):
+        digest = hashlib.md5(repr((values, tuple(vary))).encode('utf-8')).hexdigest()
+        # weak ETag: เนื้อหาเทียบเท่ากันแม้ byte ไม่ตรงกัน (เช่น csrf token ที่ถูก mask ใหม่ทุกครั้ง)
+        self.etag = f'W/"{digest}"'
+        timestamps = [value for value in values if hasattr(value, 'timestamp')]
+        self.last_modified = int(max(timestamps).timestamp()) if timestamps else None
+
+
+def get_validators(namespaces, parts, queryset, aggregates=pet_aggregates, vary=()):
+    """คำนวณ (หรือดึงจาก cache) validator ของ queryset
+
+    parts ระบุชุดข้อมูลใน cache ส่วน vary คือสิ่งที่ทำให้เนื้อหาต่างกันต่อผู้ชม (ไม่ถูก cache)
+    """
+    def load():
+        expressions = {f'v{i}': expression for i, expression in enumerate(aggregates())}
+        values = queryset.aggregate(**expressions)
+        return tuple(values[name] for name in expressions)
+
+    values = catalog_cache.get_or_set(namespaces, ('validators',) + tuple(parts), load)
+    return Validators(values, vary)
+
+
+async def aget_validators(namespaces, parts, queryset, aggregates=pet_aggregates, vary=()):
+    """get_validators สำหรับ view แบบ async (ใช้ cache ชุดเดียวกัน)"""
+    async def load():
+        expressions = {f'v{i}': expression for i, expression in enumerate(aggregates())}
+        values = await queryset.aaggregate(**expressions)
+        return tuple(values[name] for name in expressions)
+
+    values = await catalog_cache.aget_or_set(namespaces, ('validators',) + tuple(parts), load)
+    return Validators(values, vary)
+
+
+def api_vary(request, renderer_format):
+    """สิ่งที่ทำให้ response ของ API ต่างกันต่อผู้ชม"""
+    return request.get_full_path(), catalog_cache.viewer_role(request.user), renderer_format
+
+
+def not_modified(request, validators):
+    """คืน response 304 (หรือ 412) ถ้า client มีข้อมูลล่าสุดอยู่แล้ว ไม่เช่นนั้นคืน None"""
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    response = get_conditional_response(
+        request, etag=validators.etag, last_modified=validators.last_modified
+    )
+    if response is not None:
+        patch_validators(response, validators)
+    return response
+
+
+def patch_validators(response, validators):
+    if response.status_code not in (200, 304):
+        return
+    response.headers.setdefault('ETag', validators.etag)
+    if validators.last_modified is not None:
+        response.headers.setdefault('Last-Modified', http_date(validators.last_modified))
+    # ให้ browser เก็บไว้ได้แต่ต้องถามทุกครั้ง (ได้ 304 ถ้าไม่เปลี่ยน)
+    patch_cache_control(response, private=True, no_cache=True)
+
+
+def catalog_condition(get_scope=None):
+    """decorator ของหน้า HTML ใน catalog
+
+    get_scope(request, *args, **kwargs) คืน (namespaces, pet_filter) ของสัตว์เลี้ยงที่หน้านั้นแสดง
+    โดย namespaces ควรตรงกับ cache ของหน้านั้น (ค่าเริ่มต้นคือทั้ง catalog)
+    หน้าเหล่านี้แสดงชื่อผู้ใช้และ csrf token จึงแยก ETag ตามผู้ชม
+    """
+    def validator_args(view, request, args, kwargs):
+        namespaces, pet_filter = get_scope(request, *args, **kwargs) if get_scope else (['pets'], None)
+        user = request.user
+        return (
+            namespaces, (view.__name__, request.GET.get('category')) + tuple(sorted(kwargs.items())),
+            Category.objects.all(), lambda: catalog_aggregates(pet_filter),
+            (
+                request.get_full_path(), user.pk, user.get_username(), getattr(user, 'role', None),
+                user.is_staff, request.COOKIES.get(settings.CSRF_COOKIE_NAME),
+            )
+        )
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if request.method not in ('GET', 'HEAD') or await ahas_messages(request):
+                    return await view(request, *args, **kwargs)
+                await aload_user(request)
+                validators = await aget_validators(*validator_args(view, request, args, kwargs))
+                response = not_modified(request, validators)
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                    patch_validators(response, validators)
+                return response
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            # flash message ยังไม่ได้แสดง ต้อง render ใหม่เสมอ
+            if request.method not in ('GET', 'HEAD') or len(messages.get_messages(request)):
+                return view(request, *args, **kwargs)
+
+            validators = get_validators(*validator_args(view, request, args, kwargs))
+            response = not_modified(request, validators)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                patch_validators(response, validators)
+            return response
+        return wrapper
+    return decorator
+
+
+class ConditionalGetMixin:
+    """ใช้กับ ViewSet: action ที่อ่านข้อมูลเรียก ``self.not_modified(...)`` ก่อนโหลดข้อมูลจริง"""
+
+    def not_modified(self, namespaces, queryset, aggregates=pet_aggregates):
+        request = self.request
+        self._validators = get_validators(
+            namespaces, (self.basename, self.action, str(queryset.query)), queryset, aggregates,
+            vary=api_vary(request, getattr(request.accepted_renderer, 'format', None))
+        )
+        return not_modified(request, self._validators)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        validators = getattr(self, '_validators', None)
+        if validators is not None and request.method in ('GET', 'HEAD'):
+            patch_validators(response, validators)
+        return response
@@ -0,0 +1,44 @@
+from django.contrib.auth.models import AnonymousUser
+from petstore_project.hot_queries import first_page, hot_query
+from petstore_project.views import catalog_pets, newest_pets
+from users.models import CustomUser
+from .serializers import PetListRowSerializer
+from .views import PetViewSet, in_stock_pets, low_stock_pets, out_of_stock_pets, seller_pets, visible_pets
+
+# ค่า id ตัวอย่าง - query plan ไม่ขึ้นกับค่าจริง
+SAMPLE_ID = 1
+
+
+@hot_query('pets.home_featured')
+def home_featured():
+    return newest_pets()
+
+
+@hot_query('pets.pet_list_by_category')
+def pet_list_by_category():
+    return catalog_pets(SAMPLE_ID)
+
+
+@hot_query('pets.api_customer_list')
+def api_customer_list():
+    return first_page(PetListRowSerializer.project(visible_pets(AnonymousUser())), PetViewSet)
+
+
+@hot_query('pets.available_pets')
+def available_pets():
+    return first_page(in_stock_pets().select_related('category'), PetViewSet)
+
+
+@hot_query('pets.low_stock')
+def low_stock():
+    return first_page(low_stock_pets().select_related('category', 'created_by'), PetViewSet)
+
+
+@hot_query('pets.out_of_stock')
+def out_of_stock():
+    return first_page(out_of_stock_pets().select_related('category', 'created_by'), PetViewSet)
+
+
+@hot_query('pets.my_pets_stock')
+def my_pets_stock():
+    return seller_pets(CustomUser(pk=SAMPLE_ID, role='seller'))
@@ -0,0 +1,119 @@
+"""
+รูปย่อของ Pet.image (Pillow) สร้างใน worker หลังอัพโหลด
+
+แต่ละขนาดใน settings.PET_IMAGE_VARIANTS มีทั้ง WebP และ JPEG ตั้งชื่อตาม hash ของไฟล์ต้นฉบับ
+(``pets/variants/ab/abcdef..._card.webp``) ชื่อจึงไม่ซ้ำเมื่อรูปเปลี่ยน cache ที่ browser/CDN ได้ตลอด
+และรูปเดียวกันที่อัพโหลดซ้ำใช้ไฟล์เดิม path ของแต่ละขนาดเก็บใน ``Pet.image_variants``
+"""
+import hashlib
+import io
+import logging
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError
+from . import cache as catalog_cache
+
+logger = logging.getLogger('petstore.images')
+
+# นามสกุลไฟล์ตาม format ของ Pillow
+FORMATS = {'webp': ('WEBP', 'webp'), 'jpeg': ('JPEG', 'jpg')}
+
+
+def variant_urls(variants, fallback=None):
+    """{ขนาด: {'webp': url|None, 'jpeg': url, 'width': w, 'height': h}} ของทุกขนาดใน settings
+
+    ขนาดที่ยังไม่ถูกสร้าง (เช่นรอ worker หรือรูปจาก image_url) ใช้ fallback (รูปต้นฉบับ) แทน JPEG
+    """
+    variants = variants or {}
+    urls = {}
+    for name in settings.PET_IMAGE_VARIANTS:
+        variant = variants.get(name)
+        if variant:
+            urls[name] = {
+                'webp': default_storage.url(variant['webp']),
+                'jpeg': default_storage.url(variant['jpeg']),
+                'width': variant['width'],
+                'height': variant['height'],
+            }
+        else:
+            urls[name] = {'webp': None, 'jpeg': fallback, 'width': None, 'height': None}
+    return urls
+
+
+def _resize(image, size, crop):
+    if crop:
+        # การ์ด/รายการแสดงแบบสี่เหลี่ยมจัตุรัส (object-fit: cover) ตัดตรงกลางไว้เลย
+        if image.width < size[0] or image.height < size[1]:
+            side = min(image.width, image.height, *size)
+            size = (side, side)
+        return ImageOps.fit(image, size, Image.LANCZOS)
+    resized = image.copy()
+    resized.thumbnail(size, Image.LANCZOS)  # ไม่ขยายรูปที่เล็กกว่า
+    return resized
+
+
+def _encode(image, fmt):
+    pil_format, _ = FORMATS[fmt]
+    if image.mode not in ('RGB', 'RGBA') or (fmt == 'jpeg' and image.mode == 'RGBA'):
+        # JPEG ไม่มี alpha - วางบนพื้นขาว
+        rgba = image.convert('RGBA')
+        background = Image.new('RGB', rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        image = background if fmt == 'jpeg' else rgba
+    output = io.BytesIO()
+    options = {'quality': settings.PET_IMAGE_QUALITY}
+    if fmt == 'jpeg':
+        options.update(optimize=True, progressive=True)
+    image.save(output, pil_format, **options)
+    return output.getvalue()
+
+
+def build_variants(data, storage=default_storage):
+    """สร้างไฟล์รูปย่อทุกขนาดจาก bytes ของรูปต้นฉบับ คืนค่า dict สำหรับ Pet.image_variants
+
+    ไฟล์ที่มีอยู่แล้ว (hash เดียวกัน) ไม่ถูกเขียนซ้ำ
+    """
+    digest = hashlib.sha256(data).hexdigest()[:20]
+    with Image.open(io.BytesIO(data)) as original:
+        original = ImageOps.exif_transpose(original)
+        original.load()
+    variants = {}
+    for name, spec in settings.PET_IMAGE_VARIANTS.items():
+        resized = _resize(original, tuple(spec['size']), spec.get('crop', False))
+        variant = {'width': resized.width, 'height': resized.height}
+        for fmt, (_, extension) in FORMATS.items():
+            path = f'pets/variants/{digest[:2]}/{digest}_{name}.{extension}'
+            if not storage.exists(path):
+                path = storage.save(path, ContentFile(_encode(resized, fmt)))
+            variant[fmt] = path
+        variants[name] = variant
+    return variants
+
+
+def generate_pet_images(pet):
+    """สร้างรูปย่อของสัตว์เลี้ยงแล้วบันทึกลง Pet.image_variants คืนค่า dict ที่บันทึก (หรือ None ถ้าข้าม)
+
+    บันทึกเฉพาะเมื่อรูปในฐานข้อมูลยังเป็นไฟล์เดิม (ถ้ามีการอัพโหลดใหม่ระหว่างทำ งานของรูปใหม่จะมาแทน)
+    """
+    from .models import Pet
+
+    if not pet.image:
+        return None
+    try:
+        with pet.image.open('rb') as f:
+            data = f.read()
+        variants = build_variants(data)
+    except (FileNotFoundError, UnidentifiedImageError, Image.DecompressionBombError) as e:
+        # ไฟล์หายหรือไม่ใช่รูป - ลองใหม่ก็ไม่สำเร็จ ใช้รูปต้นฉบับต่อไป
+        logger.warning('cannot build image variants for pet %s: %s', pet.pk, e)
+        return None
+    updated = Pet.objects.filter(pk=pet.pk, image=pet.image.name).update(
+        image_variants=variants, updated_at=timezone.now()
+    )
+    if not updated:
+        return None
+    catalog_cache.invalidate_pet(pet.pk, pet.category_id)
+    return variants
@@ -0,0 +1,17 @@
+import json
+
+from django.core.management.base import BaseCommand
+from pets import cache as catalog_cache
+
+
+class Command(BaseCommand):
+    help = 'แสดงจำนวน hit/miss ของ catalog cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='ล้างตัวนับหลังแสดงผล')
+
+    def handle(self, *args, **options):
+        stats = catalog_cache.get_stats()
+        if options['reset']:
+            catalog_cache.reset_stats()
+        return json.dumps(stats)
@@ -0,0 +1,101 @@
+import re
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, router, transaction
+from django.db.models.expressions import Col
+from django.db.models.sql import Query
+from petstore_project.hot_queries import get_hot_queries
+
+# "SCAN pets_pet" = full table scan, "SCAN pets_pet USING [COVERING] INDEX ..." = อ่าน index ทั้งก้อนตามลำดับ
+# (ต่างจาก "SEARCH ... USING INDEX (col=?)" ที่อ่านเฉพาะช่วงที่ตรงเงื่อนไข)
+SQLITE_SCAN = re.compile(r'\bSCAN (?!CONSTANT)(\S+)(?: USING (COVERING )?INDEX (\S+))?')
+POSTGRES_FULL_SCAN = re.compile(r'Seq Scan on (\S+)')
+
+
+def _columns(node, table):
+    """คอลัมน์ของตาราง table ที่ถูกอ้างถึงใน WHERE (WhereNode / lookup / expression)"""
+    if isinstance(node, Col):
+        return {node.target.column} if node.alias == table else set()
+    columns = set()
+    for child in getattr(node, 'children', ()):
+        columns |= _columns(child, table)
+    for side in ('lhs', 'rhs'):
+        if hasattr(node, side):
+            columns |= _columns(getattr(node, side), table)
+    for source in getattr(node, 'get_source_expressions', lambda: ())():
+        if source is not None:
+            columns |= _columns(source, table)
+    return columns
+
+
+def _partial_index_columns(table, index_name):
+    """คอลัมน์ใน condition ของ partial index (set ว่างถ้าไม่ใช่ partial index)"""
+    for model in apps.get_models():
+        if model._meta.db_table != table:
+            continue
+        for index in model._meta.indexes:
+            if index.name == index_name and index.condition is not None:
+                return _columns(Query(model).build_where(index.condition), table)
+    return set()
+
+
+class Command(BaseCommand):
+    help = ('รัน EXPLAIN กับ hot query ทุกตัวที่ลงทะเบียนไว้ และล้มเหลวถ้ามี query ที่ต้อง full table scan '
+            'หรือไล่อ่าน index โดยไม่มีขอบเขต')
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help='ชื่อ query ที่ต้องการตรวจ (ค่าเริ่มต้น: ทั้งหมด)')
+
+    def full_scans(self, connection, queryset):
+        if connection.vendor == 'postgresql':
+            # ตารางเล็กๆ planner มักเลือก Seq Scan - ปิดไว้เพื่อตรวจว่ามี index ที่ใช้ได้จริง
+            with transaction.atomic(using=connection.alias):
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+                plan = queryset.explain()
+            return plan, POSTGRES_FULL_SCAN.findall(plan)
+        if connection.vendor == 'sqlite':
+            plan = queryset.explain()
+            scans = []
+            for line in plan.splitlines():
+                match = SQLITE_SCAN.search(line)
+                if match and not self.bounded_index_scan(queryset, *match.groups()):
+                    scans.append(match.group(1) + (f' ({match.group(3)})' if match.group(3) else ''))
+            return plan, scans
+        raise CommandError(f'ไม่รองรับฐานข้อมูล {connection.vendor}')
+
+    @staticmethod
+    def bounded_index_scan(queryset, table, covering, index_name):
+        """SCAN ตาม index ที่หยุดเองหลังได้ LIMIT แถว: ต้องมี LIMIT และทุกแถวที่อ่านต้องผ่าน WHERE
+        (covering index หรือทุกคอลัมน์ที่กรองอยู่ใน condition ของ partial index) ไม่งั้นเงื่อนไขที่เลือกได้น้อย
+        เช่น low_stock จะไล่อ่านทั้ง index ก่อนได้ครบ LIMIT"""
+        if index_name is None or queryset.query.high_mark is None:
+            return False
+        if covering:
+            return True
+        return _columns(queryset.query.where, table) <= _partial_index_columns(table, index_name)
+
+    def handle(self, *args, **options):
+        queries = get_hot_queries()
+        names = options['names'] or sorted(queries)
+        unknown = set(names) - set(queries)
+        if unknown:
+            raise CommandError(f"ไม่พบ hot query: {', '.join(sorted(unknown))}")
+
+        failures = []
+        for name in names:
+            queryset = queries[name]()
+            connection = connections[router.db_for_read(queryset.model)]
+            plan, scans = self.full_scans(connection, queryset)
+            if scans:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f"FULL SCAN  {name} ({', '.join(scans)})"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'OK         {name}'))
+            if scans or options['verbosity'] >= 2:
+                for line in plan.splitlines():
+                    self.stdout.write(f'    {line}')
+
+        if failures:
+            raise CommandError(f'{len(failures)} hot query ต้อง full scan: {", ".join(failures)}')
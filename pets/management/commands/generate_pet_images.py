@@ -0,0 +1,35 @@
+import json
+
+from django.core.management.base import BaseCommand
+from jobs.services import enqueue
+from pets import images
+from pets.models import Pet
+from pets.tasks import generate_pet_images
+
+
+class Command(BaseCommand):
+    help = ('สร้างรูปย่อ (WebP/JPEG ตาม settings.PET_IMAGE_VARIANTS) ของรูปสัตว์เลี้ยงที่มีอยู่แล้ว '
+            'ค่าเริ่มต้นใส่งานลงคิวให้ run_worker ทำ เฉพาะตัวที่ยังไม่มีรูปย่อ')
+
+    def add_arguments(self, parser):
+        parser.add_argument('pet_ids', nargs='*', type=int, help='เฉพาะสัตว์เลี้ยงที่ระบุ')
+        parser.add_argument('--force', action='store_true', help='สร้างใหม่แม้มีรูปย่ออยู่แล้ว (เช่นเปลี่ยนขนาดใน settings)')
+        parser.add_argument('--inline', action='store_true', help='ทำทันทีใน process นี้แทนการใส่คิว')
+
+    def handle(self, *args, **options):
+        pets = Pet.objects.exclude(image='').exclude(image__isnull=True).only('image', 'category_id').order_by('pk')
+        if options['pet_ids']:
+            pets = pets.filter(pk__in=options['pet_ids'])
+        if not options['force']:
+            pets = pets.filter(image_variants={})
+
+        report = {'queued': 0, 'generated': 0, 'skipped': 0}
+        for pet in pets.iterator(chunk_size=500):
+            if not options['inline']:
+                enqueue(generate_pet_images, [pet.pk], unique_key=f'pet_images:{pet.pk}')
+                report['queued'] += 1
+            elif images.generate_pet_images(pet) is not None:
+                report['generated'] += 1
+            else:
+                report['skipped'] += 1
+        return json.dumps(report)
@@ -0,0 +1,45 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from pets.services import StockError, bulk_adjust_stock, read_stock_csv
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = ('นำเข้าสต็อกจากไฟล์ CSV ของคลังสินค้า (header: pet_id,quantity[,op] - ไม่ระบุ op คือเพิ่มสต็อก) '
+            'ทีละชุดตาม --batch-size แต่ละชุดอยู่ใน transaction เดียว')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='ไฟล์ CSV')
+        parser.add_argument('--seller', help='username ของผู้ขาย (ปรับได้เฉพาะสัตว์เลี้ยงของผู้ขายคนนี้)')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size ต้องมีค่าอย่างน้อย 1')
+        user = None
+        if options['seller']:
+            user = CustomUser.objects.filter(username=options['seller'], role='seller').first()
+            if user is None:
+                raise CommandError(f'ไม่พบผู้ขาย {options["seller"]}')
+
+        try:
+            with open(options['path'], 'rb') as f:
+                items = read_stock_csv(f)
+        except (OSError, StockError, UnicodeDecodeError) as e:
+            raise CommandError(str(e))
+
+        size = options['batch_size']
+        report = {'rows': len(items), 'updated': 0, 'errors': []}
+        for offset in range(0, len(items), size):
+            try:
+                results = bulk_adjust_stock(user, items[offset:offset + size])
+            except StockError as e:
+                raise CommandError(f'แถว {offset + 1}-{offset + size}: {e}')
+            for result in results:
+                if result['success']:
+                    report['updated'] += 1
+                else:
+                    # +2 = header + นับจาก 1 ให้ตรงกับบรรทัดในไฟล์
+                    report['errors'].append({'line': offset + result['index'] + 2, 'error': result['error']})
+        return json.dumps(report, ensure_ascii=False)
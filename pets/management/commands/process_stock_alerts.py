@@ -0,0 +1,46 @@
+import json
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from pets.services import process_stock_alerts, prune_stock_alerts
+
+
+class Command(BaseCommand):
+    help = ('worker ประมวลผลคิวเหตุการณ์สต็อกต่ำ/หมดเป็นการแจ้งเตือนถึงผู้ขาย ทีละ batch '
+            '(รวมเหตุการณ์ของสัตว์เลี้ยงตัวเดียวกัน) ใช้ --loop เพื่อรันค้างไว้และ poll คิวเป็นระยะ')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--window', type=int,
+                            help='ช่วงเวลา (วินาที) ที่รวมเหตุการณ์เป็นการแจ้งเตือนเดียว '
+                                 '(ค่าเริ่มต้น: settings.STOCK_ALERT_COALESCE_SECONDS)')
+        parser.add_argument('--loop', action='store_true', help='รันต่อเนื่องจนกว่าจะถูกหยุด')
+        parser.add_argument('--interval', type=float, default=5, help='ระยะเวลารอ (วินาที) เมื่อคิวว่าง')
+        parser.add_argument('--prune-days', type=int,
+                            help='ลบเหตุการณ์ที่ประมวลผลแล้วเก่ากว่าจำนวนวันนี้ (ค่าเริ่มต้น: ไม่ลบ)')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size ต้องมีค่าอย่างน้อย 1')
+        if options['prune_days'] is not None and options['prune_days'] < 0:
+            raise CommandError('--prune-days ต้องไม่ติดลบ')
+
+        totals = {'events': 0, 'created': 0, 'coalesced': 0, 'skipped': 0}
+        try:
+            while True:
+                result = process_stock_alerts(batch_size=options['batch_size'], window=options['window'])
+                for key, value in result.items():
+                    totals[key] += value
+                if result['events'] < options['batch_size']:
+                    # คิวว่างแล้ว
+                    if not options['loop']:
+                        break
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+
+        if options['prune_days'] is not None:
+            totals['pruned'] = prune_stock_alerts(timezone.now() - timedelta(days=options['prune_days']))
+        return json.dumps(totals)
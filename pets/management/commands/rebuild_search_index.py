@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from pets import search
+
+
+class Command(BaseCommand):
+    help = 'สร้าง search index ของสัตว์เลี้ยงใหม่ทั้งหมด (เช่น หลัง bulk import)'
+
+    def handle(self, *args, **options):
+        count = search.rebuild_index()
+        backend = 'FTS5' if search.uses_fts() else 'inverted index'
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} pets ({backend})'))
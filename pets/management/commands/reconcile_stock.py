@@ -0,0 +1,28 @@
+import json
+
+from django.core.management.base import BaseCommand
+from pets.services import reconcile_stock
+
+
+class Command(BaseCommand):
+    help = ('คำนวณสต็อกของสัตว์เลี้ยงทุกตัวจากสมุดบัญชีสต็อก (query เดียว) แล้วเทียบกับ Pet.stock_quantity '
+            'ใช้ --fix เพื่อเขียนยอดจากบัญชีกลับไป')
+
+    def add_arguments(self, parser):
+        parser.add_argument('pet_ids', nargs='*', type=int, help='ตรวจเฉพาะสัตว์เลี้ยงที่ระบุ (ค่าเริ่มต้น: ทั้งหมด)')
+        parser.add_argument('--fix', action='store_true', help='แก้ Pet.stock_quantity ให้ตรงกับบัญชี')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        mismatches = reconcile_stock(
+            fix=options['fix'], pet_ids=options['pet_ids'] or None, batch_size=options['batch_size']
+        )
+        return json.dumps({
+            'mismatched': len(mismatches),
+            'fixed': options['fix'],
+            # แสดงตัวอย่างไม่เกิน 100 รายการ
+            'pets': [
+                {'pet_id': pet_id, 'stock_quantity': stock, 'ledger_stock': ledger}
+                for pet_id, stock, ledger in mismatches[:100]
+            ],
+        })
@@ -0,0 +1,25 @@
+import json
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from pets.services import snapshot_stock
+
+
+class Command(BaseCommand):
+    help = ('บันทึกยอดยกมา (snapshot) ของสมุดบัญชีสต็อก ให้การคำนวณยอดจากบัญชีอ่านเฉพาะรายการใหม่ '
+            'ควรรันเป็นระยะ (เช่น cron ทุกคืน) ใช้ --prune-days เพื่อลบรายการเก่าที่ถูก snapshot แทนที่แล้ว')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prune-days', type=int,
+                            help='ลบรายการที่เก่ากว่าจำนวนวันนี้และอยู่ก่อน snapshot ล่าสุด (ค่าเริ่มต้น: ไม่ลบ)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        prune_before = None
+        if options['prune_days'] is not None:
+            if options['prune_days'] < 0:
+                raise CommandError('--prune-days ต้องไม่ติดลบ')
+            prune_before = timezone.now() - timedelta(days=options['prune_days'])
+        created, pruned = snapshot_stock(prune_before=prune_before, batch_size=options['batch_size'])
+        return json.dumps({'snapshots': created, 'pruned': pruned})
@@ -0,0 +1,75 @@
+import json
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, OperationalError
+from pets.models import Pet
+
+
+class Command(BaseCommand):
+    help = 'ยิง reduce_stock พร้อมกันหลาย thread ใส่สัตว์เลี้ยงตัวเดียว เพื่อตรวจว่าไม่มีการขายเกินสต็อก'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pet-id', type=int, required=True)
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--attempts', type=int, default=50, help='จำนวนครั้งที่แต่ละ thread พยายามหักสต็อก')
+        parser.add_argument('--quantity', type=int, default=1)
+
+    def handle(self, *args, **options):
+        try:
+            pet = Pet.objects.get(pk=options['pet_id'])
+        except Pet.DoesNotExist:
+            raise CommandError(f"ไม่พบสัตว์เลี้ยง id={options['pet_id']}")
+
+        initial_stock = pet.stock_quantity
+        quantity = options['quantity']
+        results = {'success': 0, 'rejected': 0, 'errors': 0}
+        lock = threading.Lock()
+
+        def worker(worker_pet):
+            local = {'success': 0, 'rejected': 0, 'errors': 0}
+            try:
+                for _ in range(options['attempts']):
+                    try:
+                        if worker_pet.reduce_stock(quantity):
+                            local['success'] += 1
+                        else:
+                            local['rejected'] += 1
+                    except OperationalError:
+                        # เช่น "database is locked" บน SQLite - นับเป็น error ไม่ใช่การขายเกิน
+                        local['errors'] += 1
+            finally:
+                connection.close()
+                with lock:
+                    for key, value in local.items():
+                        results[key] += value
+
+        # โหลด instance ของแต่ละ thread ก่อนเริ่ม (การอ่านระหว่างที่ thread อื่นถือ write lock อาจล้มเหลวบน SQLite)
+        threads = [
+            threading.Thread(target=worker, args=(Pet.objects.get(pk=pet.pk),))
+            for _ in range(options['threads'])
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        pet.refresh_from_db(fields=['stock_quantity'])
+        sold = results['success'] * quantity
+        report = {
+            'pet_id': pet.pk,
+            'threads': options['threads'],
+            'attempts': options['threads'] * options['attempts'],
+            'initial_stock': initial_stock,
+            'final_stock': pet.stock_quantity,
+            'sold': sold,
+            'oversold': max(0, sold - initial_stock) + max(0, -pet.stock_quantity),
+            'consistent': initial_stock - sold == pet.stock_quantity,
+            'elapsed_seconds': round(elapsed, 4),
+            'ops_per_second': round((options['threads'] * options['attempts']) / elapsed, 1) if elapsed else None,
+            **results,
+        }
+        return json.dumps(report)
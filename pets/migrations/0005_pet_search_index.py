@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:35
+
+from django.db import migrations, models, OperationalError
+import django.db.models.deletion
+
+
+def create_fts_table(apps, schema_editor):
+    """สร้าง FTS5 virtual table บน SQLite (ข้ามถ้า SQLite ไม่รองรับ FTS5)"""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        try:
+            cursor.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS pets_pet_fts "
+                "USING fts5(name, description, category_name, tokenize='unicode61')"
+            )
+        except OperationalError:
+            return
+        cursor.execute(
+            "INSERT INTO pets_pet_fts (rowid, name, description, category_name) "
+            "SELECT p.id, p.name, p.description, c.name "
+            "FROM pets_pet p INNER JOIN pets_category c ON p.category_id = c.id"
+        )
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS pets_pet_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0004_alter_pet_options_pet_min_stock_threshold_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PetSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(db_index=True, max_length=64)),
+                ('weight', models.PositiveSmallIntegerField(default=1)),
+                ('pet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='pets.pet')),
+            ],
+        ),
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
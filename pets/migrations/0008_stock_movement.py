@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:06
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def open_ledger(apps, schema_editor):
+    """เริ่มสมุดบัญชีด้วยยอดคงเหลือปัจจุบันของสัตว์เลี้ยงทุกตัว (ชนิด initial)"""
+    Pet = apps.get_model('pets', 'Pet')
+    StockMovement = apps.get_model('pets', 'StockMovement')
+    db_alias = schema_editor.connection.alias
+    StockMovement.objects.using(db_alias).bulk_create(
+        (
+            StockMovement(pet_id=pet_id, kind='initial', quantity=stock, note='ยอดคงเหลือก่อนเริ่มใช้สมุดบัญชี')
+            for pet_id, stock in Pet.objects.using(db_alias).order_by('pk').values_list('pk', 'stock_quantity').iterator()
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('orders', '0007_cart'),
+        ('pets', '0007_category_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('initial', 'ยอดเริ่มต้น'), ('count', 'ตรวจนับ/กำหนดสต็อก'), ('snapshot', 'ยอดยกมา'), ('sale', 'ขาย'), ('cancel', 'ยกเลิกคำสั่งซื้อ'), ('order_change', 'แก้ไขคำสั่งซื้อ'), ('restock', 'รับสินค้าเข้า'), ('adjust', 'ปรับสต็อก')], max_length=20)),
+                ('quantity', models.IntegerField()),
+                ('note', models.CharField(blank=True, max_length=200)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to='orders.order')),
+                ('pet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='pets.pet')),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['pet', 'id'], name='stockmove_pet_idx')],
+            },
+        ),
+        migrations.RunPython(open_ledger, migrations.RunPython.noop),
+    ]
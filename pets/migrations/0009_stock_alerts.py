@@ -0,0 +1,50 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:12
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('pets', '0008_stock_movement'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.CharField(choices=[('low_stock', 'สต็อกต่ำ'), ('out_of_stock', 'สินค้าหมด')], max_length=20)),
+                ('stock_quantity', models.IntegerField()),
+                ('message', models.CharField(max_length=200)),
+                ('event_count', models.PositiveIntegerField(default=1)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('read_at', models.DateTimeField(blank=True, null=True)),
+                ('pet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_notifications', to='pets.pet')),
+                ('recipient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_notifications', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['recipient', '-created_at', 'id'], name='stocknotif_recipient_idx'), models.Index(condition=models.Q(('read_at__isnull', True)), fields=['pet', 'created_at'], name='stocknotif_unread_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockAlertEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.CharField(choices=[('low_stock', 'สต็อกต่ำ'), ('out_of_stock', 'สินค้าหมด')], max_length=20)),
+                ('stock_quantity', models.IntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('pet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_alert_events', to='pets.pet')),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(condition=models.Q(('processed_at__isnull', True)), fields=['id'], name='stockalert_pending_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0009_stock_alerts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pet',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pets', '0010_pet_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pet',
+            index=models.Index(condition=models.Q(('is_available', True), ('stock_quantity__gt', 0)), fields=['-created_at', 'id'], name='pet_in_stock_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pet',
+            index=models.Index(condition=models.Q(('is_available', True), ('stock_quantity__gt', 0), ('stock_quantity__lte', models.F('min_stock_threshold'))), fields=['-created_at', 'id'], name='pet_low_stock_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pet',
+            index=models.Index(condition=models.Q(('is_available', True), ('stock_quantity', 0)), fields=['-created_at', 'id'], name='pet_out_of_stock_recent_idx'),
+        ),
+    ]
@@ -1,14 +1,62 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import BooleanField, Case, CharField, F, Q, Value, When
+from django.utils import timezone
 from users.models import CustomUser
+from . import cache as catalog_cache
+from .images import variant_urls
 
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return self.name
 
+STOCK_STATUS_DISPLAY = {
+    'out_of_stock': 'สินค้าหมด',
+    'low_stock': 'สต็อกต่ำ',
+    'in_stock': 'พร้อมขาย'
+}
+
+def stock_status_for(quantity, threshold):
+    """สถานะสต็อกจากจำนวนคงเหลือและจำนวนขั้นต่ำ (ตรงกับ stock_annotations)"""
+    if quantity <= 0:
+        return 'out_of_stock'
+    if quantity <= threshold:
+        return 'low_stock'
+    return 'in_stock'
+
+def stock_annotations(prefix=''):
+    """stock_status / stock_status_display / is_low_stock ในรูป SQL expression (ตรงกับ property ของ Pet)
+
+    ชื่อซ้ำกับ property จึงใช้คู่กับ ``.values()`` เท่านั้น
+    prefix ใช้เมื่อ annotate ผ่านความสัมพันธ์ เช่น ``stock_annotations('pet__')`` บน Order
+    """
+    threshold = F(f'{prefix}min_stock_threshold')
+    is_out = Q(**{f'{prefix}stock_quantity__lte': 0})
+    is_low = Q(**{f'{prefix}stock_quantity__gt': 0, f'{prefix}stock_quantity__lte': threshold})
+
+    def status(labels):
+        return Case(
+            When(is_out, then=Value(labels['out_of_stock'])),
+            When(is_low, then=Value(labels['low_stock'])),
+            default=Value(labels['in_stock']),
+            output_field=CharField(),
+        )
+
+    return {
+        'stock_status': status({key: key for key in STOCK_STATUS_DISPLAY}),
+        'stock_status_display': status(STOCK_STATUS_DISPLAY),
+        'is_low_stock': Case(
+            When(is_low, then=Value(True)),
+            default=Value(False),
+            output_field=BooleanField(),
+        ),
+    }
+
+
 class Pet(models.Model):
     GENDER_CHOICES = [
         ('M', 'Male'),
@@ -21,6 +69,8 @@ class Pet(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     image = models.ImageField(upload_to='pets/', blank=True, null=True)
     image_url = models.URLField(blank=True, null=True, verbose_name='Image URL')
+    # path ของรูปย่อแต่ละขนาด (สร้างโดย worker - pets.images)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     gender = models.CharField(max_length=1, choices=GENDER_CHOICES)
     is_available = models.BooleanField(default=True)
     
@@ -44,6 +94,11 @@ class Pet(models.Model):
             return self.image_url
         return None
     
+    @property
+    def image_display_variants(self):
+        """URL รูปย่อแต่ละขนาด (thumb / card / large) ใช้รูปต้นฉบับแทนถ้ายังไม่ได้สร้าง"""
+        return variant_urls(self.image_variants, self.image_display)
+    
     # เพิ่ม properties และ methods สำหรับจัดการสต็อก
     @property
     def is_out_of_stock(self):
@@ -63,43 +118,69 @@ class Pet(models.Model):
     @property
     def stock_status(self):
         """คืนค่าสถานะสต็อก"""
-        if self.is_out_of_stock:
-            return 'out_of_stock'
-        elif self.is_low_stock:
-            return 'low_stock'
-        else:
-            return 'in_stock'
+        return stock_status_for(self.stock_quantity, self.min_stock_threshold)
     
     @property
     def stock_status_display(self):
         """คืนค่าสถานะสต็อกสำหรับแสดงผล"""
-        status_map = {
-            'out_of_stock': 'สินค้าหมด',
-            'low_stock': 'สต็อกต่ำ',
-            'in_stock': 'พร้อมขาย'
-        }
-        return status_map.get(self.stock_status, 'พร้อมขาย')
-    
-    def reduce_stock(self, quantity=1):
-        """ลดจำนวนสต็อกเมื่อมีการสั่งซื้อ"""
-        if self.stock_quantity >= quantity:
-            self.stock_quantity -= quantity
-            self.save()
-            return True
-        return False
+        return STOCK_STATUS_DISPLAY.get(self.stock_status, 'พร้อมขาย')
+    
+    def save(self, *args, **kwargs):
+        """บันทึกสัตว์เลี้ยง โดย stock_quantity ที่เปลี่ยนผ่าน save() (admin, serializer)
+        ถูกลงสมุดบัญชีสต็อกเป็นยอดนับใหม่ ถ้าไม่ได้แก้สต็อกจะไม่เขียนคอลัมน์นี้ทับ
+        (ค่าที่โหลดไว้อาจเก่ากว่าการหักสต็อกที่เกิดพร้อมกัน)
+        image_variants ไม่ถูกเขียนโดย save() ปกติเลย (เขียนโดย pets.images.generate_pet_images
+        และ signal ตอนอัพโหลดรูปเท่านั้น) instance ที่โหลดก่อน worker สร้างรูปย่อเสร็จจะได้ไม่เขียน {} ทับ
+        """
+        adding = self._state.adding
+        stock = self.__dict__.get('stock_quantity')
+        stock_changed = adding or (stock is not None and stock != getattr(self, '_loaded_stock', stock))
+        update_fields = kwargs.get('update_fields')
+        if not adding and update_fields is None:
+            skipped = {'image_variants'} if stock_changed else {'image_variants', 'stock_quantity'}
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in skipped and field.attname in self.__dict__
+            ]
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if stock_changed and (update_fields is None or 'stock_quantity' in update_fields):
+                StockMovement.objects.create(
+                    pet=self,
+                    kind=StockMovement.INITIAL if adding else StockMovement.COUNT,
+                    quantity=self.stock_quantity
+                )
+                if not adding:
+                    from .services import enqueue_stock_alerts
+                    enqueue_stock_alerts([
+                        (self.pk, self._loaded_stock, self.stock_quantity, self.min_stock_threshold)
+                    ])
+        self._loaded_stock = self.stock_quantity
+    
+    def reduce_stock(self, quantity=1, kind=None, order=None, user=None):
+        """ลดจำนวนสต็อกเมื่อมีการสั่งซื้อ
+
+        ใช้ conditional UPDATE (stock_quantity >= quantity) ในคำสั่งเดียว
+        จึงไม่มีการขายเกินสต็อกแม้มีหลาย worker หักสต็อกพร้อมกัน
+        คืนค่า True ถ้าหักสต็อกสำเร็จ
+        """
+        from .services import adjust_stock
+        if quantity <= 0:
+            return False
+        return adjust_stock(self, -quantity, kind or StockMovement.ADJUST, order=order, user=user)
     
-    def increase_stock(self, quantity=1):
-        """เพิ่มจำนวนสต็อก"""
-        self.stock_quantity += quantity
-        self.save()
-        return True
+    def increase_stock(self, quantity=1, kind=None, order=None, user=None):
+        """เพิ่มจำนวนสต็อก (atomic UPDATE ไม่เขียนทับฟิลด์อื่น)"""
+        from .services import adjust_stock
+        if quantity <= 0:
+            return False
+        return adjust_stock(self, quantity, kind or StockMovement.RESTOCK, order=order, user=user)
     
-    def set_stock(self, quantity):
-        """ตั้งค่าจำนวนสต็อก"""
+    def set_stock(self, quantity, user=None):
+        """ตั้งค่าจำนวนสต็อก (ยอดนับใหม่)"""
+        from .services import count_stock
         if quantity >= 0:
-            self.stock_quantity = quantity
-            self.save()
-            return True
+            return count_stock(self, quantity, user=user)
         return False
     
     def get_stock_warning(self):
@@ -111,4 +192,150 @@ class Pet(models.Model):
         return None
     
     class Meta:
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
+        indexes = [
+            # ลูกค้าเห็นเฉพาะที่พร้อมขายและมีสต็อก / low_stock / out_of_stock
+            models.Index(fields=['is_available', 'stock_quantity'], name='pet_avail_stock_idx'),
+            # pet_list / related pets กรองตามหมวดหมู่
+            models.Index(fields=['category', 'is_available'], name='pet_category_avail_idx'),
+            # my_pets_stock ของผู้ขาย
+            models.Index(fields=['created_by', 'is_available'], name='pet_seller_avail_idx'),
+            # keyset pagination (-created_at, id)
+            models.Index(fields=['-created_at', 'id'], name='pet_created_idx'),
+            # หน้าแรก / pet_list (partial index เฉพาะที่พร้อมขาย)
+            models.Index(
+                fields=['-created_at'],
+                condition=models.Q(is_available=True),
+                name='pet_available_recent_idx'
+            ),
+            # หน้าแรกของรายการลูกค้า / available_pets / low_stock / out_of_stock ตามลำดับ keyset
+            # (partial index ของแต่ละเงื่อนไข - ทุกแถวใน index ผ่าน WHERE จึงหยุดได้ทันทีที่ครบ LIMIT)
+            models.Index(
+                fields=['-created_at', 'id'],
+                condition=models.Q(is_available=True, stock_quantity__gt=0),
+                name='pet_in_stock_recent_idx'
+            ),
+            models.Index(
+                fields=['-created_at', 'id'],
+                condition=models.Q(
+                    is_available=True, stock_quantity__gt=0, stock_quantity__lte=models.F('min_stock_threshold')
+                ),
+                name='pet_low_stock_recent_idx'
+            ),
+            models.Index(
+                fields=['-created_at', 'id'],
+                condition=models.Q(is_available=True, stock_quantity=0),
+                name='pet_out_of_stock_recent_idx'
+            ),
+        ]
+
+
+class StockMovement(models.Model):
+    """สมุดบัญชีสต็อกแบบ append-only (เขียนผ่าน ``pets.services`` เท่านั้น)
+
+    รายการชนิด initial / count / snapshot เก็บยอดคงเหลือ ณ จุดนั้น (absolute)
+    ชนิดอื่นเก็บจำนวนที่เปลี่ยน (ติดลบคือลด) สต็อกปัจจุบันคือยอด absolute ล่าสุด
+    บวกผลรวมของรายการหลังจากนั้น (เรียงตาม id) ซึ่งต้องเท่ากับ ``Pet.stock_quantity`` เสมอ
+    """
+    INITIAL = 'initial'
+    COUNT = 'count'
+    SNAPSHOT = 'snapshot'
+    SALE = 'sale'
+    CANCEL = 'cancel'
+    ORDER_CHANGE = 'order_change'
+    RESTOCK = 'restock'
+    ADJUST = 'adjust'
+    ABSOLUTE_KINDS = (INITIAL, COUNT, SNAPSHOT)
+    KIND_CHOICES = [
+        (INITIAL, 'ยอดเริ่มต้น'),
+        (COUNT, 'ตรวจนับ/กำหนดสต็อก'),
+        (SNAPSHOT, 'ยอดยกมา'),
+        (SALE, 'ขาย'),
+        (CANCEL, 'ยกเลิกคำสั่งซื้อ'),
+        (ORDER_CHANGE, 'แก้ไขคำสั่งซื้อ'),
+        (RESTOCK, 'รับสินค้าเข้า'),
+        (ADJUST, 'ปรับสต็อก'),
+    ]
+    
+    pet = models.ForeignKey(Pet, on_delete=models.CASCADE, related_name='stock_movements')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    quantity = models.IntegerField()
+    order = models.ForeignKey(
+        'orders.Order', on_delete=models.SET_NULL, null=True, blank=True, related_name='stock_movements'
+    )
+    created_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True)
+    note = models.CharField(max_length=200, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.pet_id} {self.kind} {self.quantity}"
+    
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # ยอด absolute ล่าสุด + รายการหลังจากนั้นของสัตว์เลี้ยงแต่ละตัว
+            models.Index(fields=['pet', 'id'], name='stockmove_pet_idx'),
+        ]
+
+
+class StockAlertEvent(models.Model):
+    """คิวเหตุการณ์สต็อกต่ำ/หมด (outbox) บันทึกใน transaction เดียวกับการหักสต็อก
+
+    worker (``process_stock_alerts``) อ่านรายการที่ยังไม่ processed เป็น batch แล้วสร้าง StockNotification
+    """
+    LEVEL_CHOICES = [
+        ('low_stock', STOCK_STATUS_DISPLAY['low_stock']),
+        ('out_of_stock', STOCK_STATUS_DISPLAY['out_of_stock']),
+    ]
+    
+    pet = models.ForeignKey(Pet, on_delete=models.CASCADE, related_name='stock_alert_events')
+    level = models.CharField(max_length=20, choices=LEVEL_CHOICES)
+    stock_quantity = models.IntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.pet_id} {self.level} {self.stock_quantity}"
+    
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # worker ดึงเฉพาะรายการที่ยังไม่ processed ตามลำดับ id
+            models.Index(fields=['id'], condition=models.Q(processed_at__isnull=True), name='stockalert_pending_idx'),
+        ]
+
+
+class StockNotification(models.Model):
+    """การแจ้งเตือนสต็อกต่ำ/หมดถึงผู้ขาย (เหตุการณ์ของสัตว์เลี้ยงตัวเดียวกันในช่วงเวลาหนึ่งรวมเป็นรายการเดียว)"""
+    recipient = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='stock_notifications')
+    pet = models.ForeignKey(Pet, on_delete=models.CASCADE, related_name='stock_notifications')
+    level = models.CharField(max_length=20, choices=StockAlertEvent.LEVEL_CHOICES)
+    stock_quantity = models.IntegerField()
+    message = models.CharField(max_length=200)
+    event_count = models.PositiveIntegerField(default=1)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    read_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.recipient_id}: {self.message}"
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # รายการแจ้งเตือนของผู้ขาย (keyset -created_at, id)
+            models.Index(fields=['recipient', '-created_at', 'id'], name='stocknotif_recipient_idx'),
+            # worker หารายการที่ยังไม่อ่านของสัตว์เลี้ยงเพื่อรวมเหตุการณ์
+            models.Index(fields=['pet', 'created_at'], condition=models.Q(read_at__isnull=True),
+                         name='stocknotif_unread_idx'),
+        ]
+
+
+class PetSearchTerm(models.Model):
+    """Inverted index สำหรับค้นหาสัตว์เลี้ยง (ใช้เมื่อฐานข้อมูลไม่ใช่ SQLite/FTS5)"""
+    term = models.CharField(max_length=64, db_index=True)
+    pet = models.ForeignKey(Pet, on_delete=models.CASCADE, related_name='search_terms')
+    weight = models.PositiveSmallIntegerField(default=1)
+    
+    def __str__(self):
+        return f"{self.term} -> {self.pet_id}"
@@ -0,0 +1,174 @@
+"""
+ระบบค้นหาสัตว์เลี้ยง (ชื่อ, รายละเอียด, ชื่อหมวดหมู่) แบบจัดอันดับและรองรับ prefix
+
+- SQLite: ใช้ FTS5 virtual table ``pets_pet_fts`` (สร้างใน migration) จัดอันดับด้วย bm25
+- ฐานข้อมูลอื่น: ตัดคำด้วย Python แล้วเก็บ inverted index ในตาราง ``PetSearchTerm``
+  (อยู่ในฐานข้อมูลจึงใช้ร่วมกันได้ทุก worker)
+
+index ถูกอัพเดทผ่าน signal ใน ``pets.signals``
+"""
+import unicodedata
+
+from django.db import connections, router
+from django.db.models import Sum
+from .models import Pet, PetSearchTerm
+
+FTS_TABLE = 'pets_pet_fts'
+
+# น้ำหนักของแต่ละฟิลด์ในการจัดอันดับ
+NAME_WEIGHT = 10
+CATEGORY_WEIGHT = 5
+DESCRIPTION_WEIGHT = 1
+
+MAX_TERM_LENGTH = 64
+_fts_available = {}
+
+
+def _is_token_char(char):
+    # ตัวอักษร ตัวเลข และเครื่องหมายประกอบ (สระ/วรรณยุกต์ไทย) เหมือน tokenizer unicode61 ของ FTS5
+    return unicodedata.category(char)[0] in ('L', 'N', 'M')
+
+
+def tokenize(text):
+    """แยกคำ (ตัวพิมพ์เล็ก, ไม่ซ้ำ, ตามลำดับที่พบ)"""
+    tokens = []
+    current = []
+    for char in (text or '').lower() + ' ':
+        if _is_token_char(char):
+            current.append(char)
+            continue
+        if current:
+            token = ''.join(current)[:MAX_TERM_LENGTH]
+            if token not in tokens:
+                tokens.append(token)
+            current = []
+    return tokens
+
+
+def _connection():
+    return connections[router.db_for_write(Pet)]
+
+
+def uses_fts(connection=None):
+    """ใช้ FTS5 ได้หรือไม่ (SQLite และมีตาราง FTS จาก migration)"""
+    connection = connection or _connection()
+    if connection.vendor != 'sqlite':
+        return False
+    if connection.alias not in _fts_available:
+        with connection.cursor() as cursor:
+            _fts_available[connection.alias] = FTS_TABLE in connection.introspection.table_names(cursor)
+    return _fts_available[connection.alias]
+
+
+def _weighted_terms(name, description, category_name):
+    weights = {}
+    for text, weight in ((name, NAME_WEIGHT), (category_name, CATEGORY_WEIGHT),
+                         (description, DESCRIPTION_WEIGHT)):
+        for term in tokenize(text):
+            weights[term] = weights.get(term, 0) + weight
+    return weights
+
+
+def index_pet(pet):
+    """เพิ่ม/อัพเดทสัตว์เลี้ยงใน search index"""
+    category_name = pet.category.name if pet.category_id else ''
+    connection = _connection()
+    if uses_fts(connection):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [pet.pk])
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, description, category_name) VALUES (%s, %s, %s, %s)',
+                [pet.pk, pet.name, pet.description, category_name]
+            )
+        return
+    PetSearchTerm.objects.filter(pet_id=pet.pk).delete()
+    PetSearchTerm.objects.bulk_create([
+        PetSearchTerm(term=term, pet_id=pet.pk, weight=weight)
+        for term, weight in _weighted_terms(pet.name, pet.description, category_name).items()
+    ])
+
+
+def remove_pet(pet_id):
+    """ลบสัตว์เลี้ยงออกจาก search index"""
+    connection = _connection()
+    if uses_fts(connection):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [pet_id])
+    # แถวใน PetSearchTerm ถูกลบตาม CASCADE ของ Pet
+
+
+def reindex_category(category):
+    """อัพเดท index ของสัตว์เลี้ยงทุกตัวในหมวดหมู่ (เมื่อเปลี่ยนชื่อหมวดหมู่)"""
+    for pet in category.pet_set.select_related('category').only(
+        'id', 'name', 'description', 'category__name'
+    ):
+        index_pet(pet)
+
+
+def rebuild_index():
+    """สร้าง search index ใหม่ทั้งหมด คืนค่าจำนวนสัตว์เลี้ยงที่ index"""
+    connection = _connection()
+    if uses_fts(connection):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, description, category_name) '
+                f'SELECT p.id, p.name, p.description, c.name '
+                f'FROM pets_pet p INNER JOIN pets_category c ON p.category_id = c.id'
+            )
+        return Pet.objects.count()
+
+    PetSearchTerm.objects.all().delete()
+    count = 0
+    batch = []
+    rows = Pet.objects.values_list('id', 'name', 'description', 'category__name')
+    for pet_id, name, description, category_name in rows.iterator(chunk_size=2000):
+        count += 1
+        for term, weight in _weighted_terms(name, description, category_name).items():
+            batch.append(PetSearchTerm(term=term, pet_id=pet_id, weight=weight))
+        if len(batch) >= 5000:
+            PetSearchTerm.objects.bulk_create(batch)
+            batch = []
+    PetSearchTerm.objects.bulk_create(batch)
+    return count
+
+
+def search_pet_ids(query, limit=None):
+    """ค้นหาสัตว์เลี้ยง คืนค่า list ของ pet id เรียงตามความเกี่ยวข้อง
+
+    ทุกคำในคำค้นต้องตรง (AND) โดยแต่ละคำจับคู่แบบ prefix
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return []
+
+    connection = _connection()
+    if uses_fts(connection):
+        match = ' '.join(f'"{token}"*' for token in tokens)
+        sql = (
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+            f'ORDER BY bm25({FTS_TABLE}, {NAME_WEIGHT}.0, {DESCRIPTION_WEIGHT}.0, {CATEGORY_WEIGHT}.0)'
+        )
+        params = [match]
+        if limit:
+            sql += ' LIMIT %s'
+            params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+
+    scores = None
+    for token in tokens:
+        token_scores = dict(
+            PetSearchTerm.objects.filter(term__startswith=token)
+            .values('pet_id').annotate(score=Sum('weight'))
+            .values_list('pet_id', 'score')
+        )
+        if scores is None:
+            scores = token_scores
+        else:
+            scores = {pid: scores[pid] + score for pid, score in token_scores.items() if pid in scores}
+        if not scores:
+            return []
+    ranked = sorted(scores, key=lambda pid: (-scores[pid], pid))
+    return ranked[:limit] if limit else ranked
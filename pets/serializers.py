@@ -1,5 +1,8 @@
 from rest_framework import serializers
-from .models import Pet, Category
+from .images import variant_urls
+from .models import Pet, Category, StockNotification, stock_annotations
+
+IMAGE_FIELD = Pet._meta.get_field('image')
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -10,6 +13,7 @@ class PetSerializer(serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
     created_by_name = serializers.CharField(source='created_by.get_full_name', read_only=True)
     image_display = serializers.ReadOnlyField()  # เพิ่ม field นี้
+    image_variants = serializers.ReadOnlyField(source='image_display_variants')
     
     class Meta:
         model = Pet
@@ -19,7 +23,83 @@ class PetSerializer(serializers.ModelSerializer):
 class PetListSerializer(serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
     image_display = serializers.ReadOnlyField()  # เพิ่ม field นี้
+    image_variants = serializers.ReadOnlyField(source='image_display_variants')
     
     class Meta:
         model = Pet
-        fields = ('id', 'name', 'price', 'image', 'image_url', 'image_display', 'category_name', 'is_available', 'gender')
\ No newline at end of file
+        fields = ('id', 'name', 'price', 'image', 'image_url', 'image_display', 'image_variants',
+                  'category_name', 'is_available', 'gender')
+
+class StockNotificationSerializer(serializers.ModelSerializer):
+    pet_name = serializers.CharField(source='pet.name', read_only=True)
+    
+    class Meta:
+        model = StockNotification
+        fields = ('id', 'pet', 'pet_name', 'level', 'stock_quantity', 'message', 'event_count',
+                  'created_at', 'updated_at', 'read_at')
+
+def image_fields(image, image_url, request=None):
+    """ค่า image / image_display จากชื่อไฟล์ในฐานข้อมูล (แบบเดียวกับ ImageField ของ DRF และ Pet.image_display)"""
+    if not image:
+        return None, image_url
+    url = IMAGE_FIELD.storage.url(image)
+    return (request.build_absolute_uri(url) if request is not None else url), url
+
+
+class PetListRowSerializer(serializers.BaseSerializer):
+    """Read-only serializer สำหรับ list actions ที่อ่านจาก ``.values()`` โดยตรง
+
+    ไม่สร้าง model instance และไม่ผ่าน field ของ ModelSerializer ทีละฟิลด์
+    stock_status / is_low_stock คำนวณใน SQL (``stock_annotations``)
+    ผลลัพธ์มีฟิลด์เดียวกับ PetListSerializer พร้อมข้อมูลสต็อก
+    """
+    values = (
+        'id', 'name', 'price', 'image', 'image_url', 'image_variants', 'category__name', 'is_available', 'gender',
+        'stock_quantity', 'stock_status', 'is_low_stock', 'created_at',
+    )
+
+    @classmethod
+    def project(cls, queryset):
+        return queryset.annotate(**stock_annotations()).values(*cls.values)
+
+    def to_representation(self, row):
+        image, image_display = image_fields(row['image'], row['image_url'], self.context.get('request'))
+        return {
+            'id': row['id'],
+            'name': row['name'],
+            'price': str(row['price']),
+            'image': image,
+            'image_url': row['image_url'],
+            'image_display': image_display,
+            'image_variants': variant_urls(row['image_variants'], image_display),
+            'category_name': row['category__name'],
+            'is_available': row['is_available'],
+            'gender': row['gender'],
+            'stock_quantity': row['stock_quantity'],
+            'stock_status': row['stock_status'],
+            'is_low_stock': row['is_low_stock'],
+        }
+
+
+class StockStatusRowSerializer(serializers.BaseSerializer):
+    """แถวของ ``PetViewSet.stock_status`` จาก ``.values()`` (สถานะสต็อกคำนวณใน SQL)"""
+    values = (
+        'id', 'name', 'price', 'image', 'image_url', 'category__name', 'stock_quantity',
+        'stock_status_display', 'created_at',
+    )
+
+    @classmethod
+    def project(cls, queryset):
+        return queryset.annotate(**stock_annotations()).values(*cls.values)
+
+    def to_representation(self, row):
+        return {
+            'id': row['id'],
+            'name': row['name'],
+            'price': float(row['price']),
+            'stock_quantity': row['stock_quantity'],
+            'is_out_of_stock': row['stock_quantity'] <= 0,
+            'stock_status': row['stock_status_display'],
+            'image': image_fields(row['image'], row['image_url'])[1],
+            'category_name': row['category__name'] or ''
+        }
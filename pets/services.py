@@ -0,0 +1,407 @@
+import csv
+import io
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from jobs.services import enqueue
+from . import cache as catalog_cache
+from .models import Pet, StockAlertEvent, StockMovement, StockNotification, stock_status_for
+
+# ---------------------------------------------------------------------------
+# สมุดบัญชีสต็อก (ledger) - ทุกการเปลี่ยนสต็อกผ่านส่วนนี้
+# ---------------------------------------------------------------------------
+
+
+def apply_stock_changes(deltas=None, absolutes=None, floors=None):
+    """เขียนสต็อกของหลายตัวใน UPDATE เดียว คืนค่าจำนวนแถวที่ถูกอัพเดท
+
+    deltas {pet_id: จำนวนที่เปลี่ยน} เขียนเป็น F('stock_quantity') + n จึงไม่ทับการเปลี่ยนแปลงอื่น
+    absolutes {pet_id: ยอดใหม่} และ floors {pet_id: สต็อกขั้นต่ำที่ต้องมีก่อนเปลี่ยน}
+    ผู้เรียกต้องตรวจว่าจำนวนแถวครบ (ไม่ครบ = สต็อกไม่พอ) และบันทึก movement ใน transaction เดียวกัน
+    หลัง UPDATE เสมอ (แถวของ Pet ถูก lock แล้ว ลำดับ id ของ movement จึงตรงกับลำดับการเปลี่ยนจริง)
+    """
+    deltas, absolutes, floors = deltas or {}, absolutes or {}, floors or {}
+    guard = Q()
+    whens = []
+    for pet_id, change in deltas.items():
+        guard |= Q(pk=pet_id, stock_quantity__gte=floors.get(pet_id, 0))
+        whens.append(When(pk=pet_id, then=F('stock_quantity') + change))
+    for pet_id, quantity in absolutes.items():
+        guard |= Q(pk=pet_id)
+        whens.append(When(pk=pet_id, then=Value(quantity)))
+    if not whens:
+        return 0
+    return Pet.objects.filter(guard).update(
+        stock_quantity=Case(*whens, default=F('stock_quantity')),
+        updated_at=timezone.now()
+    )
+
+
+def record_movements(movements):
+    return StockMovement.objects.bulk_create(movements)
+
+
+def _stock_written(pet):
+    # อ่านภายใน transaction เดียวกับการเขียน (ไม่ต้องรอ lock ของ writer อื่นอีกรอบ)
+    pet.refresh_from_db(fields=['stock_quantity', 'min_stock_threshold', 'updated_at'])
+    pet._loaded_stock = pet.stock_quantity
+
+
+def adjust_stock(pet, change, kind, order=None, user=None, note=''):
+    """เพิ่ม/ลดสต็อกของสัตว์เลี้ยงหนึ่งตัว (change ติดลบคือลด ล้มเหลวถ้าสต็อกไม่พอ) คืนค่า True ถ้าสำเร็จ"""
+    with transaction.atomic():
+        updated = apply_stock_changes({pet.pk: change}, floors={pet.pk: max(0, -change)})
+        if updated:
+            StockMovement.objects.create(
+                pet_id=pet.pk, kind=kind, quantity=change, order=order, created_by=user, note=note
+            )
+        _stock_written(pet)
+        if updated and change < 0:
+            enqueue_stock_alerts([
+                (pet.pk, pet.stock_quantity - change, pet.stock_quantity, pet.min_stock_threshold)
+            ])
+    if updated:
+        catalog_cache.invalidate_pet(pet.pk, pet.category_id)
+    return updated == 1
+
+
+def count_stock(pet, quantity, user=None, note=''):
+    """กำหนดยอดสต็อกใหม่ (ตรวจนับ) ลงบัญชีเป็นยอด absolute"""
+    # ยอดก่อนตรวจนับใช้ค่าที่โหลดไว้ (worker ตรวจสต็อกจริงอีกครั้งก่อนแจ้งเตือน)
+    before = pet.stock_quantity
+    with transaction.atomic():
+        updated = apply_stock_changes(absolutes={pet.pk: quantity})
+        if updated:
+            StockMovement.objects.create(
+                pet_id=pet.pk, kind=StockMovement.COUNT, quantity=quantity, created_by=user, note=note
+            )
+        _stock_written(pet)
+        if updated:
+            enqueue_stock_alerts([(pet.pk, before, pet.stock_quantity, pet.min_stock_threshold)])
+    if updated:
+        catalog_cache.invalidate_pet(pet.pk, pet.category_id)
+    return updated == 1
+
+
+def ledger_stock(queryset=None):
+    """annotate ``ledger_stock`` (สต็อกที่คำนวณจากบัญชี) ให้ queryset ของ Pet ใน query เดียว
+
+    ใช้ยอด absolute ล่าสุดของแต่ละตัวเป็นฐาน แล้วบวกรายการหลังจากนั้น (index pet, id)
+    จำนวนแถวที่ต้องอ่านจึงเท่ากับรายการหลัง snapshot ล่าสุดเท่านั้น
+    """
+    queryset = Pet.objects.all() if queryset is None else queryset
+    absolute = StockMovement.objects.filter(
+        pet=OuterRef('pk'), kind__in=StockMovement.ABSOLUTE_KINDS
+    ).order_by('-id')
+    since_base = StockMovement.objects.filter(
+        pet=OuterRef('pk'), id__gt=Coalesce(OuterRef('ledger_base_id'), 0)
+    ).exclude(kind__in=StockMovement.ABSOLUTE_KINDS).order_by().values('pet').annotate(
+        total=Sum('quantity')
+    ).values('total')
+    return queryset.annotate(
+        ledger_base_id=Subquery(absolute.values('id')[:1]),
+    ).annotate(
+        ledger_stock=(
+            Coalesce(Subquery(absolute.values('quantity')[:1]), 0)
+            + Coalesce(Subquery(since_base, output_field=IntegerField()), 0)
+        ),
+    )
+
+
+def reconcile_stock(fix=False, pet_ids=None, batch_size=1000):
+    """เทียบ Pet.stock_quantity กับยอดจากบัญชี คืนค่ารายการที่ไม่ตรง [(pet_id, stock, ledger), ...]
+
+    fix=True เขียนยอดจากบัญชีกลับไปที่ Pet ด้วย UPDATE เดียวต่อ batch
+    """
+    queryset = Pet.objects.order_by('pk')
+    if pet_ids is not None:
+        queryset = queryset.filter(pk__in=pet_ids)
+    mismatches = [
+        row for row in ledger_stock(queryset).values_list('pk', 'stock_quantity', 'ledger_stock').iterator()
+        if row[1] != row[2]
+    ]
+    if fix:
+        for offset in range(0, len(mismatches), batch_size):
+            batch = mismatches[offset:offset + batch_size]
+            with transaction.atomic():
+                # ยอดจากบัญชีอาจเปลี่ยนไประหว่างอ่าน จึงคำนวณใหม่ภายใต้ lock ของแถว Pet
+                locked = list(Pet.objects.select_for_update().filter(pk__in=[row[0] for row in batch])
+                              .values_list('pk', flat=True))
+                balances = dict(ledger_stock(Pet.objects.filter(pk__in=locked)).values_list('pk', 'ledger_stock'))
+                apply_stock_changes(absolutes=balances)
+                catalog_cache.invalidate_pets(
+                    Pet.objects.filter(pk__in=locked).values_list('pk', 'category_id')
+                )
+    return mismatches
+
+
+def snapshot_stock(prune_before=None, batch_size=1000):
+    """บันทึกยอดยกมา (snapshot) ของสัตว์เลี้ยงทุกตัวจากบัญชี คืนค่าจำนวน (snapshot, รายการที่ลบ)
+
+    หลัง snapshot การคำนวณยอดจากบัญชีอ่านเฉพาะรายการใหม่กว่า snapshot
+    prune_before (datetime) ลบรายการที่เก่ากว่าเวลานั้นและถูก snapshot แทนที่แล้ว (compaction)
+    """
+    pet_ids = list(Pet.objects.order_by('pk').values_list('pk', flat=True))
+    created = pruned = 0
+    for offset in range(0, len(pet_ids), batch_size):
+        batch = pet_ids[offset:offset + batch_size]
+        with transaction.atomic():
+            # lock แถว Pet ก่อน ไม่ให้มี movement ใหม่แทรกระหว่างคำนวณยอดกับบันทึก snapshot
+            list(Pet.objects.select_for_update().filter(pk__in=batch).values_list('pk', flat=True))
+            balances = ledger_stock(Pet.objects.filter(pk__in=batch)).values_list('pk', 'ledger_stock')
+            snapshots = record_movements([
+                StockMovement(pet_id=pet_id, kind=StockMovement.SNAPSHOT, quantity=balance)
+                for pet_id, balance in balances
+            ])
+            created += len(snapshots)
+            if prune_before is not None:
+                latest_snapshot = StockMovement.objects.filter(
+                    pet=OuterRef('pet'), kind=StockMovement.SNAPSHOT
+                ).order_by('-id').values('id')[:1]
+                pruned += StockMovement.objects.filter(
+                    pet_id__in=batch, created_at__lt=prune_before, id__lt=Subquery(latest_snapshot)
+                ).delete()[0]
+    return created, pruned
+
+
+# ---------------------------------------------------------------------------
+# แจ้งเตือนสต็อกต่ำ (event queue + worker)
+# ---------------------------------------------------------------------------
+
+# ลำดับความรุนแรงของสถานะสต็อก
+STOCK_ALERT_SEVERITY = {'in_stock': 0, 'low_stock': 1, 'out_of_stock': 2}
+
+
+def enqueue_stock_alerts(changes):
+    """บันทึกเหตุการณ์ของสัตว์เลี้ยงที่สถานะสต็อกแย่ลง (ข้ามเส้น min_stock_threshold หรือหมด)
+
+    changes คือ [(pet_id, สต็อกก่อน, สต็อกหลัง, min_stock_threshold), ...] ที่ผู้เรียกรู้อยู่แล้ว
+    ตรวจในหน่วยความจำ และเขียนด้วย INSERT เดียวเฉพาะเมื่อมีการข้ามเส้น ต้องเรียกใน transaction
+    เดียวกับการเขียนสต็อก (rollback พร้อมกัน) การสร้าง notification ทำใน worker ภายหลัง
+    """
+    events = []
+    for pet_id, before, after, threshold in changes:
+        if before is None:
+            continue
+        level = stock_status_for(after, threshold)
+        if STOCK_ALERT_SEVERITY[level] > STOCK_ALERT_SEVERITY[stock_status_for(before, threshold)]:
+            events.append(StockAlertEvent(pet_id=pet_id, level=level, stock_quantity=after))
+    if events:
+        StockAlertEvent.objects.bulk_create(events)
+        # ปลุก worker หลัง commit (งานรอเดียวต่อคิว) ไม่ถือ lock ของ unique key ไว้ระหว่าง transaction สต็อก
+        transaction.on_commit(_schedule_stock_alerts)
+    return events
+
+
+def _schedule_stock_alerts():
+    enqueue('pets.process_stock_alerts', unique_key='process_stock_alerts')
+
+
+def process_stock_alerts(batch_size=500, window=None):
+    """ประมวลผลเหตุการณ์ที่ค้างอยู่หนึ่ง batch เป็น StockNotification ถึงเจ้าของสัตว์เลี้ยง
+
+    ใช้จำนวน query คงที่ต่อ batch: เหตุการณ์ของสัตว์เลี้ยงตัวเดียวกันรวมเป็นรายการเดียว (สถานะล่าสุด)
+    และถ้ามีการแจ้งเตือนที่ยังไม่อ่านของตัวนั้นภายใน window (วินาที) จะอัพเดทรายการเดิมแทนการสร้างใหม่
+    สัตว์เลี้ยงที่กลับมามีสต็อกแล้วหรือไม่พร้อมขายจะถูกข้าม
+    คืนค่า {'events', 'created', 'coalesced', 'skipped'}
+    """
+    if window is None:
+        window = settings.STOCK_ALERT_COALESCE_SECONDS
+    result = {'events': 0, 'created': 0, 'coalesced': 0, 'skipped': 0}
+    with transaction.atomic():
+        # หลาย worker บน PostgreSQL ไม่แย่ง batch เดียวกัน (SQLite ไม่มี row lock - ควรรัน worker เดียว)
+        events = list(
+            StockAlertEvent.objects.select_for_update(skip_locked=True)
+            .filter(processed_at__isnull=True).order_by('id')[:batch_size]
+        )
+        if not events:
+            return result
+        now = timezone.now()
+        latest = {}
+        counts = {}
+        for event in events:
+            latest[event.pet_id] = event
+            counts[event.pet_id] = counts.get(event.pet_id, 0) + 1
+
+        pets = Pet.objects.only(
+            'name', 'stock_quantity', 'min_stock_threshold', 'is_available', 'created_by'
+        ).in_bulk(list(latest))
+        pending = {}
+        for notification in StockNotification.objects.filter(
+            pet_id__in=list(latest), read_at__isnull=True, created_at__gte=now - timedelta(seconds=window)
+        ).order_by('created_at'):
+            pending[notification.pet_id] = notification
+
+        created, coalesced = [], []
+        for pet_id, event in latest.items():
+            pet = pets.get(pet_id)
+            if pet is None or not pet.is_available or pet.stock_status == 'in_stock':
+                result['skipped'] += 1
+                continue
+            notification = pending.get(pet_id)
+            if notification is None:
+                notification = StockNotification(recipient_id=pet.created_by_id, pet_id=pet_id, event_count=0)
+                created.append(notification)
+            else:
+                coalesced.append(notification)
+            notification.level = pet.stock_status
+            notification.stock_quantity = pet.stock_quantity
+            notification.message = f'{pet.name}: {pet.get_stock_warning()}'
+            notification.event_count += counts[pet_id]
+            notification.updated_at = now
+
+        StockNotification.objects.bulk_create(created)
+        StockNotification.objects.bulk_update(
+            coalesced, ['level', 'stock_quantity', 'message', 'event_count', 'updated_at']
+        )
+        StockAlertEvent.objects.filter(pk__in=[event.pk for event in events]).update(processed_at=now)
+
+    result.update(events=len(events), created=len(created), coalesced=len(coalesced))
+    return result
+
+
+def prune_stock_alerts(before):
+    """ลบเหตุการณ์ที่ประมวลผลแล้วก่อนเวลา before คืนค่าจำนวนที่ลบ"""
+    return StockAlertEvent.objects.filter(processed_at__lt=before).delete()[0]
+
+
+# ---------------------------------------------------------------------------
+# ปรับสต็อกหลายรายการ (bulk)
+# ---------------------------------------------------------------------------
+
+STOCK_SET = 'set'            # กำหนดจำนวนใหม่
+STOCK_INCREASE = 'increase'  # เพิ่มสต็อก
+STOCK_REDUCE = 'reduce'      # ลดสต็อก
+STOCK_OPS = (STOCK_SET, STOCK_INCREASE, STOCK_REDUCE)
+BULK_STOCK_MAX_ITEMS = 1000
+
+
+class StockError(Exception):
+    """ปรับสต็อกทั้งชุดไม่สำเร็จ"""
+
+
+def _parse_stock_item(item):
+    """คืนค่า (pet_id, op, quantity) หรือข้อความ error"""
+    if not isinstance(item, dict):
+        return 'รูปแบบรายการไม่ถูกต้อง'
+    op = item.get('op', STOCK_INCREASE)
+    if op not in STOCK_OPS:
+        return f'op ต้องเป็นหนึ่งใน {", ".join(STOCK_OPS)}'
+    try:
+        pet_id = int(item['pet_id'])
+        quantity = int(item['quantity'])
+    except (KeyError, TypeError, ValueError):
+        return 'pet_id และ quantity ต้องเป็นตัวเลข'
+    if op == STOCK_SET and quantity < 0:
+        return 'จำนวนสต็อกต้องไม่ต่ำกว่า 0'
+    if op != STOCK_SET and quantity <= 0:
+        return 'จำนวนต้องมากกว่า 0'
+    return pet_id, op, quantity
+
+
+def read_stock_csv(file):
+    """อ่านไฟล์ CSV (header: pet_id,quantity[,op]) เป็นรายการสำหรับ bulk_adjust_stock
+
+    ไม่ระบุ op ถือเป็นการเพิ่มสต็อก (รับสินค้าเข้าคลัง)
+    """
+    content = file.read()
+    if isinstance(content, bytes):
+        content = content.decode('utf-8-sig')
+    reader = csv.DictReader(io.StringIO(content))
+    if not reader.fieldnames or not {'pet_id', 'quantity'} <= {name.strip() for name in reader.fieldnames}:
+        raise StockError('ไฟล์ CSV ต้องมีคอลัมน์ pet_id และ quantity')
+    items = []
+    for row in reader:
+        row = {(key or '').strip(): (value or '').strip() for key, value in row.items()}
+        items.append({
+            'pet_id': row['pet_id'],
+            'quantity': row['quantity'],
+            'op': row.get('op') or STOCK_INCREASE,
+        })
+    return items
+
+
+def bulk_adjust_stock(user, items):
+    """ปรับสต็อกหลายรายการใน transaction เดียว คืนค่าผลลัพธ์ทีละรายการตามลำดับ
+
+    ใช้จำนวน query คงที่: โหลดสัตว์เลี้ยงที่ผู้ใช้มีสิทธิ์ทั้งหมดใน query เดียว จำลองผลทีละรายการ
+    ในหน่วยความจำ (รายการที่ผิดพลาดถูกข้าม) แล้วเขียนด้วย UPDATE เดียว (apply_stock_changes)
+    และบันทึก movement ทีละรายการด้วย bulk_create user=None คือไม่ตรวจสิทธิ์ (ผู้ดูแลระบบ)
+    """
+    if len(items) > BULK_STOCK_MAX_ITEMS:
+        raise StockError(f'ปรับสต็อกได้ไม่เกิน {BULK_STOCK_MAX_ITEMS} รายการต่อครั้ง')
+
+    parsed = [_parse_stock_item(item) for item in items]
+    pet_ids = {entry[0] for entry in parsed if isinstance(entry, tuple)}
+
+    with transaction.atomic():
+        pets = Pet.objects.select_for_update()
+        if user is not None and user.is_seller():
+            # ตรวจความเป็นเจ้าของทุกรายการใน query เดียว
+            pets = pets.filter(created_by=user)
+        pets = pets.in_bulk(pet_ids)
+        # สถานะต่อสัตว์เลี้ยง: สต็อกจำลอง, ค่าที่ set ล่าสุด, ผลรวมที่เพิ่ม/ลดหลังจากนั้น, สต็อกขั้นต่ำที่ต้องมี
+        plans = {}
+        results = []
+        movements = []
+        for index, entry in enumerate(parsed):
+            result = {'index': index}
+            if isinstance(entry, str):
+                results.append({**result, 'success': False, 'error': entry})
+                continue
+            pet_id, op, quantity = entry
+            result.update({'pet_id': pet_id, 'op': op, 'quantity': quantity})
+            pet = pets.get(pet_id)
+            if pet is None:
+                results.append({**result, 'success': False, 'error': 'ไม่พบสัตว์เลี้ยง หรือคุณไม่มีสิทธิ์จัดการสต็อก'})
+                continue
+
+            plan = plans.setdefault(pet_id, {'stock': pet.stock_quantity, 'set': None, 'delta': 0, 'floor': 0})
+            if op == STOCK_REDUCE and plan['stock'] < quantity:
+                results.append({**result, 'success': False,
+                                'error': f'สต็อกไม่พอ! มีเพียง {plan["stock"]} ตัว'})
+                continue
+            if op == STOCK_SET:
+                plan.update(stock=quantity, set=quantity, delta=0)
+                movements.append(StockMovement(
+                    pet_id=pet_id, kind=StockMovement.COUNT, quantity=quantity, created_by=user
+                ))
+            else:
+                change = quantity if op == STOCK_INCREASE else -quantity
+                plan['stock'] += change
+                plan['delta'] += change
+                if plan['set'] is None:
+                    plan['floor'] = max(plan['floor'], -plan['delta'])
+                movements.append(StockMovement(
+                    pet_id=pet_id, kind=StockMovement.RESTOCK if change > 0 else StockMovement.ADJUST,
+                    quantity=change, created_by=user
+                ))
+            results.append({**result, 'success': True})
+
+        changed = {pet_id: plan for pet_id, plan in plans.items() if plan['set'] is not None or plan['delta']}
+        updated = apply_stock_changes(
+            deltas={pet_id: plan['delta'] for pet_id, plan in changed.items() if plan['set'] is None},
+            absolutes={pet_id: plan['set'] + plan['delta'] for pet_id, plan in changed.items()
+                       if plan['set'] is not None},
+            floors={pet_id: plan['floor'] for pet_id, plan in changed.items()},
+        )
+        if updated != len(changed):
+            # มีการหักสต็อกตัดหน้าระหว่างปรับ - rollback ทั้งชุด
+            raise StockError('สต็อกมีการเปลี่ยนแปลงระหว่างปรับ กรุณาลองใหม่อีกครั้ง')
+        record_movements(movements)
+        enqueue_stock_alerts(
+            (pet_id, pets[pet_id].stock_quantity, plan['stock'], pets[pet_id].min_stock_threshold)
+            for pet_id, plan in changed.items()
+        )
+        catalog_cache.invalidate_pets((pet_id, pets[pet_id].category_id) for pet_id in changed)
+
+        stock = dict(Pet.objects.filter(pk__in=plans).values_list('id', 'stock_quantity'))
+
+    for result in results:
+        if result['success']:
+            result['stock_quantity'] = stock[result['pet_id']]
+    return results
@@ -0,0 +1,88 @@
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from .models import Pet, Category
+from . import cache as catalog_cache
+from . import search
+from . import tasks
+from jobs.services import enqueue
+
+# ฟิลด์ของ Pet ที่อยู่ใน search index
+INDEXED_FIELDS = {'name', 'description', 'category'}
+
+
+@receiver(post_init, sender=Pet)
+def remember_category(sender, instance, **kwargs):
+    """จำหมวดหมู่เดิมไว้ เพื่อล้าง cache ของหมวดหมู่เก่าเมื่อย้ายหมวดหมู่"""
+    instance._loaded_category_id = instance.__dict__.get('category_id')
+
+
+@receiver(post_init, sender=Pet)
+def remember_image(sender, instance, **kwargs):
+    """จำชื่อไฟล์รูปที่โหลดมา เพื่อสร้างรูปย่อใหม่เฉพาะเมื่อมีการอัพโหลด"""
+    image = instance.__dict__.get('image')
+    instance._loaded_image = getattr(image, 'name', image) or ''
+
+
+@receiver(post_init, sender=Pet)
+def remember_stock(sender, instance, **kwargs):
+    """จำสต็อกที่โหลดมา เพื่อให้ Pet.save() รู้ว่ามีการแก้ stock_quantity หรือไม่"""
+    instance._loaded_stock = instance.__dict__.get('stock_quantity')
+
+
+@receiver(post_save, sender=Pet)
+@receiver(post_delete, sender=Pet)
+def pet_changed(sender, instance, **kwargs):
+    catalog_cache.invalidate_pet(
+        instance.pk, instance.category_id, getattr(instance, '_loaded_category_id', None)
+    )
+    instance._loaded_category_id = instance.category_id
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_changed(sender, instance, **kwargs):
+    catalog_cache.invalidate_category(instance.pk)
+
+
+@receiver(post_save, sender=Pet)
+def index_pet(sender, instance, raw=False, update_fields=None, **kwargs):
+    """อัพเดท search index เมื่อบันทึกสัตว์เลี้ยง"""
+    if raw:
+        return
+    if update_fields and not INDEXED_FIELDS & set(update_fields):
+        return
+    search.index_pet(instance)
+
+
+@receiver(post_save, sender=Pet)
+def schedule_pet_images(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    """รูปเปลี่ยน: ล้างรูปย่อของรูปเดิม แล้วให้ worker สร้างของรูปใหม่หลัง commit"""
+    if raw or (update_fields and 'image' not in update_fields) or 'image' not in instance.__dict__:
+        return
+    image = instance.image.name or ''
+    if image == instance._loaded_image and not created:
+        return
+    instance._loaded_image = image
+    if instance.image_variants:
+        instance.image_variants = {}
+        Pet.objects.filter(pk=instance.pk).update(image_variants={})
+    if image:
+        transaction.on_commit(
+            lambda: enqueue(tasks.generate_pet_images, [instance.pk], unique_key=f'pet_images:{instance.pk}')
+        )
+
+
+@receiver(post_delete, sender=Pet)
+def unindex_pet(sender, instance, **kwargs):
+    search.remove_pet(instance.pk)
+
+
+@receiver(post_save, sender=Category)
+def reindex_category(sender, instance, created=False, raw=False, **kwargs):
+    """ชื่อหมวดหมู่อยู่ใน index ด้วย จึงต้อง index สัตว์เลี้ยงในหมวดหมู่ใหม่เมื่อแก้ไข (ทำใน worker)"""
+    if created or raw:
+        return
+    transaction.on_commit(
+        lambda: enqueue(tasks.reindex_category, [instance.pk], unique_key=f'reindex_category:{instance.pk}')
+    )
@@ -0,0 +1,27 @@
+from jobs.services import task
+from . import images, search
+from .models import Category, Pet
+from .services import process_stock_alerts as process_stock_alert_batch
+
+
+@task
+def reindex_category(category_id):
+    """index สัตว์เลี้ยงทุกตัวในหมวดหมู่ใหม่หลังเปลี่ยนชื่อ (ช้าตามจำนวนสัตว์เลี้ยงในหมวดหมู่)"""
+    category = Category.objects.filter(pk=category_id).first()
+    if category is not None:
+        search.reindex_category(category)
+
+
+@task
+def generate_pet_images(pet_id):
+    """สร้างรูปย่อ WebP/JPEG ของรูปที่อัพโหลด (ใช้ CPU - เหมาะกับ run_worker --pool process)"""
+    pet = Pet.objects.only('image', 'category_id').filter(pk=pet_id).first()
+    if pet is not None:
+        images.generate_pet_images(pet)
+
+
+@task
+def process_stock_alerts(batch_size=500):
+    """สร้างการแจ้งเตือนจากเหตุการณ์สต็อกต่ำที่ค้างอยู่ทั้งหมด"""
+    while process_stock_alert_batch(batch_size=batch_size)['events'] == batch_size:
+        pass
@@ -1,3 +1,786 @@
-from django.test import TestCase
+import json
+import re
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from PIL import Image
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from jobs.models import Job
+from jobs.services import work_off
+from petstore_project.middleware import QueryBudgetExceeded, QueryRecorder
+from petstore_project.urls import async_catalog_urlpatterns, urlpatterns
+from users.models import CustomUser
+from . import cache as catalog_cache, search
+from .models import Pet, Category, StockAlertEvent, StockMovement, StockNotification, stock_annotations
+from .serializers import PetListRowSerializer, PetListSerializer
+from .services import bulk_adjust_stock, ledger_stock, process_stock_alerts, reconcile_stock, snapshot_stock
+
+
+def create_pet(stock_quantity=10, **kwargs):
+    seller = CustomUser.objects.create_user(
+        username=kwargs.pop('username', 'seller'),
+        email=kwargs.pop('email', 'seller@example.com'),
+        password='password',
+        role='seller'
+    )
+    category = Category.objects.create(name=kwargs.pop('category_name', 'Dogs'))
+    return Pet.objects.create(
+        name=kwargs.pop('name', 'Buddy'),
+        description='Good dog',
+        category=category,
+        price=kwargs.pop('price', 100),
+        gender='M',
+        stock_quantity=stock_quantity,
+        created_by=seller,
+        **kwargs
+    )
+
+
+class StockEngineTests(TestCase):
+    def test_reduce_stock_is_conditional(self):
+        pet = create_pet(stock_quantity=3)
+        self.assertTrue(pet.reduce_stock(2))
+        self.assertEqual(pet.stock_quantity, 1)
+        self.assertFalse(pet.reduce_stock(2))
+        self.assertEqual(Pet.objects.get(pk=pet.pk).stock_quantity, 1)
+
+    def test_stale_instance_cannot_oversell(self):
+        pet = create_pet(stock_quantity=1)
+        stale = Pet.objects.get(pk=pet.pk)
+        self.assertTrue(pet.reduce_stock(1))
+        # stale ยังเห็น stock_quantity=1 แต่ UPDATE แบบมีเงื่อนไขต้องไม่ผ่าน
+        self.assertFalse(stale.reduce_stock(1))
+        self.assertEqual(stale.stock_quantity, 0)
+
+    def test_increase_stock_does_not_overwrite_other_fields(self):
+        pet = create_pet(stock_quantity=1)
+        stale = Pet.objects.get(pk=pet.pk)
+        Pet.objects.filter(pk=pet.pk).update(name='Renamed')
+        self.assertTrue(stale.increase_stock(4))
+        pet.refresh_from_db()
+        self.assertEqual(pet.stock_quantity, 5)
+        self.assertEqual(pet.name, 'Renamed')
+
+
+class StockStressTests(TransactionTestCase):
+    def test_concurrent_reduce_stock_never_oversells(self):
+        pet = create_pet(stock_quantity=40)
+        out = StringIO()
+        call_command('stock_stress', pet_id=pet.pk, threads=8, attempts=10, stdout=out)
+        report = json.loads(out.getvalue())
+
+        pet.refresh_from_db()
+        self.assertGreaterEqual(pet.stock_quantity, 0)
+        self.assertEqual(report['oversold'], 0)
+        self.assertTrue(report['consistent'])
+        self.assertEqual(report['success'] + pet.stock_quantity, 40)
+
+
+class KeysetPaginationTests(TestCase):
+    def test_pet_list_is_cursor_paginated(self):
+        pet = create_pet()
+        for i in range(4):
+            Pet.objects.create(
+                name=f'Pet {i}', description='', category=pet.category, price=10,
+                gender='F', created_by=pet.created_by
+            )
+
+        seen = []
+        url = '/api/pets/pets/?page_size=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 2)
+            self.assertNotIn('count', response.data)
+            seen.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+
+        self.assertEqual(sorted(seen), sorted(Pet.objects.values_list('id', flat=True)))
+
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        catalog_cache.get_cache().clear()
+        self.pet = create_pet(stock_quantity=5)
+
+    def test_pet_list_served_from_cache_until_pet_changes(self):
+        self.client.get('/pets/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/pets/')
+        self.assertContains(response, 'Buddy')
+        self.assertGreaterEqual(catalog_cache.get_stats()['hits'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pet.name = 'Max'
+            self.pet.save()
+        self.assertContains(self.client.get('/pets/'), 'Max')
+
+    def test_stock_change_invalidates_detail_and_other_category_stays_cached(self):
+        other = Category.objects.create(name='Cats')
+        self.client.get(f'/pets/?category={other.pk}')
+        self.client.get(f'/pets/{self.pet.pk}/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pet.reduce_stock(2)
+        with self.assertNumQueries(0):
+            self.client.get(f'/pets/?category={other.pk}')
+        response = self.client.get(f'/pets/{self.pet.pk}/')
+        self.assertEqual(response.context['pet'].stock_quantity, 3)
+
+
+class PetSearchTests(TestCase):
+    def setUp(self):
+        self.pet = create_pet(name='Golden Retriever', category_name='สุนัข')
+        Pet.objects.create(
+            name='Siamese', description='แมวขี้เล่น ชอบ golden fish', category=Category.objects.create(name='แมว'),
+            price=10, gender='F', created_by=self.pet.created_by
+        )
+
+    def assert_search_backend(self):
+        self.assertEqual(search.search_pet_ids('gold')[0], self.pet.pk)
+        self.assertEqual(len(search.search_pet_ids('gold')), 2)
+        self.assertEqual(search.search_pet_ids('สุนั'), [self.pet.pk])
+        self.assertEqual(search.search_pet_ids('gold แมว'), [self.pet.pk + 1])
+        self.assertEqual(search.search_pet_ids('nothing'), [])
+
+    def test_fts_search_ranks_name_matches_first(self):
+        self.assertTrue(search.uses_fts())
+        self.assert_search_backend()
+
+    def test_inverted_index_fallback(self):
+        with mock.patch.object(search, 'uses_fts', return_value=False):
+            search.rebuild_index()
+            self.assert_search_backend()
+
+    def test_index_follows_category_rename(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pet.category.name = 'Canine'
+            self.pet.category.save()
+        # index ใหม่ใน worker
+        self.assertEqual(search.search_pet_ids('canin'), [])
+        self.assertEqual(work_off(), {'done': 1})
+        self.assertEqual(search.search_pet_ids('canin'), [self.pet.pk])
+
+    def test_search_action(self):
+        response = self.client.get('/api/pets/pets/search/?q=retr')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.data['results']], [self.pet.pk])
+
+
+class HotQueryPlanTests(TestCase):
+    def test_hot_queries_use_indexes(self):
+        out = StringIO()
+        call_command('explain_hot_queries', stdout=out)
+        self.assertNotIn('FULL SCAN', out.getvalue())
+
+    def test_unbounded_index_scan_fails(self):
+        queries = {
+            # เรียงตาม index แต่เงื่อนไขสต็อกไม่อยู่ใน index - ต้องไล่อ่านจนกว่าจะได้ครบ LIMIT
+            'pets.residual_filter': lambda: Pet.objects.filter(
+                is_available=True, stock_quantity__gt=5
+            ).order_by('-created_at', 'id')[:21],
+            # ไม่มี LIMIT - อ่าน index ทั้งก้อน
+            'pets.no_limit': lambda: Pet.objects.filter(is_available=True).order_by('-created_at'),
+        }
+        out = StringIO()
+        with mock.patch('pets.management.commands.explain_hot_queries.get_hot_queries', return_value=queries):
+            with self.assertRaisesMessage(CommandError, '2 hot query'):
+                call_command('explain_hot_queries', stdout=out)
+        self.assertIn('FULL SCAN  pets.residual_filter (pets_pet (pet_available_recent_idx))', out.getvalue())
+
+
+class QueryInspectorTests(TestCase):
+    def setUp(self):
+        catalog_cache.get_cache().clear()
+        self.pet = create_pet()
+
+    @override_settings(QUERY_INSPECTOR={'ENABLED': True, 'RAISE': True, 'BUDGETS': {'pet_list': 0}})
+    def test_budget_exceeded_raises(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get('/pets/')
+
+    @override_settings(QUERY_INSPECTOR={'ENABLED': True, 'RAISE': True})
+    def test_query_count_header(self):
+        response = self.client.get('/pets/')
+        self.assertGreater(int(response['X-Query-Count']), 0)
+
+    def test_repeated_queries_are_reported_with_template_line(self):
+        for i in range(5):
+            Pet.objects.create(
+                name=f'Pet {i}', description='', category=self.pet.category, price=10,
+                gender='F', created_by=self.pet.created_by
+            )
+        template = Template('{% for pet in pets %}{{ pet.category.name }}{% endfor %}')
+        template.origin.template_name = 'inline.html'
+        recorder = QueryRecorder(threshold=5)
+        with connection.execute_wrapper(recorder):
+            template.render(Context({'pets': Pet.objects.all()}))
+        (sql, count, location), = recorder.repeated
+        self.assertIn('pets_category', sql)
+        self.assertEqual(count, 6)
+        self.assertEqual(location, 'inline.html:1')
+
+
+class LeanListSerializerTests(TestCase):
+    def test_row_serializer_matches_model_serializer(self):
+        pet = create_pet(stock_quantity=1, min_stock_threshold=2, image='pets/buddy.jpg')
+        request = RequestFactory().get('/api/pets/pets/')
+        row = PetListRowSerializer.project(Pet.objects.filter(pk=pet.pk)).get()
+        lean = PetListRowSerializer(row, context={'request': request}).data
+        full = PetListSerializer(pet, context={'request': request}).data
+
+        self.assertEqual({key: lean[key] for key in full}, dict(full))
+        self.assertEqual(lean['stock_status'], pet.stock_status)
+        self.assertEqual(lean['is_low_stock'], pet.is_low_stock)
+
+    def test_stock_annotations_match_properties(self):
+        pet = create_pet(stock_quantity=0, min_stock_threshold=2)
+        for stock in (0, 1, 2, 3):
+            Pet.objects.filter(pk=pet.pk).update(stock_quantity=stock)
+            pet.refresh_from_db()
+            row = Pet.objects.filter(pk=pet.pk).annotate(**stock_annotations()).values(
+                'stock_status', 'is_low_stock'
+            ).get()
+            self.assertEqual(row, {'stock_status': pet.stock_status, 'is_low_stock': pet.is_low_stock})
+
+    def test_list_uses_single_query(self):
+        pet = create_pet()
+        for i in range(5):
+            Pet.objects.create(
+                name=f'Pet {i}', description='', category=pet.category, price=10,
+                gender='F', created_by=pet.created_by
+            )
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/pets/pets/')
+        self.assertEqual(len(response.data['results']), 6)
+        self.assertIn('stock_status', response.data['results'][0])
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        catalog_cache.get_cache().clear()
+        self.pet = create_pet(stock_quantity=5)
+
+    def revalidate(self, url):
+        self.client.get(url)  # หน้า HTML ครั้งแรกตั้ง csrf cookie ซึ่งเป็นส่วนหนึ่งของ ETag
+        etag = self.client.get(url).headers['ETag']
+        return etag, self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_check_stock_returns_304_until_stock_changes(self):
+        url = f'/api/pets/pets/{self.pet.pk}/check_stock/'
+        etag = self.client.get(url).headers['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pet.reduce_stock(1)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['stock_quantity'], 4)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_validator_is_a_single_aggregate_when_cache_is_cold(self):
+        for url in ('/api/pets/pets/', '/api/pets/pets/stock_status/', '/api/pets/pets/available_pets/',
+                    f'/api/pets/pets/{self.pet.pk}/'):
+            etag = self.client.get(url).headers['ETag']
+            catalog_cache.get_cache().clear()
+            with self.assertNumQueries(1):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304, url)
+            self.assertIn('Last-Modified', response.headers)
+
+    def test_html_catalog_pages_revalidate(self):
+        for url in ('/', '/pets/', f'/pets/?category={self.pet.category_id}', f'/pets/{self.pet.pk}/',
+                    '/categories/'):
+            etag, response = self.revalidate(url)
+            self.assertEqual(response.status_code, 304, url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pet.category.name = 'Puppies'
+            self.pet.category.save()
+        response = self.client.get('/pets/', HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Puppies')
+
+    def test_html_etag_differs_per_viewer(self):
+        anonymous_etag = self.client.get('/pets/').headers['ETag']
+        self.client.force_login(self.pet.created_by)
+        response = self.client.get('/pets/', HTTP_IF_NONE_MATCH=anonymous_etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class StockStatusEndpointTests(TestCase):
+    def setUp(self):
+        catalog_cache.get_cache().clear()
+        self.pet = create_pet(stock_quantity=0, min_stock_threshold=2)
+        self.cats = Category.objects.create(name='Cats')
+        for i, stock in enumerate((1, 2, 3, 50)):
+            Pet.objects.create(
+                name=f'Cat {i}', description='', category=self.cats, price=10, gender='F',
+                stock_quantity=stock, min_stock_threshold=2, created_by=self.pet.created_by
+            )
+
+    def test_rows_read_in_one_query_with_cached_summary(self):
+        self.client.get('/api/pets/pets/stock_status/')
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/pets/pets/stock_status/')
+        self.assertEqual(
+            (response.data['count'], response.data['available_pets'],
+             response.data['out_of_stock_pets'], response.data['low_stock_pets']),
+            (5, 4, 1, 2)
+        )
+        pets = Pet.objects.in_bulk()
+        for row in response.data['results']:
+            pet = pets[row['id']]
+            self.assertEqual(row['stock_status'], pet.stock_status_display)
+            self.assertEqual(row['is_out_of_stock'], pet.is_out_of_stock)
+            self.assertEqual(row['category_name'], pet.category.name)
+
+    def test_filter_by_category_and_page(self):
+        url = f'/api/pets/pets/stock_status/?category={self.cats.pk}&page_size=3'
+        response = self.client.get(url)
+        self.assertEqual(response.data['count'], 4)
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertEqual({row['category_name'] for row in response.data['results']}, {'Cats'})
+        next_page = self.client.get(response.data['next'])
+        self.assertEqual(len(next_page.data['results']), 1)
+
+        self.assertEqual(self.client.get('/api/pets/pets/stock_status/?category=x').status_code, 400)
+
+
+class BulkStockTests(TestCase):
+    def setUp(self):
+        self.pet = create_pet(stock_quantity=5)
+        self.seller = self.pet.created_by
+        self.other = Pet.objects.create(
+            name='Max', description='', category=self.pet.category, price=10, gender='M',
+            stock_quantity=5, created_by=self.seller
+        )
+        foreign = create_pet(username='other', email='other@example.com', category_name='Cats')
+        self.foreign = foreign
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(self.seller).access_token}'}
+
+    def post(self, items):
+        return self.client.post(
+            '/api/pets/pets/bulk_stock/', {'items': items}, content_type='application/json', **self.auth
+        )
+
+    def test_applies_items_in_order_with_per_item_results(self):
+        response = self.post([
+            {'pet_id': self.pet.pk, 'op': 'set', 'quantity': 10},
+            {'pet_id': self.pet.pk, 'op': 'reduce', 'quantity': 3},
+            {'pet_id': self.other.pk, 'op': 'increase', 'quantity': 2},
+            {'pet_id': self.other.pk, 'op': 'reduce', 'quantity': 100},
+            {'pet_id': self.foreign.pk, 'op': 'increase', 'quantity': 1},
+            {'pet_id': self.pet.pk, 'op': 'explode', 'quantity': 1},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r['success'] for r in response.data['results']], [True, True, True, False, False, False])
+        self.assertEqual((response.data['updated'], response.data['failed']), (3, 3))
+        self.assertEqual(response.data['results'][0]['stock_quantity'], 7)
+        self.pet.refresh_from_db()
+        self.other.refresh_from_db()
+        self.foreign.refresh_from_db()
+        self.assertEqual((self.pet.stock_quantity, self.other.stock_quantity, self.foreign.stock_quantity), (7, 7, 10))
+
+    def test_query_count_does_not_grow_with_items(self):
+        def count_queries(items):
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.post(items).status_code, 200)
+            return len(queries)
+
+        small = count_queries([{'pet_id': self.pet.pk, 'op': 'increase', 'quantity': 1}])
+        large = count_queries([{'pet_id': pet_id, 'op': 'increase', 'quantity': 1}
+                               for pet_id in [self.pet.pk, self.other.pk] * 50])
+        self.assertEqual(small, large)
+
+    def test_concurrent_stock_change_rejects_batch(self):
+        # จำลองว่ามี checkout หักสต็อกตัดหน้า: UPDATE แบบมีเงื่อนไขไม่พบแถวที่ตรง
+        with mock.patch('django.db.models.query.QuerySet.update', return_value=0):
+            response = self.post([{'pet_id': self.pet.pk, 'op': 'reduce', 'quantity': 2}])
+        self.assertEqual(response.status_code, 400)
+        self.pet.refresh_from_db()
+        self.assertEqual(self.pet.stock_quantity, 5)
+
+    def test_csv_upload_and_import_command(self):
+        csv_file = SimpleUploadedFile(
+            'stock.csv', f'pet_id,quantity,op\n{self.pet.pk},4,\n{self.other.pk},1,set\n'.encode('utf-8')
+        )
+        response = self.client.post('/api/pets/pets/bulk_stock/', {'file': csv_file}, **self.auth)
+        self.assertEqual(response.data['updated'], 2)
+        self.pet.refresh_from_db()
+        self.assertEqual(self.pet.stock_quantity, 9)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = f'{directory}/stock.csv'
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(f'pet_id,quantity\n{self.pet.pk},1\n{self.foreign.pk},1\nabc,1\n')
+            report = json.loads(call_command('import_stock', path, seller=self.seller.username, stdout=StringIO()))
+        self.assertEqual(report['updated'], 1)
+        self.assertEqual([error['line'] for error in report['errors']], [3, 4])
+
+
+class StockLedgerTests(TestCase):
+    def setUp(self):
+        self.pet = create_pet(stock_quantity=10)
+
+    def ledger(self):
+        return list(self.pet.stock_movements.values_list('kind', 'quantity'))
+
+    def test_every_stock_change_is_recorded(self):
+        self.pet.reduce_stock(3)
+        self.pet.increase_stock(2)
+        self.pet.set_stock(20)
+        self.assertFalse(self.pet.reduce_stock(50))
+        self.assertEqual(self.ledger(), [
+            (StockMovement.INITIAL, 10), (StockMovement.ADJUST, -3),
+            (StockMovement.RESTOCK, 2), (StockMovement.COUNT, 20),
+        ])
+        self.assertEqual(reconcile_stock(), [])
+
+    def test_save_without_stock_change_does_not_overwrite_stock(self):
+        stale = Pet.objects.get(pk=self.pet.pk)
+        self.pet.reduce_stock(4)
+        stale.name = 'Renamed'
+        stale.save()
+        self.pet.refresh_from_db()
+        self.assertEqual((self.pet.name, self.pet.stock_quantity), ('Renamed', 6))
+
+        # แก้สต็อกตรงๆ ผ่าน save() (เช่น admin) ลงบัญชีเป็นยอดนับใหม่
+        self.pet.stock_quantity = 8
+        self.pet.save()
+        self.assertEqual(self.ledger()[-1], (StockMovement.COUNT, 8))
+        self.assertEqual(reconcile_stock(), [])
+
+    def test_reconcile_finds_and_fixes_drift(self):
+        self.pet.reduce_stock(1)
+        Pet.objects.filter(pk=self.pet.pk).update(stock_quantity=99)
+        with self.assertNumQueries(1):
+            self.assertEqual(reconcile_stock(), [(self.pet.pk, 99, 9)])
+
+        report = json.loads(call_command('reconcile_stock', fix=True, stdout=StringIO()))
+        self.assertEqual(report['mismatched'], 1)
+        self.pet.refresh_from_db()
+        self.assertEqual(self.pet.stock_quantity, 9)
+        self.assertEqual(reconcile_stock(), [])
+
+    def test_snapshot_compacts_ledger(self):
+        for _ in range(5):
+            self.pet.reduce_stock(1)
+        out = StringIO()
+        call_command('snapshot_stock', prune_days=0, stdout=out)
+        self.assertEqual(json.loads(out.getvalue()), {'snapshots': 1, 'pruned': 6})
+        self.assertEqual(self.ledger(), [(StockMovement.SNAPSHOT, 5)])
+
+        self.pet.increase_stock(3)
+        self.assertEqual(ledger_stock(Pet.objects.filter(pk=self.pet.pk)).get().ledger_stock, 8)
+        self.assertEqual(reconcile_stock(), [])
+
+
+class StockAlertTests(TestCase):
+    def setUp(self):
+        self.pet = create_pet(stock_quantity=10, min_stock_threshold=3)
+        self.seller = self.pet.created_by
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(self.seller).access_token}'}
+
+    def events(self):
+        return list(StockAlertEvent.objects.values_list('level', 'stock_quantity'))
+
+    def test_only_threshold_crossings_are_enqueued(self):
+        self.pet.reduce_stock(5)   # 5 ยังพร้อมขาย
+        self.pet.reduce_stock(2)   # 3 ข้ามเส้นสต็อกต่ำ
+        self.pet.reduce_stock(1)   # 2 ยังต่ำอยู่ ไม่ซ้ำ
+        self.pet.increase_stock(1)
+        self.pet.reduce_stock(3)   # 0 หมด
+        self.assertEqual(self.events(), [('low_stock', 3), ('out_of_stock', 0)])
+
+        # ตรวจนับ / แก้ผ่าน save() / bulk ก็ข้ามเส้นได้
+        StockAlertEvent.objects.all().delete()
+        self.pet.set_stock(10)
+        self.pet.set_stock(2)
+        pet = Pet.objects.get(pk=self.pet.pk)
+        pet.stock_quantity = 0
+        pet.save()
+        # bulk เทียบยอดก่อนกับยอดสุดท้ายของทั้งชุด (0 -> 2 ดีขึ้น ไม่แจ้งเตือน)
+        bulk_adjust_stock(self.seller, [{'pet_id': self.pet.pk, 'quantity': 10, 'op': 'set'},
+                                        {'pet_id': self.pet.pk, 'quantity': 8, 'op': 'reduce'}])
+        bulk_adjust_stock(self.seller, [{'pet_id': self.pet.pk, 'quantity': 5, 'op': 'increase'}])
+        bulk_adjust_stock(self.seller, [{'pet_id': self.pet.pk, 'quantity': 5, 'op': 'reduce'}])
+        self.assertEqual(self.events(), [('low_stock', 2), ('out_of_stock', 0), ('low_stock', 2)])
+
+    def test_crossing_schedules_one_worker_job(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pet.reduce_stock(7)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pet.reduce_stock(3)
+        self.assertEqual(Job.objects.filter(name='pets.process_stock_alerts', status=Job.QUEUED).count(), 1)
+        self.assertEqual(work_off(), {'done': 1})
+        self.assertEqual(StockNotification.objects.get().event_count, 2)
+
+    def test_failed_decrement_enqueues_nothing(self):
+        self.assertFalse(self.pet.reduce_stock(50))
+        self.assertEqual(self.events(), [])
+
+    def test_worker_coalesces_events_per_pet(self):
+        self.pet.reduce_stock(7)
+        self.pet.reduce_stock(3)
+        other = Pet.objects.create(
+            name='Max', description='', category=self.pet.category, price=10, gender='M',
+            stock_quantity=2, min_stock_threshold=1, created_by=self.seller
+        )
+        other.reduce_stock(1)
+
+        with self.assertNumQueries(7):
+            result = process_stock_alerts()
+        self.assertEqual(result, {'events': 3, 'created': 2, 'coalesced': 0, 'skipped': 0})
+        self.assertFalse(StockAlertEvent.objects.filter(processed_at__isnull=True).exists())
+        notification = StockNotification.objects.get(pet=self.pet)
+        self.assertEqual(
+            (notification.recipient, notification.level, notification.stock_quantity, notification.event_count),
+            (self.seller, 'out_of_stock', 0, 2)
+        )
+        self.assertIn('สินค้าหมดสต็อก', notification.message)
+
+        # เหตุการณ์ใหม่ภายใน window รวมเข้ารายการที่ยังไม่อ่าน
+        self.pet.increase_stock(5)
+        self.pet.reduce_stock(3)
+        result = process_stock_alerts()
+        self.assertEqual((result['created'], result['coalesced']), (0, 1))
+        notification.refresh_from_db()
+        self.assertEqual((notification.level, notification.stock_quantity, notification.event_count),
+                         ('low_stock', 2, 3))
+
+        # อ่านแล้ว หรือเลย window ไปแล้วจะสร้างรายการใหม่
+        notification.read_at = notification.updated_at
+        notification.save()
+        self.pet.reduce_stock(2)
+        self.assertEqual(process_stock_alerts()['created'], 1)
+        self.pet.increase_stock(5)
+        self.pet.reduce_stock(5)
+        self.assertEqual(process_stock_alerts(window=0)['created'], 1)
+        self.assertEqual(StockNotification.objects.filter(pet=self.pet).count(), 3)
+
+    def test_worker_skips_pets_restocked_before_processing(self):
+        self.pet.reduce_stock(8)
+        self.pet.increase_stock(8)
+        out = StringIO()
+        call_command('process_stock_alerts', prune_days=0, stdout=out)
+        self.assertEqual(json.loads(out.getvalue()),
+                         {'events': 1, 'created': 0, 'coalesced': 0, 'skipped': 1, 'pruned': 1})
+        self.assertFalse(StockNotification.objects.exists())
+
+    def test_seller_reads_own_alerts(self):
+        self.pet.reduce_stock(8)
+        foreign = create_pet(username='other', email='other@example.com', category_name='Cats',
+                             min_stock_threshold=3)
+        foreign.reduce_stock(10)
+        process_stock_alerts()
+
+        response = self.client.get('/api/pets/pets/stock_alerts/?unread=1', **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['pet_name'] for row in response.data['results']], ['Buddy'])
+
+        response = self.client.post('/api/pets/pets/stock_alerts/read/', {}, format='json',
+                                    content_type='application/json', **self.auth)
+        self.assertEqual(response.data['updated'], 1)
+        response = self.client.get('/api/pets/pets/stock_alerts/?unread=1', **self.auth)
+        self.assertEqual(response.data['results'], [])
+        self.assertIsNone(StockNotification.objects.get(pet=foreign).read_at)
+
+
+def image_upload(name='dog.png', size=(1200, 900), color=(200, 80, 40, 128)):
+    output = BytesIO()
+    Image.new('RGBA', size, color).save(output, 'PNG')
+    return SimpleUploadedFile(name, output.getvalue(), content_type='image/png')
+
+
+class PetImagePipelineTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.pet = create_pet()
+
+    def upload(self, pet, upload):
+        with self.captureOnCommitCallbacks(execute=True):
+            pet.image = upload
+            pet.save()
+        return pet
+
+    def test_upload_generates_variants_in_worker(self):
+        self.upload(self.pet, image_upload())
+        self.assertEqual(self.pet.image_display_variants['card']['jpeg'], self.pet.image_display)
+        self.assertIsNone(self.pet.image_display_variants['card']['webp'])
+
+        self.assertEqual(work_off(), {'done': 1})
+        self.pet.refresh_from_db()
+        variants = self.pet.image_variants
+        self.assertEqual((variants['thumb']['width'], variants['thumb']['height']), (160, 160))
+        self.assertEqual((variants['card']['width'], variants['card']['height']), (500, 500))
+        self.assertEqual((variants['large']['width'], variants['large']['height']), (800, 600))
+        with Image.open(default_storage.open(variants['card']['webp'])) as webp:
+            self.assertEqual(webp.format, 'WEBP')
+        with Image.open(default_storage.open(variants['card']['jpeg'])) as jpeg:
+            self.assertEqual((jpeg.format, jpeg.mode), ('JPEG', 'RGB'))
+
+        urls = PetListSerializer(self.pet).data['image_variants']
+        self.assertTrue(urls['card']['webp'].endswith('_card.webp'))
+        row = PetListRowSerializer.project(Pet.objects.filter(pk=self.pet.pk)).get()
+        self.assertEqual(PetListRowSerializer(row).data['image_variants'], urls)
+        self.assertContains(self.client.get(f'/pets/{self.pet.pk}/'), urls['large']['webp'])
+
+    def test_variants_are_content_addressed(self):
+        self.upload(self.pet, image_upload('a.png'))
+        other = Pet.objects.create(
+            name='Twin', description='', category=self.pet.category, price=10, gender='M',
+            created_by=self.pet.created_by
+        )
+        self.upload(other, image_upload('b.png'))
+        work_off()
+        self.pet.refresh_from_db()
+        other.refresh_from_db()
+        # รูปเดียวกันใช้ไฟล์รูปย่อชุดเดียว
+        self.assertEqual(self.pet.image_variants, other.image_variants)
+
+        # อัพโหลดรูปใหม่ ล้างรูปย่อเดิมทันทีและได้ชื่อไฟล์ใหม่
+        self.upload(self.pet, image_upload('c.png', color=(0, 0, 255, 255)))
+        self.pet.refresh_from_db()
+        self.assertEqual(self.pet.image_variants, {})
+        work_off()
+        self.pet.refresh_from_db()
+        self.assertNotEqual(self.pet.image_variants['card']['jpeg'], other.image_variants['card']['jpeg'])
+
+    def test_saving_without_new_upload_does_not_enqueue(self):
+        self.upload(self.pet, image_upload())
+        work_off()
+        pet = Pet.objects.get(pk=self.pet.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            pet.name = 'Renamed'
+            pet.save()
+        self.assertFalse(Job.objects.filter(status=Job.QUEUED).exists())
+
+    def test_stale_instance_save_keeps_variants(self):
+        self.upload(self.pet, image_upload())
+        # โหลดไว้ก่อน worker สร้างรูปย่อเสร็จ (image_variants ยังเป็น {})
+        stale = Pet.objects.get(pk=self.pet.pk)
+        work_off()
+        with self.captureOnCommitCallbacks(execute=True):
+            stale.name = 'Renamed'
+            stale.save()
+            stale.stock_quantity = 7
+            stale.save()
+        self.pet.refresh_from_db()
+        self.assertEqual((self.pet.name, self.pet.stock_quantity), ('Renamed', 7))
+        self.assertIn('card', self.pet.image_variants)
+
+    def test_backfill_command(self):
+        self.upload(self.pet, image_upload())
+        Job.objects.all().delete()
+        out = StringIO()
+        call_command('generate_pet_images', stdout=out)
+        self.assertEqual(json.loads(out.getvalue()), {'queued': 1, 'generated': 0, 'skipped': 0})
+
+        out = StringIO()
+        call_command('generate_pet_images', inline=True, stdout=out)
+        self.assertEqual(json.loads(out.getvalue()), {'queued': 0, 'generated': 1, 'skipped': 0})
+        call_command('generate_pet_images', inline=True, stdout=out)
+        self.pet.refresh_from_db()
+        self.assertIn('card', self.pet.image_variants)
+
+    def test_invalid_image_is_skipped(self):
+        self.upload(self.pet, SimpleUploadedFile('broken.png', b'not an image', content_type='image/png'))
+        with self.assertLogs('petstore.images', 'WARNING'):
+            self.assertEqual(work_off(), {'done': 1})
+        self.pet.refresh_from_db()
+        self.assertEqual(self.pet.image_variants, {})
+
+
+class AsyncCatalogUrls:
+    """urlconf เหมือน ASYNC_CATALOG_VIEWS=1"""
+    urlpatterns = async_catalog_urlpatterns + urlpatterns
+
+
+def without_csrf(content):
+    # csrf token ถูก mask ใหม่ทุก response
+    return re.sub(rb'[A-Za-z0-9]{64}', b'', content)
+
+
+class AsyncCatalogViewTests(TestCase):
+    def setUp(self):
+        catalog_cache.get_cache().clear()
+        self.pet = create_pet(stock_quantity=5)
+        self.sold_out = Pet.objects.create(
+            name='Max', description='Sold out', category=self.pet.category, price=50, gender='F',
+            stock_quantity=0, created_by=self.pet.created_by
+        )
+        self.seller_auth = {'Authorization': f'Bearer {RefreshToken.for_user(self.pet.created_by).access_token}'}
+
+    async def get_both(self, url, headers=None):
+        sync_response = await sync_to_async(self.client.get)(url, headers=headers)
+        with override_settings(ROOT_URLCONF=AsyncCatalogUrls):
+            async_response = await self.async_client.get(url, headers=headers)
+        self.assertEqual(async_response.status_code, sync_response.status_code, url)
+        return sync_response, async_response
+
+    async def test_html_pages_match_sync_views(self):
+        for url in ('/', '/pets/', f'/pets/?category={self.pet.category_id}', '/pets/?search=Buddy',
+                    f'/pets/{self.pet.pk}/'):
+            sync_response, async_response = await self.get_both(url)
+            self.assertContains(async_response, 'Buddy')
+            self.assertEqual(without_csrf(async_response.content), without_csrf(sync_response.content), url)
+
+        _, async_response = await self.get_both('/pets/999999/')
+        self.assertEqual(async_response.status_code, 404)
+
+        # ผู้ใช้ที่ login: session และผู้ใช้โหลดใน thread ก่อนใช้ใน view async
+        for client in (self.client, self.async_client):
+            await sync_to_async(client.force_login)(self.pet.created_by)
+        sync_response, async_response = await self.get_both('/pets/')
+        self.assertContains(async_response, self.pet.created_by.username)
+        self.assertEqual(without_csrf(async_response.content), without_csrf(sync_response.content))
+
+    async def test_api_endpoints_match_sync_views(self):
+        for url, headers in (
+            (f'/api/pets/pets/{self.pet.pk}/check_stock/', None),
+            # ลูกค้าไม่เห็นสัตว์เลี้ยงที่หมดสต็อก ผู้ขายเห็น
+            (f'/api/pets/pets/{self.sold_out.pk}/check_stock/', None),
+            (f'/api/pets/pets/{self.sold_out.pk}/check_stock/', self.seller_auth),
+            ('/api/pets/pets/available_pets/', None),
+            ('/api/pets/pets/available_pets/?page_size=1', self.seller_auth),
+            ('/api/pets/pets/available_pets/', {'Authorization': 'Bearer invalid'}),
+        ):
+            sync_response, async_response = await self.get_both(url, headers)
+            self.assertEqual(async_response.content, sync_response.content, url)
+            self.assertEqual(async_response.headers.get('ETag'), sync_response.headers.get('ETag'), url)
+
+    async def test_async_views_revalidate(self):
+        with override_settings(ROOT_URLCONF=AsyncCatalogUrls):
+            for url in (f'/api/pets/pets/{self.pet.pk}/check_stock/', '/api/pets/pets/available_pets/',
+                        '/pets/', f'/pets/{self.pet.pk}/'):
+                await self.async_client.get(url)  # หน้า HTML ครั้งแรกตั้ง csrf cookie
+                etag = (await self.async_client.get(url)).headers['ETag']
+                response = await self.async_client.get(url, headers={'If-None-Match': etag})
+                self.assertEqual(response.status_code, 304, url)
+
+    @override_settings(DEBUG=True)
+    def test_middleware_chain_stays_async(self):
+        # DEBUG: Django log middleware แบบ sync ที่ทำให้ request ภายใต้ ASGI ถูกส่งเข้า thread
+        # (QueryInspectorMiddleware ถูกแปลงก่อนรู้ว่าไม่ได้เปิดใช้ แล้วถูกตัดออกจาก chain)
+        with self.assertLogs('django.request', 'DEBUG') as logs:
+            ASGIHandler()
+        adapted = [line for line in logs.output if 'adapted' in line and 'QueryInspectorMiddleware' not in line]
+        self.assertEqual(adapted, [])
@@ -4,22 +4,65 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAdminUser, AllowAny
 from django.shortcuts import get_object_or_404
-from .models import Pet, Category
-from .serializers import PetSerializer, PetListSerializer, CategorySerializer
+from django.utils import timezone
+from .models import Pet, Category, StockNotification
+from . import cache as catalog_cache
+from .serializers import (
+    PetSerializer, PetListSerializer, PetListRowSerializer, StockStatusRowSerializer, CategorySerializer,
+    StockNotificationSerializer
+)
+from .search import search_pet_ids
+from .conditional import ConditionalGetMixin
+from .services import StockError, bulk_adjust_stock, read_stock_csv
 from users.permissions import IsSellerOrAdminUser
+from petstore_project.replicas import replica_reads
+
+def visible_pets(user):
+    """แสดงเฉพาะสัตว์เลี้ยงที่พร้อมขายและมีสต็อกสำหรับลูกค้า"""
+    queryset = Pet.objects.filter(is_available=True)
+    
+    # สำหรับผู้ใช้ทั่วไป (ลูกค้า) แสดงเฉพาะที่มีสต็อก
+    if not user.is_authenticated or not (user.is_admin() or user.is_seller()):
+        queryset = queryset.filter(stock_quantity__gt=0)
+    return queryset
+
+# queryset ของ action ด้านล่าง (pets/hot_queries.py ตรวจ query plan จากฟังก์ชันเดียวกันนี้)
+def in_stock_pets():
+    """สัตว์เลี้ยงที่พร้อมขายและมีสต็อก"""
+    return Pet.objects.filter(is_available=True, stock_quantity__gt=0)
+
+def low_stock_pets():
+    """สัตว์เลี้ยงที่สต็อกต่ำ (ยังไม่หมด)"""
+    return Pet.objects.filter(
+        stock_quantity__lte=models.F('min_stock_threshold'),
+        stock_quantity__gt=0,
+        is_available=True
+    )
+
+def out_of_stock_pets():
+    """สัตว์เลี้ยงที่หมดสต็อก"""
+    return Pet.objects.filter(stock_quantity=0, is_available=True)
+
+def seller_pets(user):
+    """สัตว์เลี้ยงที่ผู้ขายคนนี้ลงขายอยู่"""
+    return Pet.objects.filter(created_by=user, is_available=True)
 
 class CategoryViewSet(viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsAdminUser]
+    keyset_ordering = ('name',)
 
-class PetViewSet(viewsets.ModelViewSet):
+class PetViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Pet.objects.all()
     permission_classes = [IsAuthenticatedOrReadOnly]
+    keyset_ordering = ('-created_at', 'id')
+    # actions ที่อ่านแบบ .values() และใช้ serializer แบบเบา
+    row_actions = ('list', 'search')
     
     def get_serializer_class(self):
-        if self.action == 'list':
-            return PetListSerializer
+        if self.action in self.row_actions:
+            return PetListRowSerializer
         return PetSerializer
     
     def perform_create(self, serializer):
@@ -47,16 +90,34 @@ class PetViewSet(viewsets.ModelViewSet):
                     )
                     serializer.save(created_by=admin_user)
     
+    def visible_pets(self):
+        return visible_pets(self.request.user)
+    
+    def pet_not_modified(self, pk):
+        """304 ถ้าสัตว์เลี้ยงตัวนี้ (และชื่อหมวดหมู่) ไม่เปลี่ยนตั้งแต่ ETag ที่ client มี"""
+        if not str(pk).isdigit():
+            return None  # ให้ get_object() ตอบ 404 ตามปกติ
+        return self.not_modified([f'pet.{pk}', 'categories'], self.visible_pets().filter(pk=pk))
+    
     def get_queryset(self):
-        """แสดงเฉพาะสัตว์เลี้ยงที่พร้อมขายและมีสต็อกสำหรับลูกค้า"""
-        queryset = Pet.objects.filter(is_available=True)
-        
-        # สำหรับผู้ใช้ทั่วไป (ลูกค้า) แสดงเฉพาะที่มีสต็อก
-        if not self.request.user.is_authenticated or not (self.request.user.is_admin() or self.request.user.is_seller()):
-            queryset = queryset.filter(stock_quantity__gt=0)
-        
+        queryset = self.visible_pets()
+        if self.action in self.row_actions:
+            return PetListRowSerializer.project(queryset)
         return queryset.select_related('category', 'created_by')
     
+    @replica_reads
+    def list(self, request, *args, **kwargs):
+        not_modified = self.not_modified(['pets'], self.visible_pets())
+        if not_modified is not None:
+            return not_modified
+        return super().list(request, *args, **kwargs)
+    
+    def retrieve(self, request, *args, **kwargs):
+        not_modified = self.pet_not_modified(kwargs['pk'])
+        if not_modified is not None:
+            return not_modified
+        return super().retrieve(request, *args, **kwargs)
+    
     @action(detail=True, methods=['post'], permission_classes=[IsAdminUser])
     def toggle_availability(self, request, pk=None):
         """เปิด/ปิดการขายสัตว์เลี้ยง"""
@@ -93,8 +154,7 @@ class PetViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            pet.stock_quantity = stock_quantity
-            pet.save()
+            pet.set_stock(stock_quantity, user=request.user)
             
             return Response({
                 'success': True,
@@ -132,7 +192,7 @@ class PetViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            pet.increase_stock(quantity)
+            pet.increase_stock(quantity, user=request.user)
             
             return Response({
                 'success': True,
@@ -169,14 +229,12 @@ class PetViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            if pet.stock_quantity < quantity:
+            if not pet.reduce_stock(quantity, user=request.user):
                 return Response(
                     {"error": f"สต็อกไม่พอ! มีเพียง {pet.stock_quantity} ตัว"}, 
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            pet.reduce_stock(quantity)
-            
             return Response({
                 'success': True,
                 'message': f'ลดสต็อก {pet.name} จำนวน {quantity} ตัวสำเร็จ',
@@ -190,40 +248,93 @@ class PetViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
     
+    @action(detail=False, methods=['post'], permission_classes=[IsSellerOrAdminUser])
+    def bulk_stock(self, request):
+        """ปรับสต็อกหลายรายการในครั้งเดียว
+
+        JSON: {"items": [{"pet_id": 1, "op": "set|increase|reduce", "quantity": 5}, ...]}
+        หรืออัปโหลดไฟล์ CSV ในฟิลด์ file (header: pet_id,quantity[,op] - ไม่ระบุ op คือเพิ่มสต็อก)
+        ผลลัพธ์แยกทีละรายการ รายการที่ผิดพลาดจะถูกข้ามโดยไม่กระทบรายการอื่น
+        """
+        try:
+            if 'file' in request.FILES:
+                items = read_stock_csv(request.FILES['file'])
+            else:
+                items = request.data.get('items') if isinstance(request.data, dict) else request.data
+                if not isinstance(items, list):
+                    return Response(
+                        {"error": "กรุณาระบุรายการ items"}, 
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+            results = bulk_adjust_stock(request.user, items)
+        except (StockError, UnicodeDecodeError) as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        updated = sum(1 for result in results if result['success'])
+        return Response({
+            'success': updated == len(results),
+            'updated': updated,
+            'failed': len(results) - updated,
+            'results': results
+        })
+    
     @action(detail=False, methods=['get'], permission_classes=[IsSellerOrAdminUser])
     def low_stock(self, request):
         """รายการสัตว์เลี้ยงที่สต็อกต่ำ"""
-        low_stock_pets = Pet.objects.filter(
-            stock_quantity__lte=models.F('min_stock_threshold'),
-            stock_quantity__gt=0,
-            is_available=True
-        )
+        pets = low_stock_pets().select_related('category', 'created_by')
         
-        serializer = self.get_serializer(low_stock_pets, many=True)
-        return Response({
-            'count': low_stock_pets.count(),
-            'pets': serializer.data
-        })
+        page = self.paginate_queryset(pets)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
     
     @action(detail=False, methods=['get'], permission_classes=[IsSellerOrAdminUser])
     def out_of_stock(self, request):
         """รายการสัตว์เลี้ยงที่หมดสต็อก"""
-        out_of_stock_pets = Pet.objects.filter(
-            stock_quantity=0,
-            is_available=True
-        )
+        pets = out_of_stock_pets().select_related('category', 'created_by')
         
-        serializer = self.get_serializer(out_of_stock_pets, many=True)
-        return Response({
-            'count': out_of_stock_pets.count(),
-            'pets': serializer.data
-        })
+        page = self.paginate_queryset(pets)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+    
+    def stock_notifications(self):
+        """การแจ้งเตือนสต็อกของผู้ขาย (ผู้ดูแลระบบเห็นทั้งหมด)"""
+        notifications = StockNotification.objects.all()
+        if self.request.user.is_seller():
+            notifications = notifications.filter(recipient=self.request.user)
+        return notifications
+    
+    @action(detail=False, methods=['get'], permission_classes=[IsSellerOrAdminUser])
+    def stock_alerts(self, request):
+        """การแจ้งเตือนสต็อกต่ำ/หมดที่ worker สร้างไว้ ?unread=1 เฉพาะที่ยังไม่อ่าน"""
+        notifications = self.stock_notifications().select_related('pet')
+        if request.query_params.get('unread') in ('1', 'true'):
+            notifications = notifications.filter(read_at__isnull=True)
+        
+        page = self.paginate_queryset(notifications)
+        serializer = StockNotificationSerializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+    
+    @action(detail=False, methods=['post'], url_path='stock_alerts/read', permission_classes=[IsSellerOrAdminUser])
+    def read_stock_alerts(self, request):
+        """ทำเครื่องหมายว่าอ่านแล้ว {"ids": [...]} (ไม่ระบุคือทั้งหมด)"""
+        notifications = self.stock_notifications().filter(read_at__isnull=True)
+        ids = request.data.get('ids')
+        if ids is not None:
+            if not isinstance(ids, list) or not all(str(pk).isdigit() for pk in ids):
+                return Response(
+                    {"error": "ids ต้องเป็นรายการตัวเลข"}, 
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            notifications = notifications.filter(pk__in=ids)
+        
+        updated = notifications.update(read_at=timezone.now())
+        return Response({'success': True, 'updated': updated})
     
     @action(detail=False, methods=['get'], permission_classes=[IsSellerOrAdminUser])
     def my_pets_stock(self, request):
         """สต็อกสัตว์เลี้ยงของฉัน (สำหรับ seller)"""
         if request.user.is_seller():
-            my_pets = Pet.objects.filter(created_by=request.user, is_available=True)
+            my_pets = seller_pets(request.user)
             
             stock_summary = {
                 'total_pets': my_pets.count(),
@@ -245,8 +356,12 @@ class PetViewSet(viewsets.ModelViewSet):
     
     # ✅ เพิ่ม endpoints ใหม่สำหรับลูกค้า
     @action(detail=True, methods=['get'], permission_classes=[AllowAny])
+    @replica_reads
     def check_stock(self, request, pk=None):
         """ตรวจสอบจำนวนสต็อก (สำหรับลูกค้า)"""
+        not_modified = self.pet_not_modified(pk)
+        if not_modified is not None:
+            return not_modified
         pet = self.get_object()
         
         return Response({
@@ -262,39 +377,85 @@ class PetViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'], permission_classes=[AllowAny])
     def stock_status(self, request):
-        """ดูสถานะสต็อกสัตว์เลี้ยงทั้งหมด (สำหรับลูกค้า)"""
+        """ดูสถานะสต็อกสัตว์เลี้ยงทั้งหมด (สำหรับลูกค้า) ?category=<id>
+
+        สรุปยอดด้วย aggregate เดียว (cache ไว้จนกว่าสินค้าจะเปลี่ยน)
+        และแต่ละหน้าอ่านแบบ .values() พร้อมสถานะสต็อกจาก SQL
+        """
         pets = Pet.objects.filter(is_available=True)
+        category_id = request.query_params.get('category')
+        if category_id:
+            if not category_id.isdigit():
+                return Response(
+                    {"error": "category ต้องเป็นตัวเลข"}, 
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            pets = pets.filter(category_id=category_id)
         
-        stock_data = []
-        for pet in pets:
-            stock_data.append({
-                'id': pet.id,
-                'name': pet.name,
-                'price': float(pet.price),
-                'stock_quantity': pet.stock_quantity,
-                'is_out_of_stock': pet.is_out_of_stock,
-                'stock_status': pet.stock_status_display,
-                'image': pet.image_display,
-                'category_name': pet.category.name if pet.category else ''
-            })
+        not_modified = self.not_modified(['pets'], pets)
+        if not_modified is not None:
+            return not_modified
         
-        return Response({
-            'count': len(stock_data),
-            'available_pets': len([p for p in stock_data if not p['is_out_of_stock']]),
-            'out_of_stock_pets': len([p for p in stock_data if p['is_out_of_stock']]),
-            'pets': stock_data
+        summary = catalog_cache.get_or_set(
+            ['pets'], ('stock_status_summary', category_id),
+            lambda: pets.aggregate(
+                count=models.Count('id'),
+                out_of_stock_pets=models.Count('id', filter=models.Q(stock_quantity__lte=0)),
+                low_stock_pets=models.Count('id', filter=models.Q(
+                    stock_quantity__gt=0, stock_quantity__lte=models.F('min_stock_threshold')
+                ))
+            )
+        )
+        
+        page = self.paginate_queryset(StockStatusRowSerializer.project(pets))
+        response = self.get_paginated_response(StockStatusRowSerializer(page, many=True).data)
+        response.data.update({
+            'count': summary['count'],
+            'available_pets': summary['count'] - summary['out_of_stock_pets'],
+            'out_of_stock_pets': summary['out_of_stock_pets'],
+            'low_stock_pets': summary['low_stock_pets'],
         })
+        return response
     
     @action(detail=False, methods=['get'], permission_classes=[AllowAny])
     def available_pets(self, request):
         """สัตว์เลี้ยงที่พร้อมขาย (มีสต็อก)"""
-        available_pets = Pet.objects.filter(
-            is_available=True,
-            stock_quantity__gt=0
-        ).select_related('category')
+        available_pets = in_stock_pets()
+        not_modified = self.not_modified(['pets'], available_pets)
+        if not_modified is not None:
+            return not_modified
+        available_pets = available_pets.select_related('category')
+        
+        page = self.paginate_queryset(available_pets)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+    
+    @action(detail=False, methods=['get'], permission_classes=[AllowAny])
+    def search(self, request):
+        """ค้นหาสัตว์เลี้ยง (full-text, เรียงตามความเกี่ยวข้อง, รองรับ prefix) ?q=คำค้น&limit=20"""
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response(
+                {"error": "กรุณาระบุคำค้นหา (q)"}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        serializer = self.get_serializer(available_pets, many=True)
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+        except ValueError:
+            limit = 20
+        
+        # ค้นหาเผื่อไว้ เพราะบางรายการอาจถูกกรองออกตามสิทธิ์ของผู้ใช้
+        ranked_ids = search_pet_ids(query, limit=limit * 2)
+        ranks = {pet_id: rank for rank, pet_id in enumerate(ranked_ids)}
+        pets = sorted(
+            self.get_queryset().filter(id__in=ranked_ids),
+            key=lambda pet: ranks[pet['id']]
+        )[:limit]
+        
+        serializer = self.get_serializer(pets, many=True)
         return Response({
-            'count': available_pets.count(),
-            'pets': serializer.data
-        })
\ No newline at end of file
+            'query': query,
+            'count': len(pets),
+            'results': serializer.data
+        })
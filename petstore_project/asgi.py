@@ -2,6 +2,7 @@
 ASGI config for petstore_project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+ใช้กับ gunicorn + uvicorn worker: GUNICORN_PROFILE=asgi gunicorn (ดู gunicorn.conf.py)
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
@@ -0,0 +1,24 @@
+"""
+helper ของ view และ middleware แบบ async ภายใต้ ASGI (Django 4.2)
+
+request.user และ session โหลดจากฐานข้อมูลแบบ lazy ด้วยโค้ด sync ซึ่งเรียกใน event loop ไม่ได้
+(SynchronousOnlyOperation) จึงต้องโหลดใน thread ก่อนใช้ใน view async (Django 5.0 มี request.auser() แทน)
+"""
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+
+
+def _load_user(request):
+    request.user.pk  # บังคับโหลด SimpleLazyObject (session -> ผู้ใช้)
+    return request.user
+
+
+async def aload_user(request):
+    """request.user ที่โหลดแล้ว ใช้ต่อใน event loop ได้"""
+    return await sync_to_async(_load_user)(request)
+
+
+async def ahas_messages(request):
+    """มี flash message ที่ยังไม่แสดงหรือไม่ (อ่าน cookie/session ใน thread และเก็บผลไว้ให้ template)"""
+    return await sync_to_async(lambda: len(messages.get_messages(request)) > 0)()
+
@@ -0,0 +1,120 @@
+"""
+หน้า catalog แบบ async (home, pet_list, pet_detail) สำหรับ ASGI - เปิดด้วย ASYNC_CATALOG_VIEWS=1
+
+เนื้อหาและ cache เหมือน view ใน views.py แต่อ่านฐานข้อมูลด้วย async ORM (async for / aget)
+และโหลดข้อมูลที่ไม่ขึ้นต่อกันพร้อมกันด้วย asyncio.gather ระหว่างรอ I/O request ไม่ถือ thread ของ worker
+template render ใน thread (context processor และ relation แบบ lazy อ่านฐานข้อมูลแบบ sync)
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.http import Http404
+from django.shortcuts import render
+
+from pets import cache as catalog_cache
+from pets.conditional import catalog_condition
+from pets.models import Category, Pet
+from pets.search import search_pet_ids
+from .async_utils import aload_user
+from .replicas import replica_reads
+from .views import _pet_detail_scope, _pet_list_scope, catalog_pets, newest_pets
+
+
+async def _alist(queryset):
+    return [obj async for obj in queryset]
+
+
+async def _arender(request, template_name, context):
+    return await sync_to_async(render)(request, template_name, context)
+
+
+def _categories():
+    return catalog_cache.aget_or_set(['categories'], ('categories',), lambda: _alist(Category.objects.all()))
+
+
+@catalog_condition()
+async def home(request):
+    """หน้าแรก"""
+    featured_pets, categories = await asyncio.gather(
+        catalog_cache.aget_or_set(
+            ['pets'], ('home', 'featured'),
+            lambda: _alist(newest_pets())
+        ),
+        _categories(),
+    )
+    return await _arender(request, 'home.html', {
+        'featured_pets': featured_pets,
+        'categories': categories
+    })
+
+
+@replica_reads
+@catalog_condition(_pet_list_scope)
+async def pet_list(request):
+    """หน้ารายการสัตว์เลี้ยงทั้งหมด"""
+    category_id = request.GET.get('category')
+    search_query = request.GET.get('search')
+
+    async def load_pets():
+        pets = catalog_pets(category_id)
+        if search_query:
+            ranked_ids = await sync_to_async(search_pet_ids)(search_query)
+            ranks = {pet_id: rank for rank, pet_id in enumerate(ranked_ids)}
+            return sorted(await _alist(pets.filter(id__in=ranked_ids)), key=lambda pet: ranks[pet.id])
+        return await _alist(pets)
+
+    if category_id and category_id.isdigit():
+        namespaces = [f'category.{category_id}']
+    else:
+        namespaces = ['pets']
+    cache_parts = ('pet_list', category_id, search_query)
+    pets, categories = await asyncio.gather(
+        catalog_cache.aget_or_set(namespaces, cache_parts, load_pets),
+        _categories(),
+    )
+    user = await aload_user(request)
+
+    pet_grid_html = await catalog_cache.arender_fragment(
+        namespaces,
+        cache_parts + (catalog_cache.viewer_role(user),),
+        'pets/pet_grid.html',
+        {'pets': pets},
+        request=request
+    )
+
+    return await _arender(request, 'pets/pet_list.html', {
+        'pets': pets,
+        'pet_grid_html': pet_grid_html,
+        'categories': categories,
+        'selected_category': category_id,
+        'search_query': search_query or ''
+    })
+
+
+@replica_reads
+@catalog_condition(_pet_detail_scope)
+async def pet_detail(request, pet_id):
+    """หน้าข้อมูลสัตว์เลี้ยงโดยละเอียด"""
+    async def load_pet():
+        try:
+            return await Pet.objects.select_related('category').aget(id=pet_id)
+        except Pet.DoesNotExist:
+            raise Http404('No Pet matches the given query.')
+
+    pet = await catalog_cache.aget_or_set(
+        [f'pet.{pet_id}', 'categories'], ('pet_detail', pet_id), load_pet
+    )
+
+    # สัตว์เลี้ยงที่เกี่ยวข้องขึ้นกับหมวดหมู่ของตัวนี้ จึงโหลดหลังได้ pet แล้ว
+    related_pets = await catalog_cache.aget_or_set(
+        [f'category.{pet.category_id}'], ('related_pets', pet.id),
+        lambda: _alist(Pet.objects.filter(
+            category=pet.category,
+            is_available=True
+        ).select_related('category').exclude(id=pet.id)[:4])
+    )
+
+    return await _arender(request, 'pets/pet_detail.html', {
+        'pet': pet,
+        'related_pets': related_pets
+    })
@@ -0,0 +1,32 @@
+"""
+Registry ของ query ที่ถูกเรียกบ่อย (hot queries) สำหรับตรวจ query plan
+
+แต่ละแอพประกาศ query ไว้ใน ``<app>/hot_queries.py`` ด้วย ``@hot_query('ชื่อ')``
+แล้วคำสั่ง ``python manage.py explain_hot_queries`` จะรัน EXPLAIN ทุกตัว
+ฟังก์ชันที่ลงทะเบียนควรเรียกตัวสร้าง queryset ตัวเดียวกับ view (ไม่คัดลอก filter มาเขียนใหม่)
+"""
+from django.utils.module_loading import autodiscover_modules
+from rest_framework.settings import api_settings
+
+from .pagination import KeysetPagination
+
+_registry = {}
+
+
+def hot_query(name):
+    """ลงทะเบียนฟังก์ชันที่คืนค่า QuerySet ของ hot query"""
+    def decorator(func):
+        _registry[name] = func
+        return func
+    return decorator
+
+
+def get_hot_queries():
+    autodiscover_modules('hot_queries')
+    return dict(_registry)
+
+
+def first_page(queryset, view):
+    """หน้าแรกของ list endpoint แบบเดียวกับที่ KeysetPagination ส่งไปฐานข้อมูล (ORDER BY keyset_ordering LIMIT)"""
+    ordering = KeysetPagination().get_ordering(None, queryset, view)
+    return queryset.order_by(*ordering)[:api_settings.PAGE_SIZE + 1]
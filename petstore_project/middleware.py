@@ -0,0 +1,154 @@
+"""
+Query inspector middleware (เปิดใช้ด้วย QUERY_INSPECTOR['ENABLED'])
+
+บันทึกทุก SQL ที่รันระหว่าง request ผ่าน ``connection.execute_wrapper``
+ตรวจจับ N+1 (query รูปแบบเดียวกันซ้ำหลายครั้ง) พร้อมบอกตำแหน่ง template/โค้ดที่เรียก
+และบังคับ query budget ต่อ URL name ได้
+"""
+import logging
+import sys
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+logger = logging.getLogger('petstore.queries')
+
+DEFAULTS = {
+    'ENABLED': False,
+    # จำนวนครั้งที่ query รูปแบบเดียวกันถูกรันซ้ำแล้วถือว่าเป็น N+1
+    'N_PLUS_ONE_THRESHOLD': 5,
+    # {url_name: จำนวน query สูงสุด}
+    'BUDGETS': {},
+    # True = raise QueryBudgetExceeded (ใช้ในเทสต์), False = log warning
+    'RAISE': False,
+    'RESPONSE_HEADER': True,
+}
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def get_inspector_settings():
+    return {**DEFAULTS, **getattr(settings, 'QUERY_INSPECTOR', {})}
+
+
+def _caller_location():
+    """หาตำแหน่งที่เรียก query: บรรทัดใน template (ถ้ามี) หรือบรรทัดโค้ดในโปรเจกต์"""
+    from django.template.base import Node
+
+    code_location = None
+    frame = sys._getframe(2)
+    while frame is not None:
+        node = frame.f_locals.get('self')
+        if isinstance(node, Node) and getattr(node, 'origin', None) and getattr(node, 'token', None):
+            return f'{node.origin.template_name}:{node.token.lineno}'
+        filename = frame.f_code.co_filename
+        if code_location is None and str(settings.BASE_DIR) in filename and 'site-packages' not in filename \
+                and not filename.endswith('middleware.py'):
+            code_location = f'{filename}:{frame.f_lineno}'
+        frame = frame.f_back
+    return code_location or 'unknown'
+
+
+class QueryRecorder:
+    """execute wrapper ที่เก็บ SQL ทุกตัว และตำแหน่งของ query ที่ซ้ำเกิน threshold"""
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.queries = []
+        self.shapes = Counter()
+        self.locations = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            # sql ยังเป็น template ที่มี placeholder จึงใช้เป็น "รูปแบบ" ของ query ได้เลย
+            self.queries.append((sql, time.perf_counter() - started))
+            self.shapes[sql] += 1
+            if self.shapes[sql] == self.threshold:
+                self.locations[sql] = _caller_location()
+
+    @property
+    def repeated(self):
+        return [(sql, count, self.locations.get(sql, 'unknown'))
+                for sql, count in self.shapes.most_common() if count >= self.threshold]
+
+
+class QueryInspectorMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = get_inspector_settings()
+        if not self.config['ENABLED']:
+            raise MiddlewareNotUsed()
+
+    def __call__(self, request):
+        recorder = QueryRecorder(self.config['N_PLUS_ONE_THRESHOLD'])
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(recorder))
+            response = self.get_response(request)
+
+        view_name = self.view_name(request)
+        for sql, count, location in recorder.repeated:
+            logger.warning(
+                'N+1 query in %s (%s): %d x %s [%s]',
+                request.path, view_name, count, sql[:200], location
+            )
+
+        total = len(recorder.queries)
+        if self.config['RESPONSE_HEADER']:
+            response['X-Query-Count'] = str(total)
+
+        budget = self.config['BUDGETS'].get(view_name)
+        if budget is not None and total > budget:
+            message = f'{request.path} ({view_name}) ran {total} queries, budget is {budget}'
+            if self.config['RAISE']:
+                raise QueryBudgetExceeded(message)
+            logger.warning('Query budget exceeded: %s', message)
+        return response
+
+    @staticmethod
+    def view_name(request):
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return None
+        return match.view_name
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoiseMiddleware ที่รองรับ ASGI ด้วย
+
+    WhiteNoise 6.6 เป็น middleware แบบ sync อย่างเดียว ทำให้ทุก request ภายใต้ ASGI ถูกส่งเข้า thread
+    ตั้งแต่ middleware ตัวนี้ลงไป (view async จึงไม่ได้รันใน event loop)
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            # DEBUG: ค้นไฟล์จาก finders/ดิสก์ทุก request
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
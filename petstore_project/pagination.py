@@ -0,0 +1,20 @@
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Keyset (cursor) pagination สำหรับทุก list endpoint
+
+    เลื่อนหน้าด้วย WHERE บนคอลัมน์ที่เรียงลำดับแทน OFFSET/COUNT
+    ทำให้เวลาตอบกลับคงที่แม้ตารางจะใหญ่ขึ้น cursor เป็นค่า opaque (base64)
+    แต่ละ ViewSet กำหนดลำดับได้ด้วย attribute ``keyset_ordering``
+    """
+    ordering = ('-id',)
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, 'keyset_ordering', None)
+        if ordering:
+            return (ordering,) if isinstance(ordering, str) else tuple(ordering)
+        return super().get_ordering(request, queryset, view)
@@ -0,0 +1,120 @@
+"""
+PostgreSQL backend ที่ยืม connection จาก pool ใน process แทนการเปิดใหม่ทุก request
+
+ENGINE = 'petstore_project.postgresql_pool' และ OPTIONS['pool'] = {'max_size': 10, 'timeout': 30}
+(ตั้งผ่าน DB_POOL=1 ดู petstore_project/database.py) connection.close() ของ Django คืน connection เข้า pool
+pool แยกตาม process (gunicorn fork worker แล้วไม่ใช้ socket ร่วมกับ process แม่) ใช้กับ psycopg2
+"""
+import os
+import threading
+
+import psycopg2.extensions
+import psycopg2.extras
+from django.db.backends.postgresql import base, creation
+from django.db.backends.postgresql.psycopg_any import IsolationLevel
+from petstore_project.database import ConnectionPool, PoolTimeout
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _pool_key(settings_dict, alias):
+    return (
+        os.getpid(), alias, settings_dict['NAME'], settings_dict['HOST'], settings_dict['PORT'], settings_dict['USER']
+    )
+
+
+def close_pools(settings_dict=None):
+    """ปิด connection ว่างของทุก pool (หรือเฉพาะฐานข้อมูลของ settings_dict)"""
+    with _pools_lock:
+        pools = [
+            pool for key, pool in _pools.items()
+            if settings_dict is None or key[2:] == _pool_key(settings_dict, None)[2:]
+        ]
+    for pool in pools:
+        pool.close()
+
+
+def _usable(connection, ping):
+    """ตรวจ connection ก่อนยืมจาก pool (ping เมื่อเปิด CONN_HEALTH_CHECKS)"""
+    if connection.closed:
+        return False
+    if not ping:
+        return True
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        return True
+    except psycopg2.Error:
+        return False
+
+
+def _reset(connection):
+    """เคลียร์ transaction ที่ค้างก่อนคืนเข้า pool (คืนค่า False ถ้าควรทิ้ง)"""
+    if connection.closed:
+        return False
+    try:
+        if connection.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            connection.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # DROP DATABASE ไม่ได้ถ้ายังมี connection ว่างค้างใน pool
+        close_pools(self.connection.settings_dict)
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('pool', None)
+        return params
+
+    @property
+    def pool(self):
+        key = _pool_key(self.settings_dict, self.alias)
+        pool = _pools.get(key)
+        if pool is None:
+            with _pools_lock:
+                pool = _pools.get(key)
+                if pool is None:
+                    options = self.settings_dict['OPTIONS'].get('pool') or {}
+                    params = self.get_connection_params()
+                    ping = self.settings_dict['CONN_HEALTH_CHECKS']
+                    pool = _pools[key] = ConnectionPool(
+                        lambda: psycopg2.connect(**params),
+                        max_size=options.get('max_size', 10),
+                        timeout=options.get('timeout', 30),
+                        check=lambda connection: _usable(connection, ping),
+                        reset=_reset,
+                    )
+        return pool
+
+    def get_new_connection(self, conn_params):
+        try:
+            connection = self.pool.acquire()
+        except PoolTimeout as e:
+            raise psycopg2.OperationalError(str(e)) from e
+        # เหมือน postgresql backend แต่ทำกับ connection ที่ยืมมา (ค่าที่ตั้งไว้ค้างจากรอบก่อนได้)
+        isolation_level = self.settings_dict['OPTIONS'].get('isolation_level')
+        self.isolation_level = IsolationLevel(isolation_level) if isolation_level is not None else (
+            IsolationLevel.READ_COMMITTED
+        )
+        if isolation_level is not None:
+            connection.isolation_level = self.isolation_level
+        psycopg2.extras.register_default_jsonb(conn_or_curs=connection, loads=lambda x: x)
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                # ปิดกลาง atomic block: wrapper ยังถือ connection ไว้จนจบ block จึงปิดทิ้งแบบ backend ปกติ
+                # ส่วน connection ที่เกิด error และใช้ต่อไม่ได้ (เช่น server restart) ไม่คืนเข้า pool
+                discard = self.in_atomic_block or (self.errors_occurred and not self.is_usable())
+                self.pool.release(self.connection, discard=discard)
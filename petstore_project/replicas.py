@@ -0,0 +1,155 @@
+"""
+อ่านจาก read replica (settings.DATABASE_REPLICAS) เฉพาะ view ที่ติด ``@replica_reads``
+
+query อื่นทั้งหมด (รวมทุกการเขียน และการอ่านใน transaction) ใช้ฐานข้อมูลหลักเหมือนเดิม
+ผู้ใช้ที่ request ของตัวเองเขียนข้อมูล (เช่นสั่งซื้อ) ถูก pin ไว้กับฐานข้อมูลหลัก REPLICA_PIN_SECONDS วินาที
+ทั้งด้วย cookie และ cache ต่อผู้ใช้ (client ของ API ที่ไม่เก็บ cookie) จึงเห็นข้อมูลที่ตัวเองเพิ่งเขียนเสมอ
+แม้ replica ยังตามไม่ทัน - pin ต่อผู้ใช้อยู่ใน settings.REPLICA_PIN_CACHE ซึ่งต้องใช้ร่วมกันทุก worker
+(file หรือ db ถ้าเป็น locmem worker อื่นจะไม่เห็น pin และมีแค่ cookie ที่ได้ผล)
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = 'pin_primary'
+# การเขียนที่ไม่ใช่ข้อมูลของผู้ใช้ (cache แบบ database) ไม่ทำให้ pin
+PIN_IGNORED_APPS = {'django_cache'}
+
+_read_alias = ContextVar('replica_read_alias', default=None)
+_writes = ContextVar('replica_writes', default=None)
+
+
+def _pin_key(user_id):
+    return f'replica_pin:{user_id}'
+
+
+def _pin_cache():
+    return caches[settings.REPLICA_PIN_CACHE]
+
+
+@contextmanager
+def use_replica(enabled=True):
+    """ให้การอ่านภายใน block ไปที่ replica (สุ่มถ้ามีหลายตัว) ไม่มีผลถ้าไม่ได้ตั้ง replica"""
+    replicas = settings.DATABASE_REPLICAS
+    token = _read_alias.set(random.choice(replicas) if enabled and replicas else None)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def reading_from_replica():
+    return _read_alias.get() is not None
+
+
+def cache_timeout(timeout):
+    """อายุ cache ของข้อมูลที่อ่านจาก replica ไม่เกินช่วง pin (ข้อมูลอาจเก่ากว่าฐานข้อมูลหลัก)"""
+    if reading_from_replica():
+        return min(timeout, settings.REPLICA_PIN_SECONDS)
+    return timeout
+
+
+def is_pinned(request):
+    if request.COOKIES.get(PIN_COOKIE):
+        return True
+    user = getattr(request, 'user', None)
+    return bool(user is not None and user.is_authenticated and _pin_cache().get(_pin_key(user.pk)))
+
+
+def pin_primary(request, response):
+    """ให้ผู้ใช้ของ request นี้อ่านจากฐานข้อมูลหลัก REPLICA_PIN_SECONDS วินาที"""
+    seconds = settings.REPLICA_PIN_SECONDS
+    response.set_cookie(PIN_COOKIE, '1', max_age=seconds, httponly=True, samesite='Lax')
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        _pin_cache().set(_pin_key(user.pk), True, seconds)
+
+
+def replica_reads(view):
+    """decorator ของ view ที่อ่านอย่างเดียว (function view หรือ method ของ ViewSet) ให้อ่านจาก replica
+
+    ใช้ฐานข้อมูลหลักแทนถ้าผู้ใช้ถูก pin (สำหรับ ViewSet ตรวจหลัง DRF ยืนยันตัวตนแล้ว) ใช้กับ view async ได้
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(*args, **kwargs):
+            request = args[0] if hasattr(args[0], 'COOKIES') else args[1]
+            # is_pinned อ่าน request.user และ cache ซึ่งเป็นโค้ด sync
+            with use_replica(enabled=not await sync_to_async(is_pinned)(request)):
+                return await view(*args, **kwargs)
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        request = args[0] if hasattr(args[0], 'COOKIES') else args[1]
+        with use_replica(enabled=not is_pinned(request)):
+            return view(*args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        # อ่านใน transaction ของฐานข้อมูลหลักต้องเห็นสิ่งที่เพิ่งเขียนใน transaction นั้น
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return alias
+
+    def db_for_write(self, model, **hints):
+        writes = _writes.get()
+        if writes is not None and model._meta.app_label not in PIN_IGNORED_APPS:
+            writes.add(model._meta.label)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replica คือสำเนาของฐานข้อมูลหลัก
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # replica ได้ schema จากการ replicate ไม่ migrate เอง
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaPinMiddleware:
+    """pin ผู้ใช้กับฐานข้อมูลหลักหลัง request ที่เขียนข้อมูล (วางหลัง AuthenticationMiddleware)
+
+    รองรับทั้ง WSGI และ ASGI (middleware แบบ sync ทำให้ view async ทุกตัวถูกเรียกผ่าน thread)
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        writes = set()
+        token = _writes.set(writes)
+        try:
+            response = self.get_response(request)
+        finally:
+            _writes.reset(token)
+        if writes and settings.DATABASE_REPLICAS:
+            pin_primary(request, response)
+        return response
+
+    async def __acall__(self, request):
+        # ContextVar ถูกคัดลอกไปยัง thread ของ sync_to_async ชุดเดียวกันจึงเห็นการเขียนจากโค้ด sync ด้วย
+        writes = set()
+        token = _writes.set(writes)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _writes.reset(token)
+        if writes and settings.DATABASE_REPLICAS:
+            await sync_to_async(pin_primary)(request, response)
+        return response
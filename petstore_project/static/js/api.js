@@ -71,50 +71,66 @@ class PetStoreAPI {
     }
 }
 
-// Cart management
+// Cart management - ตะกร้าเก็บที่ server (/api/cart/, ใช้ session + CSRF token)
 class CartManager {
+    static async request(path = '', method = 'GET', body = null) {
+        const csrfToken = document.querySelector('meta[name="csrf-token"]');
+        const config = {
+            method,
+            credentials: 'same-origin',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': csrfToken ? csrfToken.content : ''
+            }
+        };
+        if (body) {
+            config.body = JSON.stringify(body);
+        }
+        const response = await fetch(`/api/cart/${path}`, config);
+        const data = await response.json();
+        if (!response.ok) {
+            throw new Error(data.error || `HTTP error! status: ${response.status}`);
+        }
+        return data;
+    }
+    
     static getCart() {
-        return JSON.parse(localStorage.getItem('cart') || '[]');
+        return this.request();
     }
     
-    static addToCart(petId, quantity = 1) {
-        const cart = this.getCart();
-        const existingItem = cart.find(item => item.petId === petId);
-        
-        if (existingItem) {
-            existingItem.quantity += quantity;
-        } else {
-            cart.push({ petId, quantity });
-        }
-        
-        localStorage.setItem('cart', JSON.stringify(cart));
-        this.updateCartCount();
+    static async addToCart(petId, quantity = 1) {
+        const summary = await this.request('', 'POST', { petId, quantity });
+        this.renderCartCount(summary);
+        return summary;
     }
     
-    static removeFromCart(petId) {
-        const cart = this.getCart().filter(item => item.petId !== petId);
-        localStorage.setItem('cart', JSON.stringify(cart));
-        this.updateCartCount();
+    static async updateQuantity(petId, quantity) {
+        const summary = await this.request(`items/${petId}/`, 'PATCH', { quantity });
+        this.renderCartCount(summary);
+        return summary;
     }
     
-    static updateCartCount() {
-        const cart = this.getCart();
-        const count = cart.reduce((total, item) => total + item.quantity, 0);
-        
+    static async removeFromCart(petId) {
+        const summary = await this.request(`items/${petId}/`, 'DELETE');
+        this.renderCartCount(summary);
+        return summary;
+    }
+    
+    static async updateCartCount() {
+        this.renderCartCount(await this.request('?summary=1'));
+    }
+    
+    static renderCartCount(summary) {
         const cartBadge = document.getElementById('cart-count');
         if (cartBadge) {
-            cartBadge.textContent = count;
-            cartBadge.style.display = count > 0 ? 'inline' : 'none';
+            cartBadge.textContent = summary.item_count;
+            cartBadge.style.display = summary.item_count > 0 ? 'inline' : 'none';
         }
     }
     
-    static clearCart() {
-        localStorage.removeItem('cart');
-        this.updateCartCount();
+    static async clearCart() {
+        const summary = await this.request('', 'DELETE');
+        this.renderCartCount(summary);
+        return summary;
     }
 }
-
-// Initialize cart count on page load
-document.addEventListener('DOMContentLoaded', function() {
-    CartManager.updateCartCount();
-});
\ No newline at end of file
@@ -5,7 +5,8 @@ from django.conf.urls.static import static
 from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
-from . import views
+from pets import async_views as pets_async_views
+from . import async_views, views
 
 schema_view = get_schema_view(
     openapi.Info(
@@ -38,11 +39,24 @@ urlpatterns = [
     path('cart/', views.cart, name='cart'),
     path('cart/checkout/', views.create_order_from_cart, name='create_order_from_cart'),
     path('api/cart/', views.get_cart_data, name='get_cart_data'),
+    path('api/cart/items/<int:pet_id>/', views.cart_item_api, name='cart_item_api'),
     
     # API Documentation
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
     path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
 ]
 
+# ASYNC_CATALOG_VIEWS=1 (ASGI): หน้าอ่านอย่างเดียวของ catalog แบบ async แทน view เดิมที่ URL และชื่อเดียวกัน
+async_catalog_urlpatterns = [
+    path('', async_views.home, name='home'),
+    path('pets/', async_views.pet_list, name='pet_list'),
+    path('pets/<int:pet_id>/', async_views.pet_detail, name='pet_detail'),
+    path('api/pets/pets/available_pets/', pets_async_views.available_pets, name='pet-available-pets'),
+    path('api/pets/pets/<int:pk>/check_stock/', pets_async_views.check_stock, name='pet-check-stock'),
+]
+
+if settings.ASYNC_CATALOG_VIEWS:
+    urlpatterns = async_catalog_urlpatterns + urlpatterns
+
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
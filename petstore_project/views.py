@@ -6,61 +6,138 @@ from django.contrib import messages
 from django.http import JsonResponse
 from datetime import datetime
 import json
+from django.db.models import Count, Q, Subquery
+from pets import cache as catalog_cache
+from pets.conditional import catalog_condition
 from pets.models import Pet, Category
+from pets.search import search_pet_ids
 from orders.models import Order
+from .replicas import replica_reads
+from orders.services import (
+    checkout_cart, get_order_stats, CheckoutError, FILL_MODES, FILL_PARTIAL,
+    CartError, get_cart, add_to_cart, set_cart_quantity, remove_from_cart, clear_cart, merge_into_cart,
+    get_cart_lines, summarize_cart_lines, get_cart_summary, cart_checkout_data
+)
 
+def newest_pets():
+    """สัตว์เลี้ยงที่แสดงในหน้าแรก (4 ตัวล่าสุดที่พร้อมขาย)"""
+    return Pet.objects.filter(is_available=True).select_related('category')[:4]
+
+def catalog_pets(category_id=None):
+    """สัตว์เลี้ยงที่พร้อมขายในหน้ารายการ (กรองตามหมวดหมู่ถ้ามี)"""
+    pets = Pet.objects.filter(is_available=True).select_related('category')
+    if category_id:
+        pets = pets.filter(category_id=category_id)
+    return pets
+
+@catalog_condition()
 def home(request):
     """หน้าแรก"""
-    # ดึงสัตว์เลี้ยงมาแสดงในหน้าแรก (limit 4 ตัว)
-    featured_pets = Pet.objects.filter(is_available=True)[:4]
-    categories = Category.objects.all()
+    # ดึงสัตว์เลี้ยงมาแสดงในหน้าแรก (limit 4 ตัว) - cache จนกว่าข้อมูลสินค้าจะเปลี่ยน
+    featured_pets = catalog_cache.get_or_set(
+        ['pets'], ('home', 'featured'),
+        lambda: list(newest_pets())
+    )
+    categories = catalog_cache.get_or_set(
+        ['categories'], ('categories',),
+        lambda: list(Category.objects.all())
+    )
     return render(request, 'home.html', {
         'featured_pets': featured_pets,
         'categories': categories
     })
 
+def _pet_list_scope(request):
+    """หน้าที่กรองหมวดหมู่ขึ้นกับสัตว์เลี้ยงในหมวดหมู่นั้นเท่านั้น (namespace เดียวกับ cache ของหน้า)"""
+    category_id = request.GET.get('category')
+    if category_id and category_id.isdigit():
+        return [f'category.{category_id}', 'categories'], Q(pet__category_id=category_id)
+    return ['pets'], None
+
+@replica_reads
+@catalog_condition(_pet_list_scope)
 def pet_list(request):
     """หน้ารายการสัตว์เลี้ยงทั้งหมด"""
-    # ดึงข้อมูลสัตว์เลี้ยงทั้งหมดที่พร้อมขาย
-    pets = Pet.objects.filter(is_available=True)
-    
-    # กรองตามหมวดหมู่ (ถ้ามี)
     category_id = request.GET.get('category')
-    if category_id:
-        pets = pets.filter(category_id=category_id)
-    
-    # ค้นหา (ถ้ามี)
     search_query = request.GET.get('search')
-    if search_query:
-        pets = pets.filter(name__icontains=search_query)
     
-    categories = Category.objects.all()
+    def load_pets():
+        # ดึงข้อมูลสัตว์เลี้ยงทั้งหมดที่พร้อมขาย (กรองตามหมวดหมู่ถ้ามี)
+        pets = catalog_pets(category_id)
+        
+        # ค้นหา (ถ้ามี) - full-text search บนชื่อ รายละเอียด และหมวดหมู่ เรียงตามความเกี่ยวข้อง
+        if search_query:
+            ranked_ids = search_pet_ids(search_query)
+            ranks = {pet_id: rank for rank, pet_id in enumerate(ranked_ids)}
+            return sorted(pets.filter(id__in=ranked_ids), key=lambda pet: ranks[pet.id])
+        return list(pets)
+    
+    # ผลลัพธ์ที่กรองตามหมวดหมู่ผูกกับ version ของหมวดหมู่นั้นเท่านั้น
+    if category_id and category_id.isdigit():
+        namespaces = [f'category.{category_id}']
+    else:
+        namespaces = ['pets']
+    cache_parts = ('pet_list', category_id, search_query)
+    pets = catalog_cache.get_or_set(namespaces, cache_parts, load_pets)
+    
+    categories = catalog_cache.get_or_set(
+        ['categories'], ('categories',),
+        lambda: list(Category.objects.all())
+    )
+    
+    pet_grid_html = catalog_cache.render_fragment(
+        namespaces,
+        cache_parts + (catalog_cache.viewer_role(request.user),),
+        'pets/pet_grid.html',
+        {'pets': pets},
+        request=request
+    )
     
     return render(request, 'pets/pet_list.html', {
         'pets': pets,
+        'pet_grid_html': pet_grid_html,
         'categories': categories,
         'selected_category': category_id,
         'search_query': search_query or ''
     })
 
+def _pet_detail_scope(request, pet_id):
+    """สัตว์เลี้ยงตัวนี้และสัตว์เลี้ยงที่เกี่ยวข้อง (หมวดหมู่เดียวกัน)"""
+    category_id = Subquery(Pet.objects.filter(pk=pet_id).values('category_id')[:1])
+    return ['pets'], Q(pet__category_id=category_id)
+
+@replica_reads
+@catalog_condition(_pet_detail_scope)
 def pet_detail(request, pet_id):
     """หน้าข้อมูลสัตว์เลี้ยงโดยละเอียด"""
-    pet = get_object_or_404(Pet, id=pet_id)
+    def load_pet():
+        return get_object_or_404(Pet.objects.select_related('category'), id=pet_id)
+    
+    pet = catalog_cache.get_or_set(
+        [f'pet.{pet_id}', 'categories'], ('pet_detail', pet_id), load_pet
+    )
     
     # ดึงสัตว์เลี้ยงที่เกี่ยวข้อง (หมวดหมู่เดียวกัน)
-    related_pets = Pet.objects.filter(
-        category=pet.category, 
-        is_available=True
-    ).exclude(id=pet.id)[:4]
+    related_pets = catalog_cache.get_or_set(
+        [f'category.{pet.category_id}'], ('related_pets', pet.id),
+        lambda: list(Pet.objects.filter(
+            category=pet.category, 
+            is_available=True
+        ).select_related('category').exclude(id=pet.id)[:4])
+    )
     
     return render(request, 'pets/pet_detail.html', {
         'pet': pet,
         'related_pets': related_pets
     })
 
+@catalog_condition()
 def categories(request):
     """หน้าหมวดหมู่สัตว์เลี้ยง"""
-    categories = Category.objects.all()
+    categories = catalog_cache.get_or_set(
+        ['categories', 'pets'], ('categories', 'with_counts'),
+        lambda: list(Category.objects.annotate(pet_count=Count('pet')))
+    )
     return render(request, 'pets/categories.html', {
         'categories': categories
     })
@@ -139,7 +216,7 @@ def logout_view(request):
 @login_required
 def profile(request):
     """หน้าโปรไฟล์ผู้ใช้"""
-    user_orders = Order.objects.filter(user=request.user).order_by('-order_date')
+    user_orders = Order.objects.filter(user=request.user).select_related('pet').order_by('-order_date')
     return render(request, 'auth/profile.html', {
         'user_orders': user_orders
     })
@@ -147,79 +224,50 @@ def profile(request):
 @login_required
 def order_list(request):
     """หน้ารายการคำสั่งซื้อ"""
-    orders = Order.objects.filter(user=request.user).order_by('-order_date')
+    orders = Order.objects.filter(user=request.user).select_related(
+        'pet', 'pet__category'
+    ).order_by('-order_date')
     
-    # คำนวณสถิติ
-    total_orders = orders.count()
-    pending_orders = orders.filter(status='pending').count()
-    completed_orders = orders.filter(status='completed').count()
-    cancelled_orders = orders.filter(status='cancelled').count()
+    # คำนวณสถิติ (aggregate query เดียว + cache)
+    stats = get_order_stats(user=request.user)
     
     return render(request, 'orders/order_list.html', {
         'orders': orders,
-        'total_orders': total_orders,
-        'pending_orders': pending_orders,
-        'completed_orders': completed_orders,
-        'cancelled_orders': cancelled_orders
+        'total_orders': stats['total_orders'],
+        'pending_orders': stats['pending_orders'],
+        'completed_orders': stats['completed_orders'],
+        'cancelled_orders': stats['cancelled_orders'],
+        'stats': stats
     })
 
 @login_required
 def order_detail(request, order_id):
     """หน้ารายละเอียดคำสั่งซื้อ"""
-    order = get_object_or_404(Order, id=order_id, user=request.user)
+    order = get_object_or_404(Order.objects.select_related('pet', 'pet__category'), id=order_id, user=request.user)
     return render(request, 'orders/order_detail.html', {'order': order})
 
 @login_required
 def cart(request):
-    """หน้าตะกร้าสินค้า"""
-    # ตรวจสอบว่ามีการสร้างคำสั่งซื้อสำเร็จแล้ว
-    if request.session.get('order_created'):
-        # ล้าง session
-        request.session['order_created'] = False
-        # ส่ง flag ไปให้ template ล้างตะกร้า
-        return render(request, 'orders/cart.html', {
-            'pets_in_cart': [],
-            'total_price': 0,
-            'cart_count': 0,
-            'cart_data_json': '[]',
-            'clear_cart': True,
-            'today': datetime.now().date()
-        })
-    
-    # รับข้อมูล cart จาก query parameters (จะส่งมาจาก frontend)
-    cart_data_str = request.GET.get('cart', '[]')
-    
-    try:
-        cart_data = json.loads(cart_data_str)
-    except json.JSONDecodeError:
-        cart_data = []
-    
-    # ดึงข้อมูลสัตว์เลี้ยงจาก cart
-    pets_in_cart = []
-    total_price = 0
+    """หน้าตะกร้าสินค้า (อ่านจากตะกร้าฝั่ง server ใน query เดียว)"""
+    shopping_cart = get_cart(request.user)
     
-    for item in cart_data:
+    # ลิงก์แบบเดิมที่ส่งตะกร้ามาเป็น JSON ใน query string - รวมเข้าตะกร้าฝั่ง server แล้ว redirect
+    if 'cart' in request.GET:
         try:
-            pet = Pet.objects.get(id=item['petId'])
-            quantity = item.get('quantity', 1)
-            item_total = pet.price * quantity
-            
-            pets_in_cart.append({
-                'pet': pet,
-                'quantity': quantity,
-                'total_price': item_total
-            })
-            
-            total_price += item_total
-        except Pet.DoesNotExist:
-            # ถ้าไม่พบสัตว์เลี้ยง ให้ข้ามไป
-            continue
+            cart_data = json.loads(request.GET['cart'])
+        except json.JSONDecodeError:
+            cart_data = []
+        for warning in merge_into_cart(shopping_cart, cart_data if isinstance(cart_data, list) else []):
+            messages.warning(request, warning)
+        return redirect('cart')
+    
+    pets_in_cart = get_cart_lines(shopping_cart)
+    summary = summarize_cart_lines(pets_in_cart)
     
     return render(request, 'orders/cart.html', {
         'pets_in_cart': pets_in_cart,
-        'total_price': total_price,
-        'cart_count': len(pets_in_cart),
-        'cart_data_json': json.dumps(cart_data),
+        'total_price': summary['total_price'],
+        'cart_count': summary['item_count'],
         'today': datetime.now().date()
     })
 
@@ -228,48 +276,40 @@ def create_order_from_cart(request):
     """สร้างคำสั่งซื้อจากตะกร้า"""
     if request.method == 'POST':
         try:
-            cart_data = json.loads(request.POST.get('cart', '[]'))
+            shopping_cart = None
+            if 'cart' in request.POST:
+                # ตะกร้าแบบเดิมที่ส่งมาจาก client
+                cart_data = json.loads(request.POST.get('cart') or '[]')
+            else:
+                shopping_cart = get_cart(request.user)
+                cart_data = cart_checkout_data(get_cart_lines(shopping_cart))
             delivery_method = request.POST.get('delivery_method', 'pickup')
             pickup_date = request.POST.get('pickup_date')
             recipient_name = request.POST.get('recipient_name', '')
             
-            created_orders = []
-            for item in cart_data:
-                try:
-                    pet = Pet.objects.get(id=item['petId'])
-                    quantity = item.get('quantity', 1)
-                    
-                    # ตรวจสอบว่าสัตว์เลี้ยงพร้อมขายหรือไม่
-                    if not pet.is_available:
-                        messages.warning(request, f'{pet.name} ไม่พร้อมขายในขณะนี้')
-                        continue
-                    
-                    # ตรวจสอบสต็อก
-                    if pet.stock_quantity < quantity:
-                        messages.warning(request, f'{pet.name} สต็อกไม่พอ! มีเพียง {pet.stock_quantity} ตัว')
-                        continue
-                    
-                    # สร้างคำสั่งซื้อพร้อมข้อมูลการรับสินค้า
-                    order = Order.objects.create(
-                        user=request.user,
-                        pet=pet,
-                        quantity=quantity,
-                        total_price=pet.price * quantity,
-                        status='pending',
-                        delivery_method=delivery_method,
-                        pickup_date=pickup_date if pickup_date else None,
-                        recipient_name=recipient_name or request.user.get_full_name() or request.user.username
-                    )
-                    created_orders.append(order)
-                    
-                except Pet.DoesNotExist:
-                    messages.warning(request, 'ไม่พบสัตว์เลี้ยงบางรายการในระบบ')
-                    continue
+            fill_mode = request.POST.get('fill_mode', FILL_PARTIAL)
+            
+            # สร้างคำสั่งซื้อทั้งตะกร้าใน transaction เดียว (จำนวน query คงที่)
+            try:
+                created_orders, warnings = checkout_cart(
+                    request.user,
+                    cart_data,
+                    delivery_method=delivery_method,
+                    pickup_date=pickup_date,
+                    recipient_name=recipient_name,
+                    fill_mode=fill_mode if fill_mode in FILL_MODES else FILL_PARTIAL
+                )
+            except CheckoutError as e:
+                created_orders, warnings = [], e.warnings
+            
+            for warning in warnings:
+                messages.warning(request, warning)
             
             if created_orders:
                 messages.success(request, f'สร้างคำสั่งซื้อสำเร็จ {len(created_orders)} รายการ')
-                # ล้างตะกร้าหลังสั่งซื้อสำเร็จ
-                request.session['order_created'] = True
+                # เอาเฉพาะรายการที่สั่งซื้อสำเร็จออกจากตะกร้า รายการที่มีปัญหายังอยู่ให้แก้ไขต่อได้
+                if shopping_cart is not None:
+                    clear_cart(shopping_cart, pet_ids=[order.pet_id for order in created_orders])
             else:
                 messages.warning(request, 'ไม่สามารถสร้างคำสั่งซื้อได้')
                 
@@ -281,12 +321,108 @@ def create_order_from_cart(request):
     
     return redirect('cart')
 
+def _cart_payload(shopping_cart, lines=None):
+    """ข้อมูลตะกร้าสำหรับ JSON API (ไม่ส่ง lines = เฉพาะยอดรวมจาก cache)"""
+    if shopping_cart is None:
+        summary = {'line_count': 0, 'item_count': 0, 'total_price': 0}
+    elif lines is None:
+        summary = get_cart_summary(shopping_cart)
+    else:
+        summary = summarize_cart_lines(lines)
+    payload = {
+        'line_count': summary['line_count'],
+        'item_count': summary['item_count'],
+        'total_price': str(summary['total_price']),
+    }
+    if lines is not None:
+        payload['items'] = [{
+            'petId': line['pet'].pk,
+            'name': line['pet'].name,
+            'category': line['pet'].category.name,
+            'price': str(line['pet'].price),
+            'quantity': line['quantity'],
+            'total_price': str(line['total_price']),
+            'stock_quantity': line['pet'].stock_quantity,
+            'available': line['available'],
+            'warning': line['warning'],
+        } for line in lines]
+    return payload
+
+def _json_body(request):
+    try:
+        data = json.loads(request.body or b'{}')
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+    return data if isinstance(data, dict) else None
+
+def _parse_quantity(value, default=None):
+    try:
+        return int(value if value is not None else default)
+    except (TypeError, ValueError):
+        return None
+
 def get_cart_data(request):
-    """API สำหรับดึงข้อมูล cart (ใช้โดย JavaScript)"""
-    if request.method == 'GET' and request.user.is_authenticated:
-        # ในอนาคตอาจเก็บ cart ไว้ใน database
-        return JsonResponse({'cart': []})
-    return JsonResponse({'error': 'Unauthorized'}, status=401)
+    """Cart API (ใช้โดย JavaScript)
+
+    GET    ดูตะกร้า (?summary=1 = เฉพาะจำนวนและยอดรวม)
+    POST   เพิ่มสินค้า {"petId": 1, "quantity": 1} หรือรวมตะกร้าเดิม {"items": [...]}
+    DELETE ล้างตะกร้า
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Unauthorized'}, status=401)
+    
+    if request.method == 'GET':
+        shopping_cart = get_cart(request.user, create=False)
+        if request.GET.get('summary'):
+            return JsonResponse(_cart_payload(shopping_cart))
+        lines = get_cart_lines(shopping_cart) if shopping_cart else []
+        return JsonResponse(_cart_payload(shopping_cart, lines))
+    
+    shopping_cart = get_cart(request.user)
+    if request.method == 'DELETE':
+        clear_cart(shopping_cart)
+        return JsonResponse(_cart_payload(shopping_cart, []))
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    
+    data = _json_body(request)
+    if data is None:
+        return JsonResponse({'error': 'ข้อมูลไม่ถูกต้อง'}, status=400)
+    if isinstance(data.get('items'), list):
+        warnings = merge_into_cart(shopping_cart, data['items'])
+        return JsonResponse({**_cart_payload(shopping_cart), 'warnings': warnings})
+    
+    pet_id = _parse_quantity(data.get('petId'))
+    quantity = _parse_quantity(data.get('quantity'), default=1)
+    if pet_id is None or quantity is None:
+        return JsonResponse({'error': 'ข้อมูลไม่ถูกต้อง'}, status=400)
+    try:
+        add_to_cart(shopping_cart, pet_id, quantity)
+    except CartError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse(_cart_payload(shopping_cart), status=201)
+
+def cart_item_api(request, pet_id):
+    """แก้ไขจำนวน (PATCH/PUT {"quantity": n}) หรือลบ (DELETE) รายการในตะกร้า"""
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Unauthorized'}, status=401)
+    
+    shopping_cart = get_cart(request.user)
+    if request.method == 'DELETE':
+        remove_from_cart(shopping_cart, pet_id)
+        return JsonResponse(_cart_payload(shopping_cart))
+    if request.method not in ('PATCH', 'PUT'):
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    
+    data = _json_body(request)
+    quantity = _parse_quantity(data.get('quantity')) if data is not None else None
+    if quantity is None:
+        return JsonResponse({'error': 'ข้อมูลไม่ถูกต้อง'}, status=400)
+    try:
+        set_cart_quantity(shopping_cart, pet_id, quantity)
+    except CartError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse(_cart_payload(shopping_cart))
 
 @login_required
 def cancel_order(request, order_id):
@@ -10,6 +10,7 @@ class UserViewSet(viewsets.ModelViewSet):
     queryset = CustomUser.objects.all()  # เพิ่มบรรทัดนี้
     serializer_class = UserSerializer
     permission_classes = [IsAdminUser]
+    keyset_ordering = ('-date_joined', 'id')
     
     @action(detail=False, methods=['post'], permission_classes=[])
     def register(self, request):